@@ -29,6 +29,18 @@ try:
 except ImportError:
     ThemedStyle = None
 
+# Share the web backend's nice/ionice/CPU-set policy when it is importable
+try:
+    from ffmpeg_web.core.scheduling import preexec_for  # type: ignore
+except ImportError:
+    preexec_for = None  # type: ignore
+
+# Concat-list helpers that let sequences with holes encode by holding frames
+try:
+    from ffmpeg_web.core import frames as frame_utils  # type: ignore
+except ImportError:
+    frame_utils = None  # type: ignore
+
 # Create a custom logger class to duplicate output
 class TeeLogger:
     def __init__(self, filename, mode='a', stream=None):
@@ -59,7 +71,8 @@ DEFAULT_SETTINGS = {
     "codec": "h265",
     "mp4_bitrate": "30",
     "prores_profile": "2",  # 422
-    "prores_qscale": "9"
+    "prores_qscale": "9",
+    "scheduling_class": "interactive"  # interactive, batch or background
 }
 
 def check_and_install_dependencies():
@@ -702,8 +715,7 @@ class FFmpegUI:
                                 pattern = f"{collection.head}%04d{collection.tail}"  # Force 4-digit padding
                                 self.filename_pattern_var.set(pattern) # Use the var
                                 
-                                self.frame_range = (min(collection.indexes), max(collection.indexes))
-                                self.total_frames = len(collection.indexes)
+                                self._set_frame_range(collection)
                                 
                                 # Show/hide ACES frame based on file type
                                 if pattern.lower().endswith('.exr'):
@@ -754,8 +766,7 @@ class FFmpegUI:
                             self.temp_dir_frame.grid_remove()  # Hide temp dir selection for non-EXR files
                             self.temp_dir_var.set("source folder")  # Reset to default when hidden
                         
-                        self.frame_range = (min(collection.indexes), max(collection.indexes))
-                        self.total_frames = len(collection.indexes)
+                        self._set_frame_range(collection)
                         
                         # Update output filename
                         output_name = collection.head.rstrip('_.')
@@ -776,6 +787,24 @@ class FFmpegUI:
             self.total_frames = 0
             self.desired_duration_var.set("0") # Use the var
 
+    def _set_frame_range(self, collection):
+        """Store the detected range of a collection and report any holes.
+
+        Holes are held from the previous frame at encode time, so the sequence
+        spans its full first-to-last range.
+        """
+        first_frame, last_frame = min(collection.indexes), max(collection.indexes)
+        present = set(collection.indexes)
+        self.frame_range = (first_frame, last_frame)
+        self.total_frames = last_frame - first_frame + 1
+        self.missing_frames = [f for f in range(first_frame, last_frame + 1) if f not in present]
+        if self.missing_frames:
+            if frame_utils is not None:
+                missing_str = frame_utils.format_frame_ranges(self.missing_frames)
+            else:
+                missing_str = ", ".join(str(f) for f in self.missing_frames)
+            self.queue.put(('output', f"Warning: {len(self.missing_frames)} missing frames will hold the previous frame: {missing_str}\n"))
+
     def update_output_folder(self, input_folder):
         """Update output folder with option to use parent directory of input folder"""
         output_folder = os.path.dirname(input_folder)
@@ -815,7 +844,8 @@ class FFmpegUI:
             "codec": self.codec_var.get(), # Already a var
             "mp4_bitrate": self.mp4_bitrate.get() if hasattr(self, 'mp4_bitrate') else DEFAULT_SETTINGS["mp4_bitrate"],
             "prores_profile": self.prores_profile.get() if hasattr(self, 'prores_profile') else DEFAULT_SETTINGS["prores_profile"],
-            "prores_qscale": self.prores_qscale.get() if hasattr(self, 'prores_qscale') else DEFAULT_SETTINGS["prores_qscale"]
+            "prores_qscale": self.prores_qscale.get() if hasattr(self, 'prores_qscale') else DEFAULT_SETTINGS["prores_qscale"],
+            "scheduling_class": self.settings.get("scheduling_class", DEFAULT_SETTINGS["scheduling_class"])
         }
         
         try:
@@ -1130,6 +1160,20 @@ class FFmpegUI:
                 "-framerate", src_ffmpeg_fps_str,  # Use normalized source frame rate for input
                 "-i", input_path
             ]
+            # Sequences with holes play from a concat list that holds the previous frame
+            self.frame_list_path = None
+            if frame_utils is not None:
+                missing = frame_utils.missing_frames(img_folder, input_pattern, start_frame, end_frame)
+                if missing:
+                    try:
+                        self.frame_list_path = frame_utils.write_concat_list(
+                            img_folder, input_pattern, start_frame, end_frame, missing, src_num_fps
+                        )
+                    except (ValueError, OSError) as e:
+                        self.queue.put(('error', f"Cannot encode sequence: {e}"))
+                        return
+                    image_sequence_input_args = frame_utils.concat_input_args(self.frame_list_path)
+                    self.queue.put(('output', f"Missing frames held from the previous frame: {frame_utils.format_frame_ranges(missing)}\n"))
         else:
             self.queue.put(('error', "Frame range not detected. Please select the image sequence folder again."))
             return
@@ -1262,6 +1306,34 @@ class FFmpegUI:
         thread = threading.Thread(target=self.execute_ffmpeg, args=(cmd, output_path, actual_duration))
         thread.start()
 
+    def _scheduling_preexec(self):
+        """Return the ``preexec_fn`` for the configured scheduling class, if any."""
+        if preexec_for is None:
+            return None
+        try:
+            return preexec_for(self.settings.get("scheduling_class"))
+        except ValueError as e:
+            print(f"Ignoring scheduling class: {e}")
+            return None
+
+    def _frame_existence_checks(self, img_folder, pattern, before):
+        """Return ``(png_exists, exr_exists)`` frame checks for the EXR pre-pass.
+
+        Backed by one directory listing each when the web core is importable,
+        otherwise by a ``stat`` per frame.
+        """
+        if frame_utils is not None:
+            try:
+                pngs = frame_utils.FrameManifest.scan(self.temp_dir, f"{before}%04d.png")
+                exrs = frame_utils.FrameManifest.scan(img_folder, pattern)
+                return pngs.__contains__, exrs.__contains__
+            except ValueError:
+                pass
+        return (
+            lambda frame: os.path.exists(os.path.join(self.temp_dir, f"{before}{frame:04d}.png")),
+            lambda frame: os.path.exists(os.path.join(img_folder, pattern.replace("%04d", f"{frame:04d}"))),
+        )
+
     def execute_ffmpeg(self, cmd, output_path, actual_duration):
         """Run FFmpeg with streaming logs and cooperative cancellation support.
 
@@ -1277,7 +1349,8 @@ class FFmpegUI:
                 stdout=subprocess.PIPE, 
                 stderr=subprocess.PIPE,
                 universal_newlines=True,
-                bufsize=1
+                bufsize=1,
+                preexec_fn=self._scheduling_preexec()
             )
             self.active_processes.append(process)  # Add process to active processes list
             
@@ -1341,6 +1414,14 @@ class FFmpegUI:
             stdout_thread.join(timeout=1)
             stderr_thread.join(timeout=1)
 
+            # Remove the frame list written for a sequence with holes
+            if getattr(self, 'frame_list_path', None):
+                try:
+                    os.remove(self.frame_list_path)
+                except OSError:
+                    pass
+                self.frame_list_path = None
+
             # Remove finished process from active list if present
             try:
                 if process in self.active_processes:
@@ -1578,16 +1659,19 @@ class FFmpegUI:
         print("DEBUG: total_frames =", total_frames)
         self.queue.put(('output', f"DEBUG: Total frames to convert: {total_frames}\n"))
         
+        # List the temp and input folders once instead of checking every frame
+        png_exists, exr_exists = self._frame_existence_checks(img_folder, pattern, before)
+
         # Check if all PNG files already exist
         all_files_exist = True
         missing_frames = []
         for frame in range(start_frame, end_frame + 1):
-            png_file = os.path.join(self.temp_dir, f"{before}{frame:04d}.png")
-            if not os.path.exists(png_file):
+            if not png_exists(frame):
                 all_files_exist = False
                 missing_frames.append(frame)
         
         if all_files_exist:
+            self.exr_skipped_frames = []
             print("DEBUG: All PNG files already exist, skipping conversion")
             self.queue.put(('output', "All PNG files already exist, skipping conversion\n"))
             self.queue.put(('progress', (100, "EXR conversion complete (skipped)")))
@@ -1607,34 +1691,22 @@ class FFmpegUI:
         input_colorspace = self.color_space_var.get()
         output_colorspace = "Output - sRGB"
         
-        # Verify that at least the first input file exists
-        first_frame = missing_frames[0] if missing_frames else start_frame
         input_file_pattern = os.path.join(img_folder, pattern)
-        test_file = input_file_pattern.replace("%04d", f"{first_frame:04d}")
-        if not os.path.exists(test_file):
-            error_msg = f"Input file not found: {test_file}"
-            print(f"DEBUG: {error_msg}")
-            self.queue.put(('error', error_msg))
-            return
         
         # Build command for individual files using the pattern from UI
         cmds = []
+        skipped_inputs = []
+        self.exr_skipped_frames = skipped_inputs
         for frame in missing_frames:
             # Use the pattern directly from UI with proper frame substitution
             input_file = input_file_pattern.replace("%04d", f"{frame:04d}")
             output_file = os.path.join(self.temp_dir, f"{before}{frame:04d}.png")
             
-            # Skip file if it already exists
-            if os.path.exists(output_file):
+            # Missing input frames are skipped and held from the previous frame at encode time
+            if not exr_exists(frame):
+                skipped_inputs.append(frame)
                 continue
                 
-            # Check if input file exists
-            if not os.path.exists(input_file):
-                error_msg = f"Input file not found: {input_file}"
-                print(f"DEBUG: {error_msg}")
-                self.queue.put(('error', error_msg))
-                return
-                
             cmd = [
                 "oiiotool",
                 "-v",
@@ -1650,6 +1722,19 @@ class FFmpegUI:
             ]
             cmds.append((cmd, frame))
             
+        if skipped_inputs:
+            if frame_utils is not None:
+                skipped_str = frame_utils.format_frame_ranges(skipped_inputs)
+            else:
+                skipped_str = ", ".join(str(f) for f in skipped_inputs)
+            self.queue.put(('output', f"Warning: skipping {len(skipped_inputs)} missing EXR frames: {skipped_str}\n"))
+            if not cmds and len(skipped_inputs) < total_frames:
+                # Every existing frame is already converted; only holes remain
+                self.queue.put(('progress', (100, "EXR conversion complete (skipped)")))
+                self.temp_frame_range = (start_frame, end_frame)
+                self.root.after(0, lambda: self.finish_exr_conversion_main_callback(start_frame, end_frame))
+                return
+
         if not cmds:
             print("DEBUG: No valid frames to convert")
             self.queue.put(('error', "No valid frames to convert. Check that input files exist."))
@@ -1665,6 +1750,9 @@ class FFmpegUI:
         completed_files = 0
         
         try:
+            # Resolve the scheduling policy once for all workers
+            worker_preexec = self._scheduling_preexec()
+
             # Define a function to process one file
             def process_file(cmd_info):
                 cmd, frame_num = cmd_info
@@ -1676,7 +1764,8 @@ class FFmpegUI:
                         cmd,
                         stdout=subprocess.PIPE,
                         stderr=subprocess.PIPE,
-                        universal_newlines=True
+                        universal_newlines=True,
+                        preexec_fn=worker_preexec
                     )
                     # Track worker process for potential cancellation
                     self.active_processes.append(process)
@@ -1840,8 +1929,8 @@ class FFmpegUI:
             self.queue.put(('error', "No PNG files found in temp directory"))
             return
             
-        # Verify all expected frames exist
-        expected_count = end_frame - start_frame + 1
+        # Verify all expected frames exist (input holes have no PNG and are held at encode time)
+        expected_count = end_frame - start_frame + 1 - len(getattr(self, 'exr_skipped_frames', []))
         if len(png_files) != expected_count:
             error_msg = f"Expected {expected_count} PNG files but found {len(png_files)}"
             self.queue.put(('error', error_msg))  # Use error instead of warning to stop process
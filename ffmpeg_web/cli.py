@@ -0,0 +1,312 @@
+"""Headless batch mode: run conversion jobs without the web server or Tk UI.
+
+Jobs are ``FFmpegJobConfig`` objects given as flags, a JSON file, or a
+JSON-lines batch file (one job per line; flags override every job)::
+
+    python -m ffmpeg_web.cli --input-folder /shots/sh010 \\
+        --filename-pattern sh010.%04d.exr --output-folder /deliveries \\
+        --output-filename sh010.mov --frame-rate 24 --source-frame-rate 24 \\
+        --desired-duration 4 --codec prores --prores-profile 3 --prores-qscale 9
+
+    python -m ffmpeg_web.cli --config job.json
+    python -m ffmpeg_web.cli --batch jobs.jsonl --scheduling-class batch
+    python -m ffmpeg_web.cli --config job.json --farm /mnt/farm/ffmpeg_queue
+
+With ``--farm`` the job is split into tasks in a queue directory on shared
+storage and run by ``python -m ffmpeg_web.worker`` processes on any number
+of hosts; ``--farm-workers N`` also starts N local workers for the run.
+
+Every log line, progress update and result is written to stdout as one JSON
+object per line (``{"job": 0, "type": "progress", "content": "42.0", ...}``),
+ending with a ``result`` line per job. ``--start-frame``/``--end-frame``
+default to the frames found on disk. Settings (LUT path, CPU budget, CPU
+sets) come from the settings file in the working directory.
+
+Exit codes: 0 all jobs succeeded, 1 a job failed, 2 invalid arguments or job
+config, 3 preflight rejected a job's input frames, 4 no valid pipeline with
+the installed tools, 130 interrupted. A batch runs every job and exits with
+the first non-zero code.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, TextIO
+
+from pydantic import ValidationError
+
+from .core import farm, pipeline, profiles
+from .core.ffmpeg_handler import FFmpegJobConfig
+from .core.frames import FrameManifest
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_REJECTED = 3
+EXIT_UNAVAILABLE = 4
+EXIT_INTERRUPTED = 130
+
+_EXIT_CODES = {
+    pipeline.SUCCESS: EXIT_OK,
+    pipeline.FAILED: EXIT_FAILED,
+    pipeline.REJECTED: EXIT_REJECTED,
+    pipeline.CANCELLED: EXIT_INTERRUPTED,
+}
+
+# Messages whose content is already JSON, embedded as objects.
+_JSON_CONTENT = {"estimate"}
+
+# Set by the planner and the pipeline, not by the caller.
+_INTERNAL_FIELDS = {"lut_path", "input_scale"}
+
+
+class JsonLogger:
+    """Write pipeline messages to a stream as JSON lines."""
+
+    def __init__(self, stream: TextIO, quiet: bool = False):
+        self.stream = stream
+        self.quiet = quiet
+        self.job = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def emit(self, msg_type: str, content: Any) -> None:
+        if self.quiet and msg_type == "output":
+            return
+        if msg_type in _JSON_CONTENT:
+            content = json.loads(content)
+        elif isinstance(content, str) and msg_type != "output":
+            content = content.strip()
+        record = {"job": self.job, "type": msg_type, "content": content, "time": round(time.time(), 3)}
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                self.stream.write(json.dumps(record) + "\n")
+                self.stream.flush()
+            except OSError:
+                # The reader went away (e.g. ``| head``); keep the job running.
+                self._closed = True
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m ffmpeg_web.cli",
+        description="Run FFmpeg conversion jobs headlessly with JSON progress on stdout.",
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--config", help="JSON file holding one job config")
+    source.add_argument("--batch", help="JSON-lines file, one job config per line ('-' for stdin)")
+    parser.add_argument("--quiet", action="store_true", help="omit FFmpeg/oiiotool log lines")
+    parser.add_argument("--farm", metavar="QUEUE_DIR", help="run jobs on farm workers through this shared queue")
+    parser.add_argument(
+        "--farm-workers", type=int, default=0, help="local farm workers to start for this run (with --farm)"
+    )
+
+    fields = parser.add_argument_group("job config (overrides --config/--batch values)")
+    for name, field in FFmpegJobConfig.model_fields.items():
+        if name in _INTERNAL_FIELDS:
+            continue
+        flag = "--" + name.replace("_", "-")
+        if field.annotation is bool:
+            # --flag/--no-flag; unset keeps the config file's value.
+            fields.add_argument(flag, dest=name, action="store_true", default=None)
+            fields.add_argument("--no-" + flag[2:], dest=name, action="store_false", default=None)
+        elif field.annotation is int:
+            fields.add_argument(flag, dest=name, type=int, default=None)
+        else:
+            fields.add_argument(flag, dest=name, default=None)
+    return parser
+
+
+def _load_jobs(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Return the raw job dicts from --config/--batch, or one empty job.
+
+    Raises:
+        ValueError: If a file is not valid JSON.
+    """
+    if args.config:
+        with open(args.config, "r") as f:
+            return [json.load(f)]
+    if args.batch:
+        f = sys.stdin if args.batch == "-" else open(args.batch, "r")
+        try:
+            lines = [line.strip() for line in f]
+        finally:
+            if f is not sys.stdin:
+                f.close()
+        jobs = []
+        for number, line in enumerate(lines, start=1):
+            if not line or line.startswith("#"):
+                continue
+            try:
+                jobs.append(json.loads(line))
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"{args.batch}:{number}: {exc}") from exc
+        return jobs
+    return [{}]
+
+
+def _fill_frame_range(raw: Dict[str, Any]) -> None:
+    """Default a missing start/end frame to the frames that exist on disk."""
+    if "start_frame" in raw and "end_frame" in raw:
+        return
+    if not raw.get("input_folder") or not raw.get("filename_pattern"):
+        return
+    try:
+        present = list(FrameManifest.scan(raw["input_folder"], raw["filename_pattern"]))
+    except ValueError:
+        return
+    if present:
+        raw.setdefault("start_frame", present[0])
+        raw.setdefault("end_frame", present[-1])
+
+
+def _run_job(
+    job_pipeline: pipeline.JobPipeline,
+    job_config: FFmpegJobConfig,
+    log: JsonLogger,
+    coordinator: Optional[farm.FarmCoordinator] = None,
+) -> int:
+    """Plan and run one job, locally or through ``coordinator``; return its exit code."""
+    try:
+        plan = job_pipeline.prepare(job_config)
+    except ValueError as exc:
+        log.emit("error", str(exc))
+        return EXIT_USAGE
+    if plan.problems:
+        log.emit("error", f"No valid pipeline for this job: {'; '.join(plan.problems)}.")
+        return EXIT_UNAVAILABLE
+
+    # Run in a worker so Ctrl+C/SIGINT can cancel and still clean up.
+    runner = coordinator or job_pipeline
+    outcome: List[str] = []
+    finished = threading.Event()
+
+    def work() -> None:
+        try:
+            outcome.append(runner.run(job_config, plan))
+        finally:
+            finished.set()
+
+    threading.Thread(target=work, daemon=True).start()
+    try:
+        while not finished.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        log.emit("cancelled", "Interrupted; cancelling job.")
+        runner.cancel()
+        # Not Thread.join: after an interrupted join it can return early.
+        finished.wait()
+        return EXIT_INTERRUPTED
+    return _EXIT_CODES.get(outcome[0] if outcome else pipeline.FAILED, EXIT_FAILED)
+
+
+def _start_local_workers(queue: Optional[str], count: int) -> List[subprocess.Popen]:
+    """Start farm workers on this host; their logs go to stderr.
+
+    They run in their own session so Ctrl+C reaches only the CLI, which
+    stops them once the job has been cancelled.
+    """
+    return [
+        subprocess.Popen(  # noqa: S603
+            [sys.executable, "-m", "ffmpeg_web.worker", queue, "--quiet"],
+            stdout=sys.stderr,
+            cwd=os.getcwd(),
+            start_new_session=True,
+        )
+        for _ in range(count)
+    ]
+
+
+def _stop_local_workers(workers: List[subprocess.Popen]) -> None:
+    for process in workers:
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)
+    for process in workers:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def _run_jobs(
+    jobs: List[Dict[str, Any]],
+    overrides: Dict[str, Any],
+    job_pipeline: pipeline.JobPipeline,
+    coordinator: Optional[farm.FarmCoordinator],
+    log: JsonLogger,
+) -> int:
+    """Run every job in order; return the first non-zero exit code."""
+    exit_code = EXIT_OK
+    for index, raw in enumerate(jobs):
+        log.job = index
+        raw = {**raw, **overrides}
+        _fill_frame_range(raw)
+        started = time.monotonic()
+        try:
+            job_config = FFmpegJobConfig(**raw)
+        except ValidationError as exc:
+            log.emit("error", f"Invalid job config: {exc}")
+            code = EXIT_USAGE
+            output = None
+        else:
+            code = _run_job(job_pipeline, job_config, log, coordinator)
+            output = os.path.abspath(
+                os.path.join(
+                    job_config.output_folder,
+                    profiles.tag_filename(job_config.output_filename, job_config.profile),
+                )
+            )
+        log.emit(
+            "result",
+            {
+                "exit_code": code,
+                "output": output if code == EXIT_OK else None,
+                "seconds": round(time.monotonic() - started, 2),
+            },
+        )
+        if exit_code == EXIT_OK:
+            exit_code = code
+        if code == EXIT_INTERRUPTED:
+            break
+    return exit_code
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the jobs described by ``argv``; return the process exit code."""
+    args = _build_parser().parse_args(argv)
+    log = JsonLogger(sys.stdout, quiet=args.quiet)
+
+    try:
+        jobs = _load_jobs(args)
+    except (OSError, ValueError) as exc:
+        log.emit("error", str(exc))
+        return EXIT_USAGE
+
+    overrides = {
+        name: value
+        for name, value in vars(args).items()
+        if name in FFmpegJobConfig.model_fields and value is not None
+    }
+    if args.farm_workers and not args.farm:
+        log.emit("error", "--farm-workers needs --farm")
+        return EXIT_USAGE
+    job_pipeline = pipeline.JobPipeline(log.emit)
+    coordinator = farm.FarmCoordinator(args.farm, log.emit) if args.farm else None
+    local_workers = _start_local_workers(args.farm, args.farm_workers)
+    try:
+        return _run_jobs(jobs, overrides, job_pipeline, coordinator, log)
+    finally:
+        _stop_local_workers(local_workers)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,11 @@ import os
 from typing import Dict, Any
 
 SETTINGS_FILE = 'ffmpeg_settings.json'
+THROUGHPUT_FILE = 'ffmpeg_throughput.json'
+CAPABILITIES_FILE = 'ffmpeg_capabilities.json'
+JOBS_DB_FILE = 'ffmpeg_jobs.db'
+# Unix sockets through which the uvicorn workers of one server talk.
+EVENTS_DIR = 'ffmpeg_events'
 
 DEFAULT_SETTINGS = {
     "last_input_folder": "",
@@ -13,7 +18,22 @@ DEFAULT_SETTINGS = {
     "codec": "h265",
     "mp4_bitrate": "30",
     "prores_profile": "2",  # 422
-    "prores_qscale": "9"
+    "prores_qscale": "9",
+    "profile": "delivery",
+    # Baked ACEScg -> sRGB 3D LUT (.cube) that lets draft jobs skip oiiotool.
+    "exr_lut_path": "",
+    # Threads shared by concurrent encodes and pre-passes (0 = all cores).
+    "cpu_budget": 0,
+    # Default priority of new jobs: interactive, batch or background.
+    "scheduling_class": "interactive",
+    # Optional CPU pinning per scheduling class, e.g. {"background": "8-15"}.
+    "cpu_sets": {},
+    # Start the EXR pre-pass speculatively when a sequence is selected.
+    "prewarm": False,
+    # Jobs run at once by the web server; later submissions wait in a queue.
+    "max_concurrent_jobs": 2,
+    # Stages of running jobs at once, so one job's pre-pass overlaps another's encode.
+    "stage_slots": {"prepass": 1, "encode": 1}
 }
 
 def load_settings() -> Dict[str, Any]:
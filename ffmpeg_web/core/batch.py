@@ -0,0 +1,180 @@
+"""Expand, validate and track a batch of conversion jobs submitted together.
+
+Delivering an episode is many shots with the same settings. A
+``BatchRequest`` gives them as partial job configs (``jobs``), as a rule
+(``BatchRule``: every subfolder of a folder whose name matches a glob is a
+shot), or both; ``defaults`` fill in whatever a shot leaves out. Per shot,
+missing start/end frames default to the frames found on disk and a missing
+duration to the length of that range.
+
+The web server validates every shot before it queues any (``expand`` and
+``validate_job`` touch the filesystem and run in ``fs_pool``), then queues
+them together under one batch id; ``summarize`` reports a batch's
+aggregated progress and per-shot state.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+
+from . import planner
+from .ffmpeg_handler import FFmpegJobConfig
+from .frames import FrameManifest
+from .jobs import CANCELLED, DONE, FAILED, FINISHED, QUEUED, RUNNING, Job
+from .pipeline import JobPipeline
+from .utils import normalize_fps
+
+# Most shots one batch may queue.
+MAX_JOBS = 1000
+
+
+class BatchRule(BaseModel):
+    """Shots found on disk: one per subfolder of ``folder`` matching ``shots``.
+
+    ``filename_pattern`` and ``output_filename`` may use ``{shot}``, the
+    subfolder's name, e.g. ``{shot}.%04d.exr`` and ``{shot}.mov``.
+    """
+
+    folder: str
+    shots: str = "*"
+    filename_pattern: str
+    output_filename: str = "{shot}.mov"
+
+
+class BatchRequest(BaseModel):
+    jobs: List[Dict[str, Any]] = []
+    rule: Optional[BatchRule] = None
+    # Settings shared by every shot; a shot's own settings win.
+    defaults: Dict[str, Any] = {}
+
+
+def _shot_from_rule(rule: BatchRule, name: str) -> Dict[str, Any]:
+    try:
+        return {
+            "input_folder": os.path.join(rule.folder, name),
+            "filename_pattern": rule.filename_pattern.format(shot=name),
+            "output_filename": rule.output_filename.format(shot=name),
+        }
+    except (KeyError, IndexError, ValueError) as exc:
+        raise ValueError(f"Invalid rule template: {exc}") from exc
+
+
+def expand(request: BatchRequest) -> List[Dict[str, Any]]:
+    """Return the raw settings of every shot of a batch, defaults applied.
+
+    Raises:
+        ValueError: If the batch is empty or too large, or its rule's
+            folder cannot be listed.
+    """
+    shots = list(request.jobs)
+    if request.rule is not None:
+        rule = request.rule
+        try:
+            with os.scandir(rule.folder) as entries:
+                names = sorted(
+                    entry.name
+                    for entry in entries
+                    if entry.is_dir() and fnmatch.fnmatchcase(entry.name, rule.shots)
+                )
+        except OSError as exc:
+            raise ValueError(f"Cannot list {rule.folder}: {exc.strerror or exc}") from exc
+        if not names:
+            raise ValueError(f"No shot folders in {rule.folder} match '{rule.shots}'")
+        shots.extend(_shot_from_rule(rule, name) for name in names)
+    if not shots:
+        raise ValueError("A batch needs at least one job or a rule")
+    if len(shots) > MAX_JOBS:
+        raise ValueError(f"A batch may queue at most {MAX_JOBS} jobs, not {len(shots)}")
+    return [{**request.defaults, **shot} for shot in shots]
+
+
+def validate_job(raw: Dict[str, Any]) -> Tuple[FFmpegJobConfig, planner.PipelinePlan]:
+    """Complete one shot's settings from disk, validate them and plan its pipeline.
+
+    Callers must reject the shot if ``plan.problems`` is not empty.
+
+    Raises:
+        ValueError: If the settings are invalid or the shot has no frames.
+    """
+    raw = dict(raw)
+    folder = raw.get("input_folder") or ""
+    pattern = raw.get("filename_pattern") or ""
+    if not os.path.isdir(folder):
+        raise ValueError(f"Folder does not exist: {folder}")
+    present = FrameManifest.scan(folder, pattern)
+    if not len(present):
+        raise ValueError(f"No frames matching {pattern} in {folder}")
+    frames = list(present)
+    raw.setdefault("start_frame", frames[0])
+    raw.setdefault("end_frame", frames[-1])
+    if "desired_duration" not in raw:
+        # The whole range, played at the output rate.
+        out_fps = normalize_fps(str(raw.get("frame_rate", "")))[0]
+        try:
+            length = int(raw["end_frame"]) - int(raw["start_frame"]) + 1
+        except (TypeError, ValueError):
+            length = 0
+        if out_fps > 0 and length > 0:
+            raw["desired_duration"] = repr(length / out_fps)
+
+    try:
+        job_config = FFmpegJobConfig(**raw)
+    except ValidationError as exc:
+        fields = ", ".join(".".join(str(part) for part in error["loc"]) for error in exc.errors())
+        raise ValueError(f"Invalid or missing settings: {fields}") from exc
+    start, end = job_config.start_frame, job_config.end_frame
+    if end < start:
+        raise ValueError(f"Out frame {end} is before in frame {start}")
+    if not any(start <= frame <= end for frame in frames):
+        raise ValueError(f"No frames of {start}-{end} in {folder}")
+    return job_config, JobPipeline.prepare(job_config)
+
+
+def duplicate_outputs(job_configs: List[FFmpegJobConfig]) -> List[int]:
+    """Return the indexes of shots that would write a movie an earlier shot writes."""
+    seen = set()
+    duplicates = []
+    for index, job_config in enumerate(job_configs):
+        path = os.path.normpath(os.path.join(job_config.output_folder, job_config.output_filename))
+        if path in seen:
+            duplicates.append(index)
+        seen.add(path)
+    return duplicates
+
+
+def state(batch_jobs: List[Job]) -> str:
+    """Return a batch's state from its shots' states.
+
+    Queued until a shot starts and running until every shot has finished;
+    then done, failed if any shot failed, or cancelled.
+    """
+    states = {job.state for job in batch_jobs}
+    if states <= {QUEUED}:
+        return QUEUED
+    if not states <= set(FINISHED):
+        return RUNNING
+    if states == {DONE}:
+        return DONE
+    return FAILED if FAILED in states else CANCELLED
+
+
+def summarize(batch_id: str, batch_jobs: List[Job]) -> Dict[str, Any]:
+    """Return a batch's state, progress and counts, and the summary of every shot.
+
+    Progress is the mean over the shots, a finished shot counting as 100.
+    """
+    counts: Dict[str, int] = {}
+    for job in batch_jobs:
+        counts[job.state] = counts.get(job.state, 0) + 1
+    progress = sum(100.0 if job.state in FINISHED else job.progress for job in batch_jobs)
+    return {
+        "id": batch_id,
+        "state": state(batch_jobs),
+        "progress": round(progress / len(batch_jobs), 1) if batch_jobs else 0.0,
+        "counts": counts,
+        "jobs": [job.summary() for job in batch_jobs],
+    }
@@ -0,0 +1,208 @@
+"""Coordinate the uvicorn worker processes of one web server.
+
+With ``uvicorn --workers N`` every worker imports ``main`` and has its own
+``JobManager`` and WebSocket clients. They share the job store
+(``config.JOBS_DB_FILE``) and two local mechanisms from this module:
+
+- ``SchedulerLock``: an exclusive lock on a file next to the job store. The
+  worker that holds it is the scheduler; it runs every job. When it exits
+  or crashes the lock is released and another worker takes over, recovering
+  the interrupted jobs from the store (``JobManager.recover``).
+- ``EventBus``: publish/subscribe over Unix datagram sockets, one per worker
+  in ``config.EVENTS_DIR``. The scheduler publishes job log messages for the
+  other workers' WebSocket clients; the other workers publish pre-pass
+  requests for the scheduler, and tell it when they have saved a submission
+  or cancellation to the store.
+
+A publish never blocks: a worker whose socket buffer is full misses the
+message, and sockets left by dead workers are removed. Submissions and
+cancellations therefore go through the store, which the scheduler also reads
+every ``RECONCILE_SECONDS``; a lost message only delays them. Where Unix sockets or
+``fcntl`` are unavailable the server runs as one worker, which is then
+always the scheduler and publishes to nobody.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .. import config
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Largest message a worker reads; longer ones are dropped by the publisher.
+MAX_MESSAGE_BYTES = 64 * 1024
+
+# How often the list of peer sockets is read again.
+PEERS_SECONDS = 1.0
+
+SOCKET_SUFFIX = ".sock"
+
+# How often the scheduler reads the other workers' submissions and
+# cancellations from the job store.
+RECONCILE_SECONDS = 2.0
+
+
+class EventBus:
+    """Publish JSON messages to the other workers of this server and receive theirs.
+
+    Args:
+        on_message: Called with every message another worker publishes, in
+            the bus's reader thread.
+        directory: Socket directory; ``config.EVENTS_DIR`` by default.
+    """
+
+    def __init__(self, on_message: Callable[[Dict[str, Any]], None], directory: Optional[str] = None):
+        self.on_message = on_message
+        self.directory = directory or config.EVENTS_DIR
+        self.path = os.path.join(self.directory, f"{os.getpid()}{SOCKET_SUFFIX}")
+        # Messages that could not be delivered (full buffer, too long).
+        self.dropped = 0
+        self._receiver: Optional[socket.socket] = None
+        self._sender: Optional[socket.socket] = None
+        self._peers: List[str] = []
+        self._peers_read = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return hasattr(socket, "AF_UNIX")
+
+    def start(self) -> None:
+        """Bind this worker's socket and start receiving."""
+        if not self.available or self._receiver is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        receiver.bind(self.path)
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sender.setblocking(False)
+        self._receiver, self._sender = receiver, sender
+        threading.Thread(target=self._read, args=(receiver,), daemon=True).start()
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        """Send ``message`` to every other worker without waiting for them."""
+        if self._sender is None:
+            return
+        data = json.dumps(message).encode("utf-8")
+        if len(data) > MAX_MESSAGE_BYTES:
+            self.dropped += 1
+            return
+        with self._lock:
+            for peer in self._peer_paths():
+                try:
+                    self._sender.sendto(data, peer)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # A worker that exited without removing its socket.
+                    self._forget(peer)
+                except OSError:
+                    # Full buffer: that worker misses this message.
+                    self.dropped += 1
+
+    def close(self) -> None:
+        """Stop receiving and remove this worker's socket."""
+        receiver, self._receiver = self._receiver, None
+        sender, self._sender = self._sender, None
+        for sock in (receiver, sender):
+            if sock is not None:
+                sock.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def _peer_paths(self) -> List[str]:
+        """Sockets of the other workers; call with the lock held."""
+        now = time.monotonic()
+        if now - self._peers_read >= PEERS_SECONDS:
+            try:
+                names = os.listdir(self.directory)
+            except OSError:
+                names = []
+            self._peers = [
+                os.path.join(self.directory, name)
+                for name in sorted(names)
+                if name.endswith(SOCKET_SUFFIX) and os.path.join(self.directory, name) != self.path
+            ]
+            self._peers_read = now
+        return list(self._peers)
+
+    def _forget(self, peer: str) -> None:
+        if peer in self._peers:
+            self._peers.remove(peer)
+        try:
+            os.unlink(peer)
+        except OSError:
+            pass
+
+    def _read(self, receiver: socket.socket) -> None:
+        while True:
+            try:
+                data = receiver.recv(MAX_MESSAGE_BYTES)
+            except OSError:
+                return
+            try:
+                message = json.loads(data.decode("utf-8"))
+            except ValueError:
+                continue
+            if isinstance(message, dict):
+                try:
+                    self.on_message(message)
+                except Exception:  # noqa: BLE001
+                    # One bad message must not stop the bus.
+                    continue
+
+
+class SchedulerLock:
+    """Elect the one worker that runs jobs, with an exclusive file lock.
+
+    Args:
+        path: Lock file; the job store's path plus ``.lock`` by default.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or f"{config.JOBS_DB_FILE}.lock"
+        self.held = False
+        self._file: Any = None
+
+    def try_acquire(self) -> bool:
+        """Take the lock if no other worker holds it."""
+        return self._acquire(blocking=False)
+
+    def wait(self, on_acquired: Callable[[], None]) -> None:
+        """Call ``on_acquired`` from a thread once the lock could be taken."""
+
+        def run() -> None:
+            if self._acquire(blocking=True):
+                on_acquired()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _acquire(self, blocking: bool) -> bool:
+        if self.held:
+            return True
+        if fcntl is None:
+            # No file locks: assume a single worker.
+            self.held = True
+            return True
+        if self._file is None:
+            self._file = open(self.path, "a")
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(self._file.fileno(), flags)
+        except OSError:
+            return False
+        self.held = True
+        return True
@@ -0,0 +1,165 @@
+"""Probe what the installed FFmpeg and oiiotool builds can do.
+
+``deps.check_dependencies`` only knows whether the tools exist. Which
+decoders, filters, encoders and options an FFmpeg build has decides which
+pipelines a job can use (see ``planner``) and which thread options its
+commands get (``ffmpeg_option``), so the builds are probed once and
+the results cached in ``config.CAPABILITIES_FILE``, keyed by the resolved
+binary path, its size and its mtime. Replacing a binary invalidates its entry.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+from typing import Any, Dict, List, Optional
+
+from .. import config
+
+# What is looked up in the FFmpeg build.
+FFMPEG_DECODERS = ["exr", "png"]
+FFMPEG_FILTERS = ["lut3d", "scale", "concat"]
+FFMPEG_ENCODERS = ["libx264", "libx265", "prores_ks", "qtrle"]
+# Thread options passed only when the build has them (see ``ffmpeg_option``).
+FFMPEG_OPTIONS = ["filter_threads", "filter_complex_threads"]
+
+_PROBE_TIMEOUT = 15
+
+_lock = threading.Lock()
+_memory: Dict[str, Dict[str, Any]] = {}
+
+
+def _run(cmd: List[str]) -> str:
+    """Run a probe command and return its combined output ('' on failure)."""
+    try:
+        result = subprocess.run(  # noqa: S603
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            timeout=_PROBE_TIMEOUT,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    return result.stdout
+
+
+def _listed(output: str, names: List[str]) -> Dict[str, bool]:
+    """Return which ``names`` appear as entries of an ``ffmpeg -decoders``-style list."""
+    entries = set()
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) >= 2:
+            entries.add(parts[1])
+    return {name: name in entries for name in names}
+
+
+def _probe_ffmpeg(path: str) -> Dict[str, Any]:
+    version = _run([path, "-hide_banner", "-version"])
+    match = re.search(r"ffmpeg version (\S+)", version)
+    options = _run([path, "-hide_banner", "-h", "full"])
+    return {
+        "version": match.group(1) if match else None,
+        "decoders": _listed(_run([path, "-hide_banner", "-decoders"]), FFMPEG_DECODERS),
+        "filters": _listed(_run([path, "-hide_banner", "-filters"]), FFMPEG_FILTERS),
+        "encoders": _listed(_run([path, "-hide_banner", "-encoders"]), FFMPEG_ENCODERS),
+        "options": {
+            name: re.search(rf"^\s*-{name}\b", options, re.MULTILINE) is not None
+            for name in FFMPEG_OPTIONS
+        },
+    }
+
+
+def _probe_oiiotool(path: str) -> Dict[str, Any]:
+    version = _run([path, "--version"]).strip()
+    help_text = _run([path, "--help"])
+    return {
+        "version": version.splitlines()[0] if version else None,
+        "colorconvert": "--colorconvert" in help_text,
+        "threads": "--threads" in help_text,
+    }
+
+
+_PROBES = {"ffmpeg": _probe_ffmpeg, "oiiotool": _probe_oiiotool}
+
+
+def _load_cache() -> Dict[str, Any]:
+    try:
+        with open(config.CAPABILITIES_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_cache(cache: Dict[str, Any]) -> None:
+    try:
+        with open(config.CAPABILITIES_FILE, "w") as f:
+            json.dump(cache, f, indent=1)
+    except OSError:
+        pass
+
+
+def probe_tool(tool: str, refresh: bool = False) -> Dict[str, Any]:
+    """Return the capabilities of one tool, probing it only when needed.
+
+    Returns:
+        ``available`` and ``path``, plus the tool's capabilities when it is
+        available.
+    """
+    found = shutil.which(tool)
+    if not found:
+        return {"available": False, "path": None}
+    path = os.path.realpath(found)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {"available": False, "path": None}
+    key = f"{path}:{st.st_size}:{st.st_mtime_ns}"
+
+    with _lock:
+        if not refresh and key in _memory:
+            return _memory[key]
+        cache = _load_cache()
+        entry = cache.get(tool)
+        if refresh or not entry or entry.get("key") != key:
+            entry = {"key": key, "capabilities": _PROBES[tool](path)}
+            cache[tool] = entry
+            _save_cache(cache)
+        info = {"available": True, "path": path, **entry["capabilities"]}
+        _memory[key] = info
+        return info
+
+
+def get_capabilities(refresh: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Return the capabilities of FFmpeg and oiiotool."""
+    return {tool: probe_tool(tool, refresh) for tool in _PROBES}
+
+
+def has(caps: Dict[str, Dict[str, Any]], tool: str, group: Optional[str] = None, name: str = "") -> bool:
+    """Return True if ``caps`` shows a tool (and optionally one of its features).
+
+    Example: ``has(caps, "ffmpeg", "filters", "lut3d")``.
+    """
+    info = caps.get(tool) or {}
+    if not info.get("available"):
+        return False
+    if group is None:
+        return True
+    return bool((info.get(group) or {}).get(name))
+
+
+def ffmpeg_option(name: str) -> bool:
+    """Return True if the FFmpeg build accepts the global option ``-name``.
+
+    Assumed when FFmpeg could not be probed or was probed before the option
+    was looked up, like the planner's other checks.
+    """
+    info = get_capabilities()["ffmpeg"]
+    options = info.get("options") or {}
+    if not info.get("available") or name not in options:
+        return True
+    return bool(options[name])
@@ -0,0 +1,565 @@
+"""Reel conform: encode an ordered list of shots into one movie.
+
+A conform job takes the shots of an edit (folder, pattern and in/out frame
+each) and produces the reel from a single FFmpeg encode. Every shot becomes an
+image-sequence input that is trimmed to its cut, normalised to the reel's
+frame size and joined with the ``concat`` filter, so no intermediate movies are
+written. EXR shots go through the usual oiiotool pre-pass first (or the draft
+``lut3d`` path), exactly like a single-shot job.
+
+Shot lists can be typed in or imported from:
+
+- CSV with ``folder,pattern,in,out[,name]`` columns,
+- CMX3600 EDLs, resolving each event's ``* FROM CLIP NAME:`` against a media
+  root (source timecode is taken as the frame number, the usual convention for
+  timecode-numbered DI renders),
+- OpenTimelineIO files, when the optional ``opentimelineio`` package is
+  installed.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import os
+import re
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from . import capabilities, explorer, frames, profiles, resources, scheduling, stages
+from .ffmpeg_handler import FFmpegHandler, FFmpegJobConfig
+from .pipeline import CANCELLED, FAILED, REJECTED, SUCCESS, JobPipeline
+from .throughput import probe_resolution
+from .utils import normalize_fps
+
+try:
+    import opentimelineio as otio
+except ImportError:
+    otio = None
+
+IMPORT_FORMATS = ("csv", "edl", "otio")
+
+# Column names accepted in CSV shot lists, mapped to ``ConformShot`` fields.
+_CSV_COLUMNS = {
+    "folder": "input_folder",
+    "input_folder": "input_folder",
+    "pattern": "filename_pattern",
+    "filename_pattern": "filename_pattern",
+    "in": "start_frame",
+    "start_frame": "start_frame",
+    "out": "end_frame",
+    "end_frame": "end_frame",
+    "name": "name",
+    "shot": "name",
+}
+
+_EDL_EVENT_RE = re.compile(
+    r"^\s*(\d+)\s+(\S+)\s+(\S+)\s+(C|D|W\d+|K\s*[BO]?)\s*(\d*)\s+"
+    r"(\d{2}:\d{2}:\d{2}[:;]\d{2})\s+(\d{2}:\d{2}:\d{2}[:;]\d{2})\s+"
+    r"(\d{2}:\d{2}:\d{2}[:;]\d{2})\s+(\d{2}:\d{2}:\d{2}[:;]\d{2})"
+)
+_EDL_CLIP_RE = re.compile(r"^\s*\*\s*FROM CLIP NAME:\s*(.+?)\s*$", re.IGNORECASE)
+_HASH_PADDING_RE = re.compile(r"#+")
+
+
+class ConformShot(BaseModel):
+    input_folder: str
+    filename_pattern: str
+    start_frame: int
+    end_frame: int
+    name: Optional[str] = None
+    # Scale already applied by the EXR pre-pass (set by ``run``).
+    input_scale: float = 1.0
+
+
+class ConformJobConfig(BaseModel):
+    shots: List[ConformShot]
+    output_folder: str
+    output_filename: str
+    frame_rate: str
+    codec: str
+    mp4_bitrate: Optional[str] = None
+    prores_profile: Optional[str] = None
+    prores_qscale: Optional[str] = None
+    audio_option: str = "No Audio"
+    profile: str = "delivery"
+    # Baked 3D LUT applied by FFmpeg when EXR shots are read directly.
+    lut_path: Optional[str] = None
+    # CPU/IO priority of the spawned processes: interactive, batch or background.
+    scheduling_class: str = "interactive"
+
+
+def shot_length(shot: ConformShot) -> int:
+    """Return the number of frames a shot contributes to the reel."""
+    return shot.end_frame - shot.start_frame + 1
+
+
+def validate(conform: ConformJobConfig) -> None:
+    """Check a conform job before it is queued.
+
+    Raises:
+        ValueError: If the shot list is empty or a shot is malformed.
+    """
+    if not conform.shots:
+        raise ValueError("A conform job needs at least one shot")
+    profiles.get_profile(conform.profile)
+    scheduling.get_class(conform.scheduling_class)
+    for index, shot in enumerate(conform.shots, start=1):
+        label = shot.name or f"shot {index}"
+        if "%" not in shot.filename_pattern:
+            raise ValueError(f"{label}: pattern must contain a frame placeholder such as %04d")
+        if shot.end_frame < shot.start_frame:
+            raise ValueError(f"{label}: out frame {shot.end_frame} is before in frame {shot.start_frame}")
+        if not os.path.isdir(shot.input_folder):
+            raise ValueError(f"{label}: folder does not exist: {shot.input_folder}")
+
+
+def encode_job_config(conform: ConformJobConfig) -> FFmpegJobConfig:
+    """Return the single-shot job whose codec settings the reel is encoded with."""
+    first = conform.shots[0]
+    total = sum(shot_length(shot) for shot in conform.shots)
+    out_fps = normalize_fps(conform.frame_rate)[0]
+    return FFmpegJobConfig(
+        input_folder=first.input_folder,
+        filename_pattern=first.filename_pattern,
+        output_folder=conform.output_folder,
+        output_filename=conform.output_filename,
+        frame_rate=conform.frame_rate,
+        source_frame_rate=conform.frame_rate,
+        desired_duration=repr(total / out_fps) if out_fps > 0 else "0",
+        codec=conform.codec,
+        mp4_bitrate=conform.mp4_bitrate,
+        prores_profile=conform.prores_profile,
+        prores_qscale=conform.prores_qscale,
+        audio_option=conform.audio_option,
+        start_frame=first.start_frame,
+        end_frame=first.start_frame + total - 1,
+        profile=conform.profile,
+        lut_path=conform.lut_path,
+    )
+
+
+def reel_size(conform: ConformJobConfig) -> Tuple[Optional[int], Optional[int]]:
+    """Return the frame size every shot is fitted to (the first shot's size).
+
+    The draft profile's scale factor is already applied. Returns
+    ``(None, None)`` if the first frame cannot be probed.
+    """
+    first = conform.shots[0]
+    width, height = probe_resolution(
+        os.path.join(first.input_folder, first.filename_pattern % first.start_frame)
+    )
+    if not width or not height:
+        return None, None
+    factor = profiles.get_profile(conform.profile)["scale"]
+    if factor < 1.0:
+        width, height = int(width * factor), int(height * factor)
+    # 4:2:0 output needs even dimensions.
+    return width - width % 2, height - height % 2
+
+
+def build_command(
+    handler: FFmpegHandler,
+    conform: ConformJobConfig,
+    output_path: str,
+    size: Tuple[Optional[int], Optional[int]] = (None, None),
+    threads: Optional[int] = None,
+    frame_lists: Optional[Dict[int, str]] = None,
+) -> Tuple[List[str], int]:
+    """Build the single FFmpeg command that encodes the whole reel.
+
+    ``conform.shots`` must already point at frames FFmpeg can read (the
+    pre-pass output for EXR shots unless ``conform.lut_path`` is set).
+    ``threads`` is the encode's CPU budget share. ``frame_lists`` maps the
+    index of a shot with missing frames to its ``frames.write_concat_list``
+    file, which replaces the shot's image-sequence input.
+
+    Returns:
+        ``(cmd, total_frames)``.
+
+    Raises:
+        ValueError: If the codec settings are incomplete.
+    """
+    job = encode_job_config(conform)
+    pix_fmt, codec_params = handler.video_codec_params(job, threads=threads)
+    out_fps, out_ffmpeg_fps, out_num, _ = normalize_fps(conform.frame_rate)
+    total = sum(shot_length(shot) for shot in conform.shots)
+    width, height = size
+
+    cmd = ["ffmpeg", "-y"]
+    chains = []
+    for index, shot in enumerate(conform.shots):
+        frame_list = (frame_lists or {}).get(index)
+        if frame_list:
+            # The list covers exactly the cut, holding frames over the holes.
+            cmd += frames.concat_input_args(frame_list)
+            filters = ["setpts=PTS-STARTPTS"]
+        else:
+            cmd += [
+                "-start_number", str(shot.start_frame),
+                "-framerate", out_ffmpeg_fps,
+                "-i", os.path.join(shot.input_folder, shot.filename_pattern),
+            ]
+            filters = [f"trim=end_frame={shot_length(shot)}", "setpts=PTS-STARTPTS"]
+        if width and height:
+            filters += [
+                f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+                "setsar=1",
+            ]
+        else:
+            draft_scale = profiles.scale_filter(conform.profile, shot.input_scale)
+            if draft_scale:
+                filters.append(draft_scale)
+        if conform.lut_path and shot.filename_pattern.lower().endswith(".exr"):
+            filters.append(f"lut3d=file='{conform.lut_path}'")
+        chains.append(f"[{index}:v]{','.join(filters)}[v{index}]")
+
+    joined = "".join(f"[v{index}]" for index in range(len(conform.shots)))
+    chains.append(
+        f"{joined}concat=n={len(conform.shots)}:v=1:a=0,fps={out_ffmpeg_fps},"
+        "scale=in_color_matrix=bt709:out_color_matrix=bt709[reel]"
+    )
+    if threads and capabilities.ffmpeg_option("filter_complex_threads"):
+        cmd += ["-filter_complex_threads", str(threads)]
+    cmd += ["-filter_complex", ";".join(chains), "-map", "[reel]"]
+
+    if conform.audio_option == "Blank Audio Track":
+        cmd += [
+            "-f", "lavfi",
+            "-i", "anullsrc=channel_layout=stereo:sample_rate=48000",
+            "-map", f"{len(conform.shots)}:a",
+            "-shortest",
+            "-c:a", "aac", "-b:a", "128k",
+        ]
+    else:
+        cmd += ["-an"]
+
+    track_timescale = str(out_num) if out_num is not None else str(int(round(out_fps * 1000)))
+    cmd += [
+        "-fps_mode", "cfr",
+        *resources.ffmpeg_thread_args(threads),
+        "-pix_fmt", pix_fmt,
+        "-video_track_timescale", track_timescale,
+        *codec_params,
+        "-color_primaries", "bt709",
+        "-color_trc", "bt709",
+        "-colorspace", "bt709",
+        *profiles.metadata_args(conform.profile),
+        "-frames:v", str(total),
+        output_path,
+    ]
+    return cmd, total
+
+
+def run(job_pipeline: JobPipeline, conform_config: ConformJobConfig) -> str:
+    """Pre-pass the EXR shots of a reel, then encode all shots at once.
+
+    Runs in ``job_pipeline``'s handlers and stage slots, like ``JobPipeline.run``.
+
+    Returns:
+        A ``pipeline`` outcome: ``SUCCESS``, ``FAILED``, ``REJECTED`` or ``CANCELLED``.
+    """
+    log = job_pipeline.log_callback
+    exr_handler = job_pipeline.exr_handler
+    ffmpeg_handler = job_pipeline.ffmpeg_handler
+    temp_dirs: List[str] = []
+    list_dir = ""
+    try:
+        # Probe the reel size on the source frames, before any resampling.
+        size = reel_size(conform_config)
+        if size[0] is None:
+            log(
+                "output",
+                "Warning: could not probe the first shot; shots are not resized to match.\n",
+            )
+
+        for index, shot in enumerate(conform_config.shots, start=1):
+            if shot.filename_pattern.lower().endswith(".exr") and not job_pipeline.preflight(
+                shot, f"shot {index} ({shot.name or shot.filename_pattern})"
+            ):
+                return REJECTED
+
+        shots: List[ConformShot] = []
+        count = len(conform_config.shots)
+        for index, shot in enumerate(conform_config.shots, start=1):
+            if job_pipeline.is_cancelled:
+                return CANCELLED
+            if shot.filename_pattern.lower().endswith(".exr") and not conform_config.lut_path:
+                log(
+                    "output",
+                    f"EXR pre-pass for shot {index}/{count} "
+                    f"({shot.name or shot.filename_pattern})...\n",
+                )
+                # One pre-pass slot per shot lets other jobs' pre-passes interleave.
+                with stages.SLOTS.slot(
+                    stages.PREPASS,
+                    log,
+                    conform_config.scheduling_class,
+                    lambda: job_pipeline.is_cancelled,
+                ) as held:
+                    if not held:
+                        return CANCELLED
+                    temp_dir = exr_handler.convert_exr_sequence(
+                        input_folder=shot.input_folder,
+                        pattern=shot.filename_pattern,
+                        start_frame=shot.start_frame,
+                        end_frame=shot.end_frame,
+                        profile=conform_config.profile,
+                        scheduling_class=conform_config.scheduling_class,
+                    )
+                if not temp_dir or exr_handler.is_cancelled:
+                    if not exr_handler.is_cancelled:
+                        log("error", f"EXR Conversion failed for shot {index}.")
+                        return FAILED
+                    return CANCELLED
+                if temp_dir not in temp_dirs:
+                    temp_dirs.append(temp_dir)
+                prefix = shot.filename_pattern.split("%")[0]
+                shot = shot.model_copy(
+                    update={
+                        "input_folder": temp_dir,
+                        "filename_pattern": f"{prefix}%04d.png",
+                        "input_scale": profiles.prepass_scale(conform_config.profile),
+                    }
+                )
+            shots.append(shot)
+
+        if job_pipeline.is_cancelled:
+            return CANCELLED
+
+        # Shots with holes are read from lists that hold the previous frame.
+        out_fps = normalize_fps(conform_config.frame_rate)[0]
+        frame_lists: Dict[int, str] = {}
+        for index, shot in enumerate(shots):
+            missing = frames.missing_frames(
+                shot.input_folder, shot.filename_pattern, shot.start_frame, shot.end_frame
+            )
+            if not missing:
+                continue
+            log(
+                "output",
+                f"Warning: shot {index + 1} ({shot.name or shot.filename_pattern}) is missing "
+                f"{len(missing)} frames, holding the previous frame: "
+                f"{frames.format_frame_ranges(missing)}\n",
+            )
+            list_dir = list_dir or tempfile.mkdtemp(prefix="ffmpeg_web_conform_")
+            try:
+                frame_lists[index] = frames.write_concat_list(
+                    shot.input_folder, shot.filename_pattern, shot.start_frame,
+                    shot.end_frame, missing, out_fps, directory=list_dir,
+                )
+            except ValueError as exc:
+                log("error", f"Shot {index + 1}: {exc}")
+                return FAILED
+
+        reel = conform_config.model_copy(update={"shots": shots})
+        output_path = os.path.join(
+            reel.output_folder, profiles.tag_filename(reel.output_filename, reel.profile)
+        )
+        os.makedirs(reel.output_folder, exist_ok=True)
+        cpu_set = scheduling.cpu_set_for(reel.scheduling_class)
+        with stages.SLOTS.slot(
+            stages.ENCODE, log, reel.scheduling_class, lambda: job_pipeline.is_cancelled
+        ) as held:
+            if not held:
+                return CANCELLED
+            with resources.BUDGET.reserve(
+                f"encode {os.path.basename(output_path)}",
+                log,
+                limit=len(cpu_set) if cpu_set else None,
+            ) as allocation:
+                try:
+                    cmd, total = build_command(
+                        ffmpeg_handler, reel, output_path, size, allocation.threads, frame_lists
+                    )
+                except ValueError as exc:
+                    log("error", str(exc))
+                    return FAILED
+
+                log("output", f"Encoding {count} shots ({total} frames) into one reel...\n")
+                if ffmpeg_handler.run_command(
+                    cmd, total, announce=True, scheduling_class=reel.scheduling_class
+                ):
+                    return SUCCESS
+                return CANCELLED if ffmpeg_handler.is_cancelled else FAILED
+
+    except Exception as exc:  # noqa: BLE001
+        log("error", f"Critical Job Error: {exc}")
+        return FAILED
+    finally:
+        if list_dir:
+            shutil.rmtree(list_dir, ignore_errors=True)
+        for temp_dir in temp_dirs:
+            exr_handler.temp_dir = temp_dir
+            try:
+                exr_handler.cleanup()
+            except Exception as cleanup_exc:  # noqa: BLE001
+                log(
+                    "output",
+                    f"Warning: problem during EXR temp cleanup: {cleanup_exc}\n",
+                )
+
+
+# --- Shot list import ---
+
+def parse_csv(text: str) -> List[ConformShot]:
+    """Parse a CSV shot list with a header row.
+
+    Raises:
+        ValueError: If a required column is missing or a row is invalid.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    columns = {
+        name: _CSV_COLUMNS[name.strip().lower()]
+        for name in reader.fieldnames or []
+        if name and name.strip().lower() in _CSV_COLUMNS
+    }
+    missing = {"input_folder", "filename_pattern", "start_frame", "end_frame"} - set(columns.values())
+    if missing:
+        raise ValueError(f"CSV shot list is missing columns: {', '.join(sorted(missing))}")
+
+    shots = []
+    for line_number, row in enumerate(reader, start=2):
+        data: Dict[str, Any] = {
+            field: (row.get(column) or "").strip() for column, field in columns.items()
+        }
+        if not any(data.values()):
+            continue
+        try:
+            shots.append(ConformShot(**data))
+        except ValueError as e:
+            raise ValueError(f"CSV line {line_number}: {e}") from e
+    return shots
+
+
+def timecode_to_frames(timecode: str, fps: int) -> int:
+    """Convert ``HH:MM:SS:FF`` (non-drop) to a frame count."""
+    hours, minutes, seconds, frames = (int(part) for part in re.split(r"[:;]", timecode))
+    return ((hours * 60 + minutes) * 60 + seconds) * fps + frames
+
+
+def _resolve_clip(clip: str, media_root: str) -> Tuple[str, str]:
+    """Return ``(folder, pattern)`` for an EDL clip name."""
+    clip = _HASH_PADDING_RE.sub(lambda m: f"%0{len(m.group(0))}d", clip)
+    path = clip if os.path.isabs(clip) else os.path.join(media_root, clip)
+    if "%" in os.path.basename(path):
+        return os.path.dirname(path), os.path.basename(path)
+    if os.path.isdir(path):
+        sequences = explorer.scan_for_sequences(path)
+        if sequences:
+            return path, sequences[0].pattern
+    raise ValueError(f"Cannot find an image sequence for clip '{clip}'")
+
+
+def parse_edl(text: str, frame_rate: str, media_root: str = "") -> List[ConformShot]:
+    """Parse the video events of a CMX3600 EDL.
+
+    Each event must be followed by a ``* FROM CLIP NAME:`` comment naming
+    either a sequence pattern (``sh010/sh010.%04d.exr`` or ``sh010.####.exr``)
+    or a folder holding one sequence, relative to ``media_root``. Source
+    timecode in/out (out exclusive) is converted to frame numbers.
+
+    Raises:
+        ValueError: If an event's clip cannot be resolved.
+    """
+    fps = int(round(normalize_fps(frame_rate)[0]))
+    if fps <= 0:
+        raise ValueError(f"Invalid EDL frame rate: {frame_rate}")
+
+    events: List[Dict[str, Any]] = []
+    for line in text.splitlines():
+        match = _EDL_EVENT_RE.match(line)
+        if match:
+            track = match.group(3).upper()
+            events.append({
+                "event": match.group(1),
+                "reel": match.group(2),
+                "video": track.startswith("V") or track == "B",
+                "src_in": timecode_to_frames(match.group(6), fps),
+                "src_out": timecode_to_frames(match.group(7), fps),
+                "clip": None,
+            })
+            continue
+        clip = _EDL_CLIP_RE.match(line)
+        if clip and events:
+            events[-1]["clip"] = clip.group(1)
+
+    shots = []
+    for event in events:
+        if not event["video"] or event["src_out"] <= event["src_in"]:
+            continue
+        clip = event["clip"] or event["reel"]
+        try:
+            folder, pattern = _resolve_clip(clip, media_root)
+        except ValueError as e:
+            raise ValueError(f"EDL event {event['event']}: {e}") from e
+        shots.append(ConformShot(
+            input_folder=folder,
+            filename_pattern=pattern,
+            start_frame=event["src_in"],
+            end_frame=event["src_out"] - 1,
+            name=clip,
+        ))
+    return shots
+
+
+def parse_otio(text: str) -> List[ConformShot]:
+    """Read the clips of the first video track of an OpenTimelineIO timeline.
+
+    Only clips referencing image sequences (``ImageSequenceReference``) can be
+    conformed.
+
+    Raises:
+        ValueError: If ``opentimelineio`` is missing or a clip is not an image
+            sequence.
+    """
+    if otio is None:
+        raise ValueError("OTIO import requires the 'opentimelineio' package")
+
+    timeline = otio.adapters.read_from_string(text, "otio_json")
+    tracks = timeline.video_tracks()
+    if not tracks:
+        return []
+
+    shots = []
+    for clip in tracks[0].find_clips():
+        ref = clip.media_reference
+        if not isinstance(ref, otio.schema.ImageSequenceReference):
+            raise ValueError(f"Clip '{clip.name}' does not reference an image sequence")
+        source_range = clip.source_range or clip.available_range()
+        folder = ref.target_url_base
+        if folder.startswith("file://"):
+            folder = folder[len("file://"):]
+        shots.append(ConformShot(
+            input_folder=folder.rstrip("/"),
+            filename_pattern=f"{ref.name_prefix}%0{ref.frame_zero_padding}d{ref.name_suffix}",
+            start_frame=ref.frame_for_time(source_range.start_time),
+            end_frame=ref.frame_for_time(source_range.end_time_inclusive()),
+            name=clip.name or None,
+        ))
+    return shots
+
+
+def import_shot_list(
+    fmt: str,
+    content: str,
+    frame_rate: str = "24",
+    media_root: str = "",
+) -> List[ConformShot]:
+    """Parse a shot list in one of ``IMPORT_FORMATS``.
+
+    Raises:
+        ValueError: If the format is unknown or the content cannot be parsed.
+    """
+    fmt = fmt.lower()
+    if fmt == "csv":
+        return parse_csv(content)
+    if fmt == "edl":
+        return parse_edl(content, frame_rate, media_root)
+    if fmt == "otio":
+        return parse_otio(content)
+    raise ValueError(f"Unknown shot list format '{fmt}'. Expected one of: {', '.join(IMPORT_FORMATS)}")
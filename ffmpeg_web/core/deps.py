@@ -7,19 +7,16 @@ the FastAPI app to report health and to gate EXR-specific operations.
 
 from __future__ import annotations
 
-import shutil
 import subprocess
 import sys
 from typing import Any, Dict
 
+from . import capabilities
 
-def _check_oiiotool() -> Dict[str, Any]:
-    """Check if ``oiiotool`` is available on the current PATH."""
-    path = shutil.which("oiiotool")
-    return {
-        "available": path is not None,
-        "path": path,
-    }
+
+def _check_oiiotool(refresh: bool = False) -> Dict[str, Any]:
+    """Check if ``oiiotool`` is available on the current PATH, with its capabilities."""
+    return capabilities.probe_tool("oiiotool", refresh)
 
 
 def _ensure_clique_import() -> Dict[str, Any]:
@@ -69,11 +66,12 @@ def _maybe_install_clique() -> bool:
         return False
 
 
-def check_dependencies(install_missing: bool = False) -> Dict[str, Any]:
+def check_dependencies(install_missing: bool = False, refresh: bool = False) -> Dict[str, Any]:
     """Check external/runtime dependencies required by the FFmpeg web UI.
 
     Validates:
 
+    - ``ffmpeg`` availability on PATH, with the capabilities of the build.
     - ``oiiotool`` availability on PATH (for EXR conversion).
     - The Python ``clique`` package used for image sequence detection.
 
@@ -81,6 +79,8 @@ def check_dependencies(install_missing: bool = False) -> Dict[str, Any]:
         install_missing: If True, attempt to install missing Python packages
             such as ``clique`` using ``pip``. This flag is kept False by
             default for server safety.
+        refresh: If True, probe the tool capabilities again instead of using
+            the cache.
 
     Returns:
         A structured status dictionary with at least:
@@ -91,8 +91,13 @@ def check_dependencies(install_missing: bool = False) -> Dict[str, Any]:
     """
     issues = []
 
+    # --- ffmpeg ---
+    ffmpeg_info = capabilities.probe_tool("ffmpeg", refresh)
+    if not ffmpeg_info["available"]:
+        issues.append("ffmpeg not found on PATH; conversion is unavailable.")
+
     # --- oiiotool ---
-    oiiotool_info = _check_oiiotool()
+    oiiotool_info = _check_oiiotool(refresh)
     if not oiiotool_info["available"]:
         issues.append("oiiotool not found on PATH; EXR conversion is unavailable.")
 
@@ -117,6 +122,7 @@ def check_dependencies(install_missing: bool = False) -> Dict[str, Any]:
         "ok": not issues,
         "issues": issues,
         "details": {
+            "ffmpeg": ffmpeg_info,
             "oiiotool": oiiotool_info,
             "clique": clique_info,
         },
@@ -31,6 +31,8 @@ class SequenceItem(BaseModel):
     count: int
     pattern: str
     range_string: str
+    # Frames between start and end that are not on disk.
+    missing: List[int] = []
 
 def get_directory_contents(path: str = None) -> BrowseResponse:
     """List contents of a directory."""
@@ -111,6 +113,8 @@ def scan_for_sequences(folder_path: str) -> List[SequenceItem]:
 
             start = min(indexes)
             end = max(indexes)
+            present = set(indexes)
+            missing = [frame for frame in range(start, end + 1) if frame not in present]
 
             # Reconstruct pattern: head + %0Xd + tail
             # Clique gives us full paths in head/tail; the web UI and
@@ -131,7 +135,10 @@ def scan_for_sequences(folder_path: str) -> List[SequenceItem]:
                 end=end,
                 count=len(indexes),
                 pattern=pattern,
-                range_string=f"[{start}-{end}]",
+                range_string=(
+                    f"[{start}-{end}]" + (f" ({len(missing)} missing)" if missing else "")
+                ),
+                missing=missing,
             )
             sequence_items.append(item)
             
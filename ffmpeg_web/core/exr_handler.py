@@ -1,9 +1,12 @@
 import os
 import subprocess
 import shutil
-import time
-from typing import Callable, List, Tuple
+import tempfile
 from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .throughput import EtaTracker
+from . import frames as frame_utils, profiles, resources, scheduling
 
 class ExrHandler:
     def __init__(self, log_callback: Callable[[str, str], None]):
@@ -11,6 +14,12 @@ class ExrHandler:
         self.is_cancelled = False
         self.temp_dir = ""
         self.active_processes = []
+        # preexec_fn applying the job's scheduling class to oiiotool workers.
+        self.preexec_fn = None
+        # Input frames the last conversion skipped because they do not exist.
+        self.missing_frames: List[int] = []
+        # Frames and seconds of the last completed conversion, for throughput history.
+        self.last_stats: Optional[Dict[str, float]] = None
         
         # Hardcoded from original script
         self.ocio_config = "/mnt/studio/config/ocio/aces_1.2/config.ocio"
@@ -20,30 +29,53 @@ class ExrHandler:
                            pattern: str, 
                            start_frame: int, 
                            end_frame: int, 
-                           color_space: str = "ACES - ACEScg") -> str:
+                           color_space: str = "ACES - ACEScg",
+                           predicted_fps: Optional[float] = None,
+                           profile: Optional[str] = None,
+                           frames: Optional[List[int]] = None,
+                           scheduling_class: Optional[str] = None,
+                           temp_dir: Optional[str] = None) -> str:
         """
         Convert EXR sequence to PNGs in a temp directory.
+        ``predicted_fps`` seeds the ETA with the rate expected from history.
+        ``profile`` selects a speed profile; ``draft`` resamples frames early.
+        ``frames`` restricts the conversion to a subset of the range.
+        ``scheduling_class`` sets the nice/ionice/CPU-set policy of the workers.
+        ``temp_dir`` reuses a cache directory; frames already in it are kept.
         Returns the path to the temp directory on success, or empty string on failure.
         """
         self.is_cancelled = False
         self.active_processes = []
+        self.last_stats = None
+        self.missing_frames = []
+        try:
+            self.preexec_fn = scheduling.preexec_for(scheduling_class)
+            cpu_set = scheduling.cpu_set_for(scheduling_class)
+        except ValueError as e:
+            self.log_callback('error', str(e))
+            return ""
 
         # 1. Setup Temp Dir
         prefix = pattern.split('%')[0]
-        self.temp_dir = os.path.join(input_folder, f"ffmpeg_web_tmp_{int(time.time())}")
-        
+        # A resumed or pre-warmed job reuses its directory; a new one gets a
+        # fresh one, so jobs started in the same second never share it.
         try:
-            os.makedirs(self.temp_dir, exist_ok=True)
+            if temp_dir:
+                self.temp_dir = temp_dir
+                os.makedirs(self.temp_dir, exist_ok=True)
+            else:
+                self.temp_dir = tempfile.mkdtemp(prefix="ffmpeg_web_tmp_", dir=input_folder)
             self.log_callback('output', f"Created temp directory: {self.temp_dir}\n")
         except Exception as e:
             # Fallback to /tmp
-            self.temp_dir = os.path.join("/tmp", f"ffmpeg_web_tmp_{int(time.time())}")
             try:
-                os.makedirs(self.temp_dir, exist_ok=True)
+                self.temp_dir = tempfile.mkdtemp(prefix="ffmpeg_web_tmp_", dir="/tmp")
                 self.log_callback('output', f"Created fallback temp directory: {self.temp_dir}\n")
             except Exception as e2:
                 self.log_callback('error', f"Failed to create temp directory: {e2}")
                 return ""
+        # Recorded so a restarted server can resume or remove it.
+        self.log_callback('temp_dir', self.temp_dir)
 
         # 2. Identify missing frames
         missing_frames = []
@@ -54,9 +86,19 @@ class ExrHandler:
         # Assuming pattern is standard printf style
         before = pattern.split('%')[0] 
 
-        cmds: List[Tuple[List[str], int]] = []
+        # One listing each of the input and temp folders answers every
+        # existence check below.
+        try:
+            inputs = frame_utils.FrameManifest.scan(input_folder, pattern)
+        except ValueError as e:
+            self.log_callback('error', str(e))
+            return ""
+        converted = frame_utils.FrameManifest.scan(self.temp_dir, f"{before}%04d.png")
+
+        cmds: List[Tuple[List[str], int, str, str]] = []
+        resample_args = profiles.oiiotool_resample_args(profile)
         
-        for frame in range(start_frame, end_frame + 1):
+        for frame in (frames if frames is not None else range(start_frame, end_frame + 1)):
             # Construct input filename
             # Note: This simple replacement assumes %04d style. 
             # Ideally use formatting, but we need to match the exact placeholder logic
@@ -73,13 +115,18 @@ class ExrHandler:
                  
             input_file = os.path.join(input_folder, input_file_name)
             output_file = os.path.join(self.temp_dir, f"{before}{frame:04d}.png")
+            # Written under a name the sequence pattern does not match and renamed
+            # when complete, so an interrupted conversion never leaves a partial
+            # frame that a later run would take as done.
+            partial_file = os.path.join(self.temp_dir, f"{before}{frame:04d}.partial.png")
 
-            if os.path.exists(output_file):
+            if frame in converted:
                 continue
             
-            if not os.path.exists(input_file):
-                self.log_callback('error', f"Input frame missing: {input_file}")
-                return ""
+            if frame not in inputs:
+                # Holes are held from the previous frame at encode time.
+                self.missing_frames.append(frame)
+                continue
 
             cmd = [
                 "oiiotool",
@@ -88,13 +135,24 @@ class ExrHandler:
                 "--threads", "1",
                 input_file,
                 "--ch", "R,G,B",
+                *resample_args,
                 "--colorconvert", color_space, "Output - sRGB",
                 "-d", "uint8",
                 "--compression", "none",
-                "--no-clobber",
-                "-o", output_file
+                "-o", partial_file
             ]
-            cmds.append((cmd, frame))
+            cmds.append((cmd, frame, partial_file, output_file))
+
+        if self.missing_frames:
+            requested = len(frames) if frames is not None else end_frame - start_frame + 1
+            if len(self.missing_frames) == requested:
+                self.log_callback('error', f"No input frames found for {pattern}")
+                return ""
+            self.log_callback(
+                'output',
+                f"Warning: skipping {len(self.missing_frames)} missing EXR frames: "
+                f"{frame_utils.format_frame_ranges(self.missing_frames)}\n"
+            )
 
         if not cmds:
             self.log_callback('output', "All frames already converted/exist.\n")
@@ -105,41 +163,53 @@ class ExrHandler:
         
         self.log_callback('output', f"Starting conversion of {total_files} EXR frames...\n")
 
-        # 3. Execute in ThreadPool
-        max_workers = min(os.cpu_count() or 4, 8)
+        # 3. Execute in ThreadPool, one single-threaded oiiotool per budgeted CPU
+        eta = EtaTracker(total_files, predicted_fps)
+        allocation = resources.BUDGET.acquire(
+            f"EXR pre-pass {before or pattern}", limit=len(cpu_set) if cpu_set else None
+        )
+        resources.BUDGET.log_allocation(allocation, self.log_callback)
+        max_workers = min(allocation.threads, 8, total_files)
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = []
-            for cmd_info in cmds:
-                if self.is_cancelled:
-                    break
-                future = executor.submit(self._process_single_frame, cmd_info)
-                futures.append(future)
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = []
+                for cmd_info in cmds:
+                    if self.is_cancelled:
+                        break
+                    future = executor.submit(self._process_single_frame, cmd_info)
+                    futures.append(future)
             
-            # Monitor progress
-            for future in futures:
-                if self.is_cancelled:
-                    break
+                # Monitor progress
+                for future in futures:
+                    if self.is_cancelled:
+                        break
                 
-                result = future.result() # (frame, return_code, error)
-                if result[1] != 0:
-                    self.log_callback('error', f"Frame {result[0]} failed: {result[2]}")
-                    self.cancel()
-                    return ""
+                    result = future.result() # (frame, return_code, error)
+                    if result[1] != 0:
+                        self.log_callback('error', f"Frame {result[0]} failed: {result[2]}")
+                        self.cancel()
+                        return ""
                 
-                completed_files += 1
-                progress = (completed_files / total_files) * 100
-                self.log_callback('progress', str(progress))
+                    completed_files += 1
+                    progress = (completed_files / total_files) * 100
+                    self.log_callback('progress', str(progress))
+                    remaining = eta.update(completed_files)
+                    if remaining is not None:
+                        self.log_callback('eta', f"{remaining:.1f}")
+        finally:
+            resources.BUDGET.release(allocation)
         
         if self.is_cancelled:
             self.log_callback('cancelled', "EXR conversion cancelled.")
             return ""
-            
+
+        self.last_stats = {"frames": total_files, "seconds": eta.elapsed}
         return self.temp_dir
 
-    def _process_single_frame(self, cmd_info):
+    def _process_single_frame(self, cmd_info: Tuple[List[str], int, str, str]) -> Tuple[int, int, str]:
         """Run ``oiiotool`` for a single frame and return its result tuple."""
-        cmd, frame_num = cmd_info
+        cmd, frame_num, partial_file, output_file = cmd_info
         if self.is_cancelled:
             return (frame_num, -1, "Cancelled")
             
@@ -148,14 +218,17 @@ class ExrHandler:
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                universal_newlines=True
+                universal_newlines=True,
+                preexec_fn=self.preexec_fn
             )
             self.active_processes.append(process)
             stdout, stderr = process.communicate()
             
             if process in self.active_processes:
                 self.active_processes.remove(process)
-                
+
+            if process.returncode == 0:
+                os.replace(partial_file, output_file)
             return (frame_num, process.returncode, stderr)
         except Exception as e:
             return (frame_num, -1, str(e))
@@ -0,0 +1,627 @@
+"""Shared-filesystem work queue: split one job across worker processes and hosts.
+
+A distributed job lives in its own directory under a queue root on shared
+storage (NFS or similar)::
+
+    <queue>/<job_id>/job.json        job settings, written last
+    <queue>/<job_id>/tasks/pending/  <task>.json, ready to claim
+    <queue>/<job_id>/tasks/leased/   <task>~<worker>~<expires_ms>.json
+    <queue>/<job_id>/tasks/done/     <task>.json
+    <queue>/<job_id>/tasks/failed/   <task>.json, out of attempts
+    <queue>/<job_id>/frames/         EXR pre-pass PNGs
+    <queue>/<job_id>/segments/       encoded movie segments
+    <queue>/<job_id>/cancelled       present once the job is cancelled
+
+Every state change is a ``rename``, which is atomic within one filesystem,
+NFS included. A worker claims a task by renaming it from ``pending`` into
+``leased`` with its id and lease expiry in the name; of several racing
+workers only one rename succeeds. The holder renews the lease by renaming it
+again with a later expiry. Anyone may take over an expired lease and return
+the task to ``pending``, counting an attempt, so the tasks of a crashed host
+run again. Expiry is wall-clock time, so hosts need synchronised clocks.
+
+``FarmCoordinator`` splits a job into EXR pre-pass chunks, then into encode
+segments of whole closed GOPs (as in ``smart_encode``), and stream-copies the
+segments into the final movie once every task is done. Jobs that retime,
+carry audio or write fragmented MP4 encode as one segment; only their
+pre-pass is split. ``FarmWorker`` runs on any number of hosts. Task outputs
+are written under a temporary name and renamed into place, so a task that
+runs twice after a lease race is harmless.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import preflight, profiles, smart_encode
+from .exr_handler import ExrHandler
+from .ffmpeg_handler import FFmpegHandler, FFmpegJobConfig
+from .frames import FrameManifest
+from .pipeline import CANCELLED, FAILED, REJECTED, SUCCESS
+from .planner import PipelinePlan
+from .utils import normalize_fps
+
+LEASE_SECONDS = 60.0
+RENEW_SECONDS = 15.0
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 1.0
+
+# Frames per EXR pre-pass task.
+PREPASS_CHUNK_FRAMES = 48
+
+# Closed GOPs per encode segment.
+SEGMENT_GOPS = 10
+
+# Workers skip jobs whose coordinator has not touched job.json for this long.
+ORPHAN_SECONDS = 600.0
+
+_STATES = ("pending", "leased", "done", "failed")
+
+
+def worker_id() -> str:
+    """Return an id for this process that is unique across hosts."""
+    return f"{socket.gethostname()}-{os.getpid()}".replace("~", "-")
+
+
+def _read_json(path: str) -> Dict[str, Any]:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    """Write a file under a temporary name and rename it into place."""
+    tmp_path = f"{path}.{worker_id()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _parse_lease(name: str) -> Tuple[str, str, float]:
+    """Return ``(task_id, worker, expires)`` from a lease file name."""
+    task_id, worker, expires_ms = name[: -len(".json")].rsplit("~", 2)
+    return task_id, worker, int(expires_ms) / 1000.0
+
+
+def job_dirs(queue_root: str) -> List[str]:
+    """Return the directories of the jobs in a queue, oldest first."""
+    try:
+        entries = [entry for entry in os.scandir(queue_root) if entry.is_dir()]
+    except FileNotFoundError:
+        return []
+    jobs = [entry.path for entry in entries if os.path.isfile(os.path.join(entry.path, "job.json"))]
+    return sorted(jobs, key=os.path.basename)
+
+
+def is_cancelled(job_dir: str) -> bool:
+    return os.path.exists(os.path.join(job_dir, "cancelled"))
+
+
+def is_orphaned(job_dir: str) -> bool:
+    """Return True if the job's coordinator has stopped updating it."""
+    try:
+        return time.time() - os.stat(os.path.join(job_dir, "job.json")).st_mtime > ORPHAN_SECONDS
+    except OSError:
+        return True
+
+
+class Lease:
+    """A claimed task. Only the holder may complete, fail or release it."""
+
+    def __init__(self, queue: TaskQueue, task_id: str, path: str, payload: Dict[str, Any]):
+        self.queue = queue
+        self.task_id = task_id
+        self.path = path
+        self.payload = payload
+        self._lock = threading.Lock()
+
+    def renew(self) -> bool:
+        """Extend the lease; False if it expired and was taken over."""
+        with self._lock:
+            path = self.queue.lease_path(self.task_id)
+            try:
+                os.rename(self.path, path)
+            except FileNotFoundError:
+                return False
+            self.path = path
+            return True
+
+    def complete(self) -> None:
+        """Mark the task done."""
+        with self._lock:
+            try:
+                os.rename(self.path, self.queue.state_path("done", self.task_id))
+            except FileNotFoundError:
+                # Taken over after expiring; the rerun writes the same output.
+                pass
+
+    def fail(self, error: str) -> None:
+        """Count a failed attempt and requeue the task, or fail it for good."""
+        with self._lock:
+            self.payload["attempts"] = self.payload.get("attempts", 0) + 1
+            self.payload["error"] = error
+            state = "failed" if self.payload["attempts"] >= MAX_ATTEMPTS else "pending"
+            _write_json(self.queue.state_path(state, self.task_id), self.payload)
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def release(self) -> None:
+        """Return the task to ``pending`` without counting an attempt."""
+        with self._lock:
+            try:
+                os.rename(self.path, self.queue.state_path("pending", self.task_id))
+            except FileNotFoundError:
+                pass
+
+
+class TaskQueue:
+    """The task directories of one distributed job."""
+
+    def __init__(self, job_dir: str, worker: Optional[str] = None):
+        self.job_dir = job_dir
+        self.worker = worker or worker_id()
+        self.dirs = {state: os.path.join(job_dir, "tasks", state) for state in _STATES}
+
+    def create(self) -> None:
+        for path in self.dirs.values():
+            os.makedirs(path, exist_ok=True)
+
+    def state_path(self, state: str, task_id: str) -> str:
+        return os.path.join(self.dirs[state], f"{task_id}.json")
+
+    def lease_path(self, task_id: str) -> str:
+        """Return a lease file name for this worker expiring ``LEASE_SECONDS`` from now."""
+        expires_ms = int((time.time() + LEASE_SECONDS) * 1000)
+        return os.path.join(self.dirs["leased"], f"{task_id}~{self.worker}~{expires_ms}.json")
+
+    def names(self, state: str) -> List[str]:
+        try:
+            return sorted(name for name in os.listdir(self.dirs[state]) if name.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+    def add(self, task_id: str, payload: Dict[str, Any]) -> None:
+        _write_json(self.state_path("pending", task_id), {"id": task_id, "attempts": 0, **payload})
+
+    def counts(self) -> Dict[str, int]:
+        return {state: len(self.names(state)) for state in _STATES}
+
+    def leases(self) -> List[Tuple[str, str, float]]:
+        """Return ``(task_id, worker, expires)`` for every leased task."""
+        return [_parse_lease(name) for name in self.names("leased")]
+
+    def task_ids(self, state: str) -> List[str]:
+        if state == "leased":
+            return [task_id for task_id, _, _ in self.leases()]
+        return [name[: -len(".json")] for name in self.names(state)]
+
+    def failures(self) -> List[Dict[str, Any]]:
+        """Return the payloads of tasks that ran out of attempts."""
+        failed = []
+        for name in self.names("failed"):
+            try:
+                failed.append(_read_json(os.path.join(self.dirs["failed"], name)))
+            except (OSError, ValueError):
+                continue
+        return failed
+
+    def claim(self) -> Optional[Lease]:
+        """Lease the first pending task, or return None if there is none."""
+        for name in self.names("pending"):
+            task_id = name[: -len(".json")]
+            path = self.lease_path(task_id)
+            try:
+                os.rename(os.path.join(self.dirs["pending"], name), path)
+            except FileNotFoundError:
+                # Another worker claimed it first.
+                continue
+            try:
+                payload = _read_json(path)
+            except (OSError, ValueError):
+                continue
+            return Lease(self, task_id, path, payload)
+        return None
+
+    def reap(self) -> List[str]:
+        """Take over expired leases and requeue their tasks as failed attempts.
+
+        Returns:
+            The ids of the requeued tasks.
+        """
+        now = time.time()
+        reaped = []
+        for name in self.names("leased"):
+            task_id, owner, expires = _parse_lease(name)
+            if expires > now:
+                continue
+            path = self.lease_path(task_id)
+            try:
+                os.rename(os.path.join(self.dirs["leased"], name), path)
+                payload = _read_json(path)
+            except (OSError, ValueError):
+                continue
+            Lease(self, task_id, path, payload).fail(f"lease of {owner} expired")
+            reaped.append(task_id)
+        return reaped
+
+
+class FarmCoordinator:
+    """Split a job into queue tasks, wait for the workers and assemble the output.
+
+    Args:
+        queue_root: Queue directory on storage shared with the workers.
+        log_callback: Receives ``(msg_type, content)`` like ``JobPipeline``.
+        chunk_frames: Frames per EXR pre-pass task.
+        segment_gops: Closed GOPs per encode segment.
+    """
+
+    def __init__(
+        self,
+        queue_root: str,
+        log_callback: Callable[[str, str], None],
+        chunk_frames: int = PREPASS_CHUNK_FRAMES,
+        segment_gops: int = SEGMENT_GOPS,
+    ):
+        self.queue_root = queue_root
+        self.log_callback = log_callback
+        self.chunk_frames = max(chunk_frames, 1)
+        self.segment_gops = max(segment_gops, 1)
+        self.ffmpeg_handler = FFmpegHandler(log_callback)
+        self.is_cancelled = False
+        self.job_dir = ""
+
+    def run(self, job_config: FFmpegJobConfig, plan: PipelinePlan) -> str:
+        """Run a job on the farm; blocks until it ends.
+
+        ``plan`` comes from ``JobPipeline.prepare``.
+
+        Returns:
+            ``SUCCESS``, ``FAILED``, ``REJECTED`` or ``CANCELLED``.
+        """
+        self.is_cancelled = False
+        for option, label in (("smart_reencode", "Smart re-encode"), ("proxy_first", "Proxy first")):
+            if getattr(job_config, option):
+                self.log_callback("output", f"{label} is not supported on the farm; ignored.\n")
+
+        if job_config.filename_pattern.lower().endswith(".exr"):
+            report = preflight.preflight_sequence(
+                job_config.input_folder,
+                job_config.filename_pattern,
+                job_config.start_frame,
+                job_config.end_frame,
+            )
+            preflight.log_report(report, job_config.filename_pattern, self.log_callback)
+            if not report.ok:
+                return REJECTED
+
+        job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.job_dir = os.path.join(self.queue_root, job_id)
+        queue = TaskQueue(self.job_dir)
+        try:
+            queue.create()
+            os.makedirs(os.path.join(self.job_dir, "frames"))
+            os.makedirs(os.path.join(self.job_dir, "segments"))
+            _write_json(
+                os.path.join(self.job_dir, "job.json"),
+                {
+                    "id": job_id,
+                    "config": job_config.model_dump(),
+                    "prepass": plan.prepass,
+                    "coordinator": worker_id(),
+                    "created": time.time(),
+                },
+            )
+            self.log_callback("output", f"Farm job {job_id} in {self.queue_root}.\n")
+
+            encode_config = job_config
+            if plan.uses_oiiotool:
+                chunks = self._prepass_chunks(queue, job_config)
+                if not chunks:
+                    self.log_callback("error", f"No input frames found for {job_config.filename_pattern}")
+                    return FAILED
+                outcome = self._wait(queue, "prepass", chunks)
+                if outcome != SUCCESS:
+                    return outcome
+                prefix = job_config.filename_pattern.split("%")[0]
+                # Relative folders resolve against the job directory on each host.
+                encode_config = job_config.model_copy(
+                    update={
+                        "input_folder": "frames",
+                        "filename_pattern": f"{prefix}%04d.png",
+                        "input_scale": profiles.prepass_scale(job_config.profile),
+                    }
+                )
+
+            segments = self._encode_segments(queue, job_config, encode_config)
+            outcome = self._wait(queue, "encode", [task_id for task_id, _ in segments])
+            if outcome != SUCCESS:
+                return outcome
+            return self._assemble(job_config, [path for _, path in segments])
+        except Exception as exc:  # noqa: BLE001
+            self.log_callback("error", f"Critical Job Error: {exc}")
+            return FAILED
+        finally:
+            self._close()
+
+    def _prepass_chunks(self, queue: TaskQueue, job_config: FFmpegJobConfig) -> List[str]:
+        """Queue the EXR pre-pass in chunks of existing frames; return the task ids."""
+        manifest = FrameManifest.scan(job_config.input_folder, job_config.filename_pattern)
+        present = [f for f in manifest if job_config.start_frame <= f <= job_config.end_frame]
+        task_ids = []
+        for index in range(0, len(present), self.chunk_frames):
+            chunk = present[index:index + self.chunk_frames]
+            task_id = f"prepass_{chunk[0]:08d}"
+            queue.add(
+                task_id,
+                {
+                    "stage": "prepass",
+                    "input_folder": job_config.input_folder,
+                    "pattern": job_config.filename_pattern,
+                    "frames": chunk,
+                    "profile": job_config.profile,
+                    "scheduling_class": job_config.scheduling_class,
+                },
+            )
+            task_ids.append(task_id)
+        return task_ids
+
+    def _encode_segments(
+        self, queue: TaskQueue, job_config: FFmpegJobConfig, encode_config: FFmpegJobConfig
+    ) -> List[Tuple[str, str]]:
+        """Queue the encode segments; return ``(task_id, segment_path)`` in order."""
+        out_fps = normalize_fps(job_config.frame_rate)[0]
+        total = int(round(out_fps * float(job_config.desired_duration)))
+        reason = smart_encode.ineligible_reason(job_config)
+        if reason:
+            self.log_callback("output", f"Encoding as one segment: {reason}.\n")
+            gop = None
+            ranges = [(0, total)]
+        else:
+            gop = smart_encode.gop_for(job_config)
+            length = gop * self.segment_gops
+            ranges = [(first, min(first + length, total)) for first in range(0, total, length)]
+
+        extension = os.path.splitext(job_config.output_filename)[1]
+        segments = []
+        for first, end in ranges:
+            segment_config = encode_config.model_copy(update={"output_folder": "segments"})
+            if gop:
+                segment_config = segment_config.model_copy(update={
+                    "start_frame": job_config.start_frame + first,
+                    "end_frame": job_config.start_frame + end - 1,
+                    "desired_duration": repr((end - first) / out_fps),
+                })
+            task_id = f"encode_{first:08d}"
+            relative = os.path.join("segments", f"segment_{first:08d}{extension}")
+            queue.add(
+                task_id,
+                {"stage": "encode", "config": segment_config.model_dump(), "output": relative, "gop": gop},
+            )
+            segments.append((task_id, os.path.join(self.job_dir, relative)))
+        return segments
+
+    def _wait(self, queue: TaskQueue, stage: str, task_ids: List[str]) -> str:
+        """Wait until the given tasks are done, reporting progress."""
+        wanted = set(task_ids)
+        job_file = os.path.join(self.job_dir, "job.json")
+        last_status = None
+        while True:
+            if self.is_cancelled:
+                return CANCELLED
+            # Keeps workers from treating the job as orphaned.
+            os.utime(job_file)
+            queue.reap()
+
+            for failure in queue.failures():
+                self.log_callback(
+                    "error",
+                    f"Task {failure['id']} failed after {failure['attempts']} attempts: "
+                    f"{failure.get('error', 'unknown error')}",
+                )
+                return FAILED
+
+            done = len(wanted.intersection(queue.task_ids("done")))
+            leases = [lease for lease in queue.leases() if lease[0] in wanted]
+            workers = sorted({worker for _, worker, _ in leases})
+            status = (done, len(leases), tuple(workers))
+            if status != last_status:
+                last_status = status
+                self.log_callback("progress", str(done / len(wanted) * 100))
+                self.log_callback(
+                    "output",
+                    f"Farm {stage}: {done}/{len(wanted)} tasks done, {len(leases)} running"
+                    f"{' on ' + ', '.join(workers) if workers else ''}.\n",
+                )
+            if done == len(wanted):
+                return SUCCESS
+            time.sleep(POLL_SECONDS)
+
+    def _assemble(self, job_config: FFmpegJobConfig, segment_paths: List[str]) -> str:
+        """Join the encoded segments into the job's output movie."""
+        os.makedirs(job_config.output_folder, exist_ok=True)
+        output_path = os.path.join(
+            job_config.output_folder,
+            profiles.tag_filename(job_config.output_filename, job_config.profile),
+        )
+        if len(segment_paths) == 1:
+            shutil.move(segment_paths[0], output_path)
+        else:
+            self.log_callback(
+                "output", f"Joining {len(segment_paths)} segments (stream copy)...\n"
+            )
+            out_fps = normalize_fps(job_config.frame_rate)[0]
+            total = int(round(out_fps * float(job_config.desired_duration)))
+            lines = [smart_encode.concat_line(path) for path in segment_paths]
+            if not smart_encode.concat_copy(
+                self.ffmpeg_handler, job_config, lines, output_path, total, self.job_dir
+            ):
+                return CANCELLED if self.ffmpeg_handler.is_cancelled else FAILED
+        self.log_callback("output", f"Output written: {output_path}\n")
+        self.log_callback("success", "Conversion complete!")
+        return SUCCESS
+
+    def _close(self) -> None:
+        """Stop the job's remaining tasks and delete its directory."""
+        if not self.job_dir or not os.path.isdir(self.job_dir):
+            return
+        try:
+            open(os.path.join(self.job_dir, "cancelled"), "w").close()
+        except OSError:
+            pass
+        # Workers notice within a poll and release their leases.
+        queue = TaskQueue(self.job_dir)
+        deadline = time.monotonic() + 5 * POLL_SECONDS
+        while queue.names("leased") and time.monotonic() < deadline:
+            time.sleep(POLL_SECONDS / 4)
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+    def cancel(self) -> None:
+        """Cancel the running job; its workers stop their tasks."""
+        self.is_cancelled = True
+        self.ffmpeg_handler.cancel()
+
+
+class FarmWorker:
+    """Claim and run the tasks of every job in a queue directory.
+
+    Args:
+        queue_root: Queue directory on shared storage.
+        log_callback: Receives ``(msg_type, content)`` from the task handlers.
+    """
+
+    def __init__(self, queue_root: str, log_callback: Callable[[str, str], None]):
+        self.queue_root = queue_root
+        self.log_callback = log_callback
+        self.worker = worker_id()
+        # "<job_id>/<task_id>" of the running task, for log records.
+        self.current = ""
+        self.is_stopped = False
+        self._handlers: List[Any] = []
+
+    def run(self, idle_exit: Optional[float] = None) -> None:
+        """Run tasks until stopped, or until idle for ``idle_exit`` seconds."""
+        idle_since = time.monotonic()
+        while not self.is_stopped:
+            if self.run_once():
+                idle_since = time.monotonic()
+                continue
+            if idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                return
+            time.sleep(POLL_SECONDS)
+
+    def run_once(self) -> bool:
+        """Claim and run one task; False if no job had work."""
+        for job_dir in job_dirs(self.queue_root):
+            if is_cancelled(job_dir) or is_orphaned(job_dir):
+                continue
+            queue = TaskQueue(job_dir, self.worker)
+            queue.reap()
+            lease = queue.claim()
+            if lease is not None:
+                self._execute(job_dir, lease)
+                return True
+        return False
+
+    def _execute(self, job_dir: str, lease: Lease) -> None:
+        """Run a leased task, renewing the lease until it finishes."""
+        self.current = f"{os.path.basename(job_dir)}/{lease.task_id}"
+        errors: List[str] = []
+
+        def log(msg_type: str, content: str) -> None:
+            if msg_type == "error":
+                errors.append(content.strip())
+            self.log_callback(msg_type, content)
+
+        ffmpeg_handler = FFmpegHandler(log)
+        exr_handler = ExrHandler(log)
+        self._handlers = [ffmpeg_handler, exr_handler]
+        finished = threading.Event()
+        interrupted: List[str] = []
+
+        def heartbeat() -> None:
+            renewed = time.monotonic()
+            while not finished.wait(POLL_SECONDS):
+                if is_cancelled(job_dir):
+                    interrupted.append("cancelled")
+                elif time.monotonic() - renewed >= RENEW_SECONDS:
+                    if lease.renew():
+                        renewed = time.monotonic()
+                    else:
+                        interrupted.append("lost")
+                if interrupted:
+                    ffmpeg_handler.cancel()
+                    exr_handler.cancel()
+                    return
+
+        self.log_callback("output", f"Claimed {self.current} ({self.worker}).\n")
+        renewer = threading.Thread(target=heartbeat, daemon=True)
+        renewer.start()
+        try:
+            ok = self._run_task(job_dir, lease.payload, ffmpeg_handler, exr_handler)
+        except Exception as exc:  # noqa: BLE001
+            errors.append(str(exc))
+            ok = False
+        finally:
+            finished.set()
+            renewer.join()
+            self._handlers = []
+
+        if interrupted == ["lost"]:
+            self.log_callback("output", f"Lease on {self.current} expired; another worker reruns it.\n")
+        elif interrupted or self.is_stopped:
+            lease.release()
+        elif ok:
+            lease.complete()
+            self.log_callback("output", f"Finished {self.current}.\n")
+        else:
+            lease.fail(errors[-1] if errors else "task failed")
+        self.current = ""
+
+    @staticmethod
+    def _run_task(
+        job_dir: str, payload: Dict[str, Any], ffmpeg_handler: FFmpegHandler, exr_handler: ExrHandler
+    ) -> bool:
+        if payload["stage"] == "prepass":
+            frames_dir = os.path.join(job_dir, "frames")
+            frames = payload["frames"]
+            temp_dir = exr_handler.convert_exr_sequence(
+                input_folder=payload["input_folder"],
+                pattern=payload["pattern"],
+                start_frame=frames[0],
+                end_frame=frames[-1],
+                profile=payload["profile"],
+                frames=frames,
+                scheduling_class=payload["scheduling_class"],
+                temp_dir=frames_dir,
+            )
+            if temp_dir and temp_dir != frames_dir:
+                # The handler fell back to a local directory other hosts cannot see.
+                raise OSError(f"Cannot write to the shared frames directory {frames_dir}")
+            return bool(temp_dir) and not exr_handler.is_cancelled
+
+        settings = dict(payload["config"])
+        for key in ("input_folder", "output_folder"):
+            settings[key] = os.path.join(job_dir, settings[key])
+        output_path = os.path.join(job_dir, payload["output"])
+        root, extension = os.path.splitext(output_path)
+        partial_path = f"{root}.partial{extension}"
+        if not ffmpeg_handler.run_ffmpeg(
+            FFmpegJobConfig(**settings), output_path=partial_path, gop=payload["gop"], announce=False
+        ):
+            return False
+        os.replace(partial_path, output_path)
+        return True
+
+    def stop(self) -> None:
+        """Stop after releasing the running task back to the queue."""
+        self.is_stopped = True
+        for handler in self._handlers:
+            handler.cancel()
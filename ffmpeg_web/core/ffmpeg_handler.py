@@ -3,9 +3,11 @@ import subprocess
 import threading
 import re
 import asyncio
-from typing import Optional, Callable
+from typing import Callable, Dict, List, Optional, Tuple
 from pydantic import BaseModel
 from .utils import normalize_fps, calculate_duration_and_frames
+from .throughput import EtaTracker
+from . import frames, profiles, resources, scheduling
 
 class FFmpegJobConfig(BaseModel):
     input_folder: str
@@ -22,35 +24,76 @@ class FFmpegJobConfig(BaseModel):
     audio_option: str = "No Audio"
     start_frame: int
     end_frame: int
+    profile: str = "delivery"
+    # Encode a quarter-res review proxy before the full-quality master.
+    proxy_first: bool = False
+    # Write fragmented MP4 (H.264/H.265) so the movie plays while encoding.
+    fragmented_mp4: bool = False
+    # Re-encode only the GOPs whose frames changed since the last output.
+    smart_reencode: bool = False
+    # Baked 3D LUT applied by FFmpeg when EXR frames are read directly.
+    lut_path: Optional[str] = None
+    # CPU/IO priority of the spawned processes: interactive, batch or background.
+    scheduling_class: str = "interactive"
+    # Scale already applied to the input frames by the EXR pre-pass (set by
+    # the pipeline), so the profile's scale is not applied twice.
+    input_scale: float = 1.0
 
 class FFmpegHandler:
     def __init__(self, log_callback: Callable[[str, str], None]):
         """
         Args:
             log_callback: Function to call with (msg_type, content)
-                          msg_type: 'output', 'progress', 'error', 'success', 'cancelled'
+                          msg_type: 'output', 'progress', 'eta', 'error', 'success', 'cancelled'
         """
         self.log_callback = log_callback
         self.process: Optional[subprocess.Popen] = None
         self.is_cancelled = False
+        # Frames and seconds of the last successful encode, for throughput history.
+        self.last_stats: Optional[Dict[str, float]] = None
 
-    def run_ffmpeg(self, config: FFmpegJobConfig):
-        """Build and execute FFmpeg command."""
+    def run_ffmpeg(self,
+                   config: FFmpegJobConfig,
+                   predicted_fps: Optional[float] = None,
+                   output_path: Optional[str] = None,
+                   gop: Optional[int] = None,
+                   announce: bool = True) -> bool:
+        """Build and execute FFmpeg command.
+
+        Args:
+            config: Job settings.
+            predicted_fps: Encode rate expected from throughput history, used
+                for the ETA until the encode has made enough progress.
+            output_path: Write here instead of the configured output file.
+            gop: Force fixed, closed GOPs of this many frames (needed to
+                splice segments with stream copy later).
+            announce: Send the ``success`` message when done. Intermediate
+                encodes of a larger job pass False.
+
+        Returns:
+            True if the movie was written successfully.
+        """
         self.is_cancelled = False
         
         # --- Validation & Setup ---
         if not os.path.exists(config.input_folder):
             self.log_callback('error', f"Input folder does not exist: {config.input_folder}")
-            return
+            return False
 
         if not os.path.exists(config.output_folder):
             try:
                 os.makedirs(config.output_folder)
             except Exception as e:
                 self.log_callback('error', f"Cannot create output directory: {e}")
-                return
+                return False
 
-        output_path = os.path.join(config.output_folder, config.output_filename)
+        if output_path is None:
+            try:
+                output_filename = profiles.tag_filename(config.output_filename, config.profile)
+            except ValueError as e:
+                self.log_callback('error', str(e))
+                return False
+            output_path = os.path.join(config.output_folder, output_filename)
         
         # Basic FPS normalization
         src_num_fps, src_ffmpeg_fps_str, src_num, src_den = normalize_fps(config.source_frame_rate)
@@ -62,7 +105,14 @@ class FFmpegHandler:
                 raise ValueError
         except ValueError:
              self.log_callback('error', "Invalid duration or frame rate.")
-             return
+             return False
+
+        try:
+            cpu_set = scheduling.cpu_set_for(config.scheduling_class)
+            scheduling.get_class(config.scheduling_class)
+        except ValueError as e:
+            self.log_callback('error', str(e))
+            return False
 
         # Calculate frames
         total_input_frames = config.end_frame - config.start_frame + 1
@@ -83,6 +133,32 @@ class FFmpegHandler:
             "-framerate", src_ffmpeg_fps_str,
             "-i", input_path
         ]
+
+        # A sequence with holes plays from a list that holds the previous frame.
+        frame_list = None
+        try:
+            missing = frames.missing_frames(
+                config.input_folder, config.filename_pattern, config.start_frame, config.end_frame
+            )
+        except ValueError as e:
+            self.log_callback('error', str(e))
+            return False
+        if missing:
+            missing_str = frames.format_frame_ranges(missing)
+            self.log_callback('missing_frames', missing_str)
+            self.log_callback(
+                'output',
+                f"Warning: {len(missing)} missing frames, holding the previous frame: {missing_str}\n"
+            )
+            try:
+                frame_list = frames.write_concat_list(
+                    config.input_folder, config.filename_pattern,
+                    config.start_frame, config.end_frame, missing, src_num_fps
+                )
+            except (ValueError, OSError) as e:
+                self.log_callback('error', f"Cannot encode sequence: {e}")
+                return False
+            image_sequence_input_args = frames.concat_input_args(frame_list)
         
         cmd += ["-ss", "0"] + image_sequence_input_args
 
@@ -107,92 +183,198 @@ class FFmpegHandler:
         
         setpts_filter = f"setpts={scale_factor:.10f}*PTS"
         ffmpeg_filters_str = f"{setpts_filter},fps={out_ffmpeg_fps_str},scale=in_color_matrix=bt709:out_color_matrix=bt709"
+        # Shrink first so every later filter and the encoder see fewer pixels.
+        early_filters = []
+        draft_scale = profiles.scale_filter(config.profile, config.input_scale)
+        if draft_scale:
+            early_filters.append(draft_scale)
+        if config.lut_path:
+            early_filters.append(f"lut3d=file='{config.lut_path}'")
+        if early_filters:
+            ffmpeg_filters_str = ",".join(early_filters + [ffmpeg_filters_str])
         cmd += ["-vf", ffmpeg_filters_str]
 
-        # Codec & Pixel Format
+        # Codec & Pixel Format, sized to this encode's share of the CPUs
+        allocation = resources.BUDGET.acquire(
+            f"encode {os.path.basename(output_path)}", limit=len(cpu_set) if cpu_set else None
+        )
+        try:
+            output_pix_fmt, video_codec_params = self.video_codec_params(config, gop, allocation.threads)
+        except ValueError as e:
+            resources.BUDGET.release(allocation)
+            self._remove_frame_list(frame_list)
+            self.log_callback('error', str(e))
+            return False
+        resources.BUDGET.log_allocation(allocation, self.log_callback)
+        
+        # Timescale
+        if out_num is not None:
+            track_timescale = str(out_num)
+        else:
+             track_timescale = str(int(round(out_num_fps * 1000)))
+
+        cmd += [
+            "-pix_fmt", output_pix_fmt,
+            "-video_track_timescale", track_timescale
+        ]
+        
+        cmd += output_audio_handling_args
+        cmd += resources.ffmpeg_thread_args(allocation.threads)
+        cmd += video_codec_params
+        
+        cmd += [
+            "-color_primaries", "bt709",
+            "-color_trc", "bt709",
+            "-colorspace", "bt709"
+        ]
+        cmd += profiles.metadata_args(config.profile)
+
+        if config.fragmented_mp4 and config.codec in ["h264", "h265"]:
+            # A keyframe (and so a fragment) every ~2s keeps the playable
+            # head of the file close behind the encoder.
+            cmd += [
+                "-g", str(max(int(round(out_num_fps * 2)), 1)),
+                "-movflags", "+frag_keyframe+empty_moov+default_base_moof",
+            ]
+
+        if total_frames_needed:
+            cmd += ["-frames:v", str(total_frames_needed)]
+            
+        cmd.append(output_path)
+
+        self.log_callback('output', f"FFmpeg Command: {' '.join(cmd)}\n")
+        
+        # Execute
+        try:
+            return self._execute_process(
+                cmd, total_frames_needed, predicted_fps, announce, config.scheduling_class
+            )
+        finally:
+            resources.BUDGET.release(allocation)
+            self._remove_frame_list(frame_list)
+
+    @staticmethod
+    def _remove_frame_list(path: Optional[str]) -> None:
+        """Delete a concat frame list written for a sequence with holes."""
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def video_codec_params(self,
+                           config: FFmpegJobConfig,
+                           gop: Optional[int] = None,
+                           threads: Optional[int] = None) -> Tuple[str, List[str]]:
+        """Return ``(pix_fmt, codec_args)`` for the codec selected in ``config``.
+
+        ``gop`` forces fixed-length closed GOPs for the inter-frame codecs.
+        ``threads`` sizes the x264/x265 thread pools to a CPU budget share.
+
+        Raises:
+            ValueError: If a setting required by the codec is missing.
+        """
         output_pix_fmt = "yuv420p"
         video_codec_params = []
+        profile = profiles.get_profile(config.profile)
         
         if config.codec in ["h264", "h265"]:
             if not config.mp4_bitrate:
-                self.log_callback('error', "Bitrate required for H.264/H.265")
-                return
+                raise ValueError("Bitrate required for H.264/H.265")
             
             codec_lib = "libx264" if config.codec == "h264" else "libx265"
-            cb = f"{float(config.mp4_bitrate):.0f}M"
+            bitrate = float(config.mp4_bitrate)
+            cb = f"{bitrate:.0f}M"
             
             video_codec_params = [
                 "-c:v", codec_lib,
-                "-preset", "medium",
+                "-preset", profile["presets"][config.codec],
                 "-b:v", cb,
-                "-minrate", cb,
-                "-maxrate", cb,
-                "-bufsize", cb,
             ]
+            if profile["strict_cbr"]:
+                video_codec_params.extend([
+                    "-minrate", cb,
+                    "-maxrate", cb,
+                    "-bufsize", cb,
+                ])
+            else:
+                # Capped VBR: lets the encoder skip the CBR padding/HRD work.
+                video_codec_params.extend([
+                    "-maxrate", f"{bitrate * 2:.0f}M",
+                    "-bufsize", f"{bitrate * 2:.0f}M",
+                ])
+            encoder_params = resources.encoder_thread_params(config.codec, threads)
+            if gop:
+                encoder_params += [f"keyint={gop}", f"min-keyint={gop}", "scenecut=0"]
             if config.codec == "h264":
+                if profile["strict_cbr"]:
+                    encoder_params.append("nal-hrd=cbr")
+                if encoder_params:
+                    video_codec_params.extend(["-x264-params", ":".join(encoder_params)])
                 video_codec_params.extend([
-                    "-x264-params", "nal-hrd=cbr",
                     "-profile:v", "high",
                     "-level:v", "5.1",
                 ])
             else:
+                if gop:
+                    # x265 uses open GOPs by default, which cannot be cut cleanly.
+                    encoder_params.append("open-gop=0")
+                if encoder_params:
+                    video_codec_params.extend(["-x265-params", ":".join(encoder_params)])
                 video_codec_params.extend(["-tag:v", "hvc1"])
                 
         elif config.codec.startswith("prores"):
             if not config.prores_profile or not config.prores_qscale:
-                 self.log_callback('error', "ProRes profile and quality required")
-                 return
+                raise ValueError("ProRes profile and quality required")
             
             video_codec_params = [
                 "-c:v", "prores_ks",
-                "-profile:v", config.prores_profile,
+                "-profile:v", profile["prores_profile"] or config.prores_profile,
                 "-qscale:v", config.prores_qscale
             ]
         elif config.codec == "qtrle":
              output_pix_fmt = "rgb24"
              video_codec_params = ["-c:v", "qtrle"]
-        
-        # Timescale
-        if out_num is not None:
-            track_timescale = str(out_num)
-        else:
-             track_timescale = str(int(round(out_num_fps * 1000)))
-
-        cmd += [
-            "-pix_fmt", output_pix_fmt,
-            "-video_track_timescale", track_timescale
-        ]
-        
-        cmd += output_audio_handling_args
-        cmd += video_codec_params
-        
-        cmd += [
-            "-color_primaries", "bt709",
-            "-color_trc", "bt709",
-            "-colorspace", "bt709"
-        ]
 
-        if total_frames_needed:
-            cmd += ["-frames:v", str(total_frames_needed)]
-            
-        cmd.append(output_path)
+        return output_pix_fmt, video_codec_params
 
+    def run_command(self,
+                    cmd: List[str],
+                    total_frames: int = 0,
+                    announce: bool = False,
+                    scheduling_class: Optional[str] = None) -> bool:
+        """Execute an already-built FFmpeg command (e.g. a stream-copy splice)."""
+        self.is_cancelled = False
         self.log_callback('output', f"FFmpeg Command: {' '.join(cmd)}\n")
-        
-        # Execute
-        self._execute_process(cmd, total_frames_needed)
+        return self._execute_process(cmd, total_frames, announce=announce,
+                                     scheduling_class=scheduling_class)
+
+    def _execute_process(self, cmd, total_frames_needed, predicted_fps=None, announce=True,
+                         scheduling_class=None):
+        """Run FFmpeg, stream its log and report progress, ETA and stats.
 
-    def _execute_process(self, cmd, total_frames_needed):
+        ``scheduling_class`` sets the nice/ionice/CPU-set policy of the process.
+
+        Returns:
+            True if FFmpeg exited successfully.
+        """
+        self.last_stats = None
+        eta = EtaTracker(total_frames_needed or 0, predicted_fps)
+        last_eta_report = 0.0
         try:
             self.process = subprocess.Popen(
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 universal_newlines=True,
-                bufsize=1
+                bufsize=1,
+                preexec_fn=scheduling.preexec_for(scheduling_class)
             )
             
             self.log_callback('output', f"Process started with PID: {self.process.pid}\n")
+            self.log_callback('pid', str(self.process.pid))
+            if scheduling_class and scheduling_class != scheduling.DEFAULT_CLASS:
+                self.log_callback('output', f"Scheduling: {scheduling.describe(scheduling_class)}\n")
             
             # We need to read stdout and stderr. For simplicity in this synchronous
             # wrapper (which will be run in a thread), we'll read stderr linewise
@@ -213,13 +395,21 @@ class FFmpegHandler:
                         current = int(frame_match.group(1))
                         pct = (current / total_frames_needed) * 100 if total_frames_needed else 0
                         self.log_callback('progress', str(pct))
+                        remaining = eta.update(current)
+                        # ETA is smoothed anyway; once a second is plenty for the UI.
+                        if remaining is not None and eta.elapsed - last_eta_report >= 1.0:
+                            last_eta_report = eta.elapsed
+                            self.log_callback('eta', f"{remaining:.1f}")
 
             self.process.wait()
             
             if self.is_cancelled:
                 self.log_callback('cancelled', "Conversion cancelled.")
             elif self.process.returncode == 0:
-                self.log_callback('success', "Conversion complete!")
+                self.last_stats = {"frames": total_frames_needed, "seconds": eta.elapsed}
+                if announce:
+                    self.log_callback('success', "Conversion complete!")
+                return True
             else:
                  # Read remaining stderr if any
                 remaining = self.process.stderr.read()
@@ -229,6 +419,7 @@ class FFmpegHandler:
             self.log_callback('error', f"Execution error: {e}")
         finally:
             self.process = None
+        return False
 
     def cancel(self):
         self.is_cancelled = True
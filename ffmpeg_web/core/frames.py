@@ -0,0 +1,236 @@
+"""Helpers for image sequences with missing frames.
+
+Renders often come back with holes. Rather than copying or renumbering files,
+a sequence with holes is fed to FFmpeg through a concat-demuxer list that
+names every existing frame with its on-screen duration: a frame followed by a
+hole is held until the next existing frame, which keeps the sequence's timing
+identical to a complete render. Holes at the very start are covered by the
+first existing frame.
+
+Which frames exist is answered by a ``FrameManifest``: one directory listing
+per sequence instead of a ``stat``/``exists`` call per frame, which matters on
+network storage where every call is a round-trip.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import tempfile
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+_PLACEHOLDER = re.compile(r"%(0?)(\d*)d")
+
+
+def frame_file(folder: str, pattern: str, frame: int) -> str:
+    """Return the path of one frame of a printf-style sequence pattern."""
+    return os.path.join(folder, pattern % frame)
+
+
+def _pattern_regex(pattern: str) -> Tuple["re.Pattern[str]", int]:
+    """Return a regex matching a pattern's file names and the frame padding.
+
+    Raises:
+        ValueError: If the pattern has no ``%d``-style placeholder.
+    """
+    match = _PLACEHOLDER.search(pattern)
+    if not match:
+        raise ValueError(f"Pattern '{pattern}' has no frame number placeholder")
+    padding = int(match.group(2)) if match.group(1) and match.group(2) else 0
+    regex = re.compile(
+        re.escape(pattern[:match.start()].replace("%%", "%"))
+        + r"(-?\d+)"
+        + re.escape(pattern[match.end():].replace("%%", "%"))
+    )
+    return regex, padding
+
+
+class FrameManifest:
+    """The frames of one sequence that exist in a directory.
+
+    Built from a single ``os.scandir``; frame numbers, sizes and mtimes are
+    kept in parallel ``array('q')`` columns sorted by frame, so a manifest of
+    a long sequence stays small and lookups are a binary search. Sizes and
+    mtimes are only collected when ``with_stat`` is set; existence checks need
+    nothing beyond the listing.
+    """
+
+    __slots__ = ("folder", "pattern", "_frames", "_sizes", "_mtimes")
+
+    def __init__(self, folder: str, pattern: str):
+        self.folder = folder
+        self.pattern = pattern
+        self._frames = array("q")
+        self._sizes = array("q")
+        self._mtimes = array("q")
+
+    @classmethod
+    def scan(cls, folder: str, pattern: str, with_stat: bool = False) -> "FrameManifest":
+        """List ``folder`` once and record every file matching ``pattern``.
+
+        A missing folder yields an empty manifest.
+
+        Raises:
+            ValueError: If the pattern has no frame number placeholder.
+        """
+        regex, padding = _pattern_regex(pattern)
+        found: List[Tuple[int, int, int]] = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    match = regex.fullmatch(entry.name)
+                    if not match:
+                        continue
+                    frame = int(match.group(1))
+                    # Only names the pattern would produce, e.g. not 00012
+                    # for %04d.
+                    if pattern % frame != entry.name:
+                        continue
+                    size = mtime = 0
+                    if with_stat:
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        size, mtime = st.st_size, st.st_mtime_ns
+                    found.append((frame, size, mtime))
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+
+        manifest = cls(folder, pattern)
+        found.sort()
+        for frame, size, mtime in found:
+            manifest._frames.append(frame)
+            manifest._sizes.append(size)
+            manifest._mtimes.append(mtime)
+        return manifest
+
+    def _index(self, frame: int) -> int:
+        index = bisect_left(self._frames, frame)
+        if index < len(self._frames) and self._frames[index] == frame:
+            return index
+        return -1
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def __contains__(self, frame: object) -> bool:
+        return isinstance(frame, int) and self._index(frame) >= 0
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._frames)
+
+    def stat(self, frame: int) -> Optional[Tuple[int, int]]:
+        """Return ``(size, mtime_ns)`` of a frame, or None if it does not exist."""
+        index = self._index(frame)
+        if index < 0:
+            return None
+        return self._sizes[index], self._mtimes[index]
+
+    def path(self, frame: int) -> str:
+        """Return the path of a frame, whether or not it exists."""
+        return frame_file(self.folder, self.pattern, frame)
+
+    def missing(self, start_frame: int, end_frame: int) -> List[int]:
+        """Return the frames of ``start_frame..end_frame`` that do not exist."""
+        present = self._frames
+        index = bisect_left(present, start_frame)
+        result: List[int] = []
+        for frame in range(start_frame, end_frame + 1):
+            if index < len(present) and present[index] == frame:
+                index += 1
+            else:
+                result.append(frame)
+        return result
+
+
+def missing_frames(folder: str, pattern: str, start_frame: int, end_frame: int) -> List[int]:
+    """Return the frames of ``start_frame..end_frame`` that do not exist on disk."""
+    return FrameManifest.scan(folder, pattern).missing(start_frame, end_frame)
+
+
+def format_frame_ranges(frames: Iterable[int]) -> str:
+    """Format frame numbers compactly, e.g. ``12-14, 30``."""
+    ranges: List[Tuple[int, int]] = []
+    for frame in sorted(frames):
+        if ranges and frame == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], frame)
+        else:
+            ranges.append((frame, frame))
+    return ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+def hold_counts(start_frame: int, end_frame: int, missing: Iterable[int]) -> List[Tuple[int, int]]:
+    """Return ``(frame, held_frames)`` for every existing frame.
+
+    ``held_frames`` is how many frame slots the frame fills: itself plus the
+    hole after it (and, for the first frame, any hole before it).
+    """
+    missing_set = set(missing)
+    holds: List[Tuple[int, int]] = []
+    leading = 0
+    for frame in range(start_frame, end_frame + 1):
+        if frame not in missing_set:
+            holds.append((frame, 1 + leading))
+            leading = 0
+        elif holds:
+            holds[-1] = (holds[-1][0], holds[-1][1] + 1)
+        else:
+            leading += 1
+    return holds
+
+
+def _quote(path: str) -> str:
+    """Quote a path for an FFmpeg concat list."""
+    return "'" + path.replace("'", "'\\''") + "'"
+
+
+def write_concat_list(
+    folder: str,
+    pattern: str,
+    start_frame: int,
+    end_frame: int,
+    missing: Iterable[int],
+    fps: float,
+    directory: Optional[str] = None,
+) -> str:
+    """Write a concat-demuxer list that plays the sequence with holes held.
+
+    Durations are derived from cumulative timestamps rounded to the demuxer's
+    microsecond resolution, so long sequences do not drift.
+
+    Returns:
+        The path of the list file; the caller removes it when done.
+
+    Raises:
+        ValueError: If ``fps`` is not positive or no frame exists.
+    """
+    if fps <= 0:
+        raise ValueError("Frame rate must be positive")
+    holds = hold_counts(start_frame, end_frame, missing)
+    if not holds:
+        raise ValueError("No frames of the sequence exist")
+
+    lines = ["ffconcat version 1.0"]
+    elapsed = 0
+    for frame, count in holds:
+        begin_us = round(elapsed * 1e6 / fps)
+        elapsed += count
+        end_us = round(elapsed * 1e6 / fps)
+        lines.append(f"file {_quote(frame_file(folder, pattern, frame))}")
+        lines.append(f"duration {(end_us - begin_us) / 1e6:.6f}")
+    # The demuxer ignores the last entry's duration; repeating the file makes
+    # the final hold last as long as it should.
+    lines.append(f"file {_quote(frame_file(folder, pattern, holds[-1][0]))}")
+
+    fd, path = tempfile.mkstemp(prefix="ffmpeg_web_frames_", suffix=".txt", dir=directory)
+    with os.fdopen(fd, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def concat_input_args(list_path: str) -> List[str]:
+    """Return FFmpeg input arguments reading a list from ``write_concat_list``."""
+    return ["-f", "concat", "-safe", "0", "-i", list_path]
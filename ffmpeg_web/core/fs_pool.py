@@ -0,0 +1,168 @@
+"""Run blocking filesystem calls of the web server off its event loop.
+
+Listing a directory or scanning it for sequences does a stat per entry; on
+a slow or hung NFS mount that blocks for as long as the mount does. Run on
+the event loop, it froze every WebSocket and API call with it.
+``FilesystemPool.run`` runs such calls in a bounded thread pool instead:
+
+- at most ``PER_ROOT_LIMIT`` calls run at once per filesystem root (mount
+  point), so a hung mount can tie up only that many threads;
+- a call that does not return within ``TIMEOUT_SECONDS`` of getting its
+  slot fails with ``FilesystemTimeout``; the call itself keeps its root's
+  slot until it returns;
+- a request waiting for a slot fails the same way once its root has
+  finished no call for ``TIMEOUT_SECONDS``, so requests for a hung root
+  keep timing out, requests queued behind a busy but working root (the
+  shots of a batch) wait their turn, and other roots are unaffected.
+
+The root of a path is found from its string and the mount table
+(``/proc/mounts``), never from the filesystem itself, which may be the one
+that hangs.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+POOL_WORKERS = 8
+PER_ROOT_LIMIT = 2
+TIMEOUT_SECONDS = 10.0
+
+# How often a request waiting for a busy root checks again.
+POLL_SECONDS = 0.05
+
+# How long the mount table is cached.
+MOUNTS_SECONDS = 30.0
+
+_MOUNTS_FILE = "/proc/mounts"
+
+
+class FilesystemTimeout(Exception):
+    """A filesystem call did not finish within its timeout."""
+
+
+def _unescape_mount(field: str) -> str:
+    # /proc/mounts escapes spaces, tabs, newlines and backslashes in octal.
+    for code, char in (("\\040", " "), ("\\011", "\t"), ("\\012", "\n"), ("\\134", "\\")):
+        field = field.replace(code, char)
+    return field
+
+
+class FilesystemPool:
+    """Thread pool for filesystem calls, with a concurrency cap per filesystem root.
+
+    Args:
+        workers: Threads in the pool.
+        per_root: Calls allowed to run at once per filesystem root.
+        timeout: Default seconds a request waits for its result.
+    """
+
+    def __init__(
+        self,
+        workers: int = POOL_WORKERS,
+        per_root: int = PER_ROOT_LIMIT,
+        timeout: float = TIMEOUT_SECONDS,
+    ):
+        self.per_root = per_root
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ffmpeg_web_fs")
+        self._lock = threading.Lock()
+        # Calls running (or queued in the pool) per root.
+        self._active: Dict[str, int] = {}
+        # When a call on each root last returned.
+        self._returned: Dict[str, float] = {}
+        self._mounts: List[str] = []
+        self._mounts_read = 0.0
+
+    async def run(
+        self, path: Optional[str], func: Callable[..., Any], *args: Any, timeout: Optional[float] = None
+    ) -> Any:
+        """Run ``func(*args)``, which works on ``path``, in the pool and return its result.
+
+        Raises:
+            FilesystemTimeout: If the result is not there within ``timeout``
+                seconds of the call getting a slot, or if no call on the
+                root returns for ``timeout`` seconds while it waits for one.
+        """
+        root = self.root(path)
+        timeout = self.timeout if timeout is None else timeout
+        waiting = time.monotonic()
+        while not self._reserve(root):
+            if time.monotonic() - max(waiting, self._returned.get(root, 0.0)) >= timeout:
+                raise FilesystemTimeout(f"The filesystem at {root} is not responding.")
+            await asyncio.sleep(POLL_SECONDS)
+        deadline = time.monotonic() + timeout
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._executor, self._call, root, func, args
+            )
+        except BaseException:
+            self._release(root)
+            raise
+        try:
+            # Shielded: a timed-out call still finishes (and frees its slot).
+            return await asyncio.wait_for(asyncio.shield(future), max(deadline - time.monotonic(), 0.0))
+        except asyncio.TimeoutError as exc:
+            raise FilesystemTimeout(f"The filesystem at {root} is not responding.") from exc
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return the calls running per root, for status reporting."""
+        with self._lock:
+            return {root: count for root, count in self._active.items() if count}
+
+    def root(self, path: Optional[str]) -> str:
+        """Return the mount point that ``path`` is on, from the mount table."""
+        path = os.path.abspath(os.path.expanduser(path or "."))
+        best = os.sep
+        for mount in self._mount_points():
+            prefix = mount.rstrip(os.sep) + os.sep
+            if (path == mount or path.startswith(prefix)) and len(mount) > len(best):
+                best = mount
+        if best == os.sep and not self._mounts:
+            # No mount table: treat each top-level directory as a root.
+            parts = path.strip(os.sep).split(os.sep)
+            best = os.sep + parts[0] if parts[0] else os.sep
+        return best
+
+    def _mount_points(self) -> List[str]:
+        now = time.monotonic()
+        if now - self._mounts_read >= MOUNTS_SECONDS:
+            mounts = []
+            try:
+                with open(_MOUNTS_FILE) as f:
+                    for line in f:
+                        fields = line.split()
+                        if len(fields) >= 2:
+                            mounts.append(_unescape_mount(fields[1]))
+            except OSError:
+                pass
+            self._mounts = mounts
+            self._mounts_read = now
+        return self._mounts
+
+    def _reserve(self, root: str) -> bool:
+        with self._lock:
+            if self._active.get(root, 0) >= self.per_root:
+                return False
+            self._active[root] = self._active.get(root, 0) + 1
+            return True
+
+    def _release(self, root: str) -> None:
+        with self._lock:
+            self._active[root] = max(0, self._active.get(root, 0) - 1)
+            self._returned[root] = time.monotonic()
+
+    def _call(self, root: str, func: Callable[..., Any], args: Any) -> Any:
+        try:
+            return func(*args)
+        finally:
+            self._release(root)
+
+
+# Process-wide pool used by the web server's endpoints.
+POOL = FilesystemPool()
@@ -0,0 +1,343 @@
+"""Run a web server job in a child process that shares the server's resources.
+
+In a thread of the API process, a job's log parsing, progress tracking and
+pydantic work compete with request handling for the GIL, so under a large EXR
+job ``/api/browse`` and WebSocket pings lag. ``JobProcess`` runs the job's
+``JobPipeline`` in a child process instead (``spawn``, so none of the
+server's threads or sockets are inherited) and talks to it over a pipe:
+
+- the child sends every log message, which goes to the job's log callback;
+- the child asks for stage slots and CPU budget shares, which the server
+  grants from its own ``stages.SLOTS`` and ``resources.BUDGET``, so jobs in
+  different processes still share one set of pools;
+- the server sends cancellation.
+
+Each job process leads its own process group. A job whose process crashes
+fails on its own: the FFmpeg and oiiotool processes it started are stopped
+with the group, its temp directories are removed, and its slots and shares
+are returned; the server keeps running. If the server goes away (the pipe closes, or it terminates its
+job processes on shutdown), the child cancels its job but keeps its EXR temp
+directory, for the restarted server to resume.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import threading
+from contextlib import contextmanager
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from . import conform, resources, stages, throughput
+from .pipeline import CANCELLED, FAILED, SUCCESS, JobPipeline
+
+# Children start from a fresh interpreter, not a fork of the threaded server.
+_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class JobProcess:
+    """Run one job in a child process; stands in for its ``JobPipeline``.
+
+    Args:
+        log_callback: Receives ``(msg_type, content)`` for every message the
+            job logs, in the server process.
+    """
+
+    def __init__(self, log_callback: Callable[[str, str], None]):
+        self.log_callback = log_callback
+        self.is_cancelled = False
+        self._lock = threading.Lock()
+        self._conn: Optional[Connection] = None
+        # Stage slots and budget allocations the child holds.
+        self._slots: Dict[str, List[Any]] = {}
+        self._allocations: Dict[int, resources.Allocation] = {}
+        # EXR temp directories the child created, removed if it crashes.
+        self._temp_dirs: List[str] = []
+
+    def run(self, kind: str, *args: Any) -> str:
+        """Run a ``kind`` job (see ``RUNNERS``) with ``args`` and wait for it.
+
+        Returns:
+            A ``pipeline`` outcome; ``FAILED`` if the process died.
+        """
+        conn, child_conn = _CONTEXT.Pipe()
+        process = _CONTEXT.Process(
+            target=_child_main, args=(child_conn, kind, args), name=f"ffmpeg_web {kind}", daemon=True
+        )
+        with self._lock:
+            if self.is_cancelled:
+                return CANCELLED
+            process.start()
+            self._conn = conn
+        child_conn.close()
+
+        outcome = None
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    break
+                if message[0] == "log":
+                    if message[1] == "temp_dir":
+                        self._temp_dirs.append(message[2])
+                    self.log_callback(message[1], message[2])
+                elif message[0] == "call":
+                    self._send(("reply", self._handle(message[1], *message[2:])))
+                elif message[0] == "notify":
+                    self._handle(message[1], *message[2:])
+                elif message[0] == "outcome":
+                    outcome = message[1]
+        finally:
+            with self._lock:
+                self._conn = None
+            conn.close()
+            process.join()
+            self._release_all()
+
+        if outcome is None:
+            self._stop_group(process.pid)
+            for path in self._temp_dirs:
+                shutil.rmtree(path, ignore_errors=True)
+            self.log_callback(
+                "error", f"Job process exited unexpectedly (exit code {process.exitcode})."
+            )
+            return FAILED
+        return outcome
+
+    @staticmethod
+    def _stop_group(pgid: Optional[int]) -> None:
+        """Terminate what a crashed job process left running in its group."""
+        if not pgid or not hasattr(os, "killpg"):
+            return
+        try:
+            os.killpg(pgid, signal.SIGTERM)
+        except OSError:
+            pass
+
+    def cancel(self) -> None:
+        """Signal the job to cancel, whether it has started yet or not."""
+        self.is_cancelled = True
+        self._send(("cancel",))
+
+    def _send(self, message: Tuple[Any, ...]) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.send(message)
+            except (OSError, ValueError):
+                pass
+
+    def _handle(self, name: str, *args: Any) -> Any:
+        """Serve a request from the child with the server's pools."""
+        if name == "slot_acquire":
+            stage, scheduling_class = args
+            # A cancel that reached the child before its pipeline started
+            # is lost there; refusing the next stage still stops the job.
+            if self.is_cancelled:
+                return False
+            # Waiting for the slot reports ``waiting:<stage>`` to the job log.
+            slot = stages.SLOTS.slot(
+                stage, self.log_callback, scheduling_class, lambda: self.is_cancelled
+            )
+            held = slot.__enter__()
+            if held:
+                self._slots.setdefault(stage, []).append(slot)
+            else:
+                slot.__exit__(None, None, None)
+            return held
+        if name == "slot_release":
+            held_slots = self._slots.get(args[0])
+            if held_slots:
+                held_slots.pop().__exit__(None, None, None)
+            return None
+        if name == "budget_acquire":
+            allocation = resources.BUDGET.acquire(*args)
+            self._allocations[allocation.id] = allocation
+            return allocation.id, allocation.threads
+        if name == "budget_release":
+            allocation = self._allocations.pop(args[0], None)
+            if allocation is not None:
+                resources.BUDGET.release(allocation)
+            return None
+        if name == "budget_total":
+            return resources.BUDGET.total
+        if name == "budget_snapshot":
+            return resources.BUDGET.snapshot()
+        raise ValueError(f"Unknown job process request '{name}'")
+
+    def _release_all(self) -> None:
+        """Return what a finished (or crashed) child still held."""
+        for held_slots in self._slots.values():
+            while held_slots:
+                held_slots.pop().__exit__(None, None, None)
+        for allocation in self._allocations.values():
+            resources.BUDGET.release(allocation)
+        self._allocations.clear()
+
+
+# --- Child process ---
+
+
+class _Channel:
+    """The child's end of the pipe: log, request and cancellation messages."""
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+        self.on_cancel: Optional[Callable[[], None]] = None
+        self.on_disconnect: Optional[Callable[[], None]] = None
+        self._send_lock = threading.Lock()
+        self._call_lock = threading.Lock()
+        self._replies: queue.Queue = queue.Queue()
+
+    def start(self) -> None:
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def send(self, message: Tuple[Any, ...]) -> None:
+        with self._send_lock:
+            try:
+                self.conn.send(message)
+            except (OSError, ValueError):
+                # The server is gone; ``_read`` cancels the job.
+                pass
+
+    def log(self, msg_type: str, content: str) -> None:
+        self.send(("log", msg_type, content))
+
+    def call(self, name: str, *args: Any) -> Any:
+        """Send a request and wait for the reply (None if the server is gone)."""
+        with self._call_lock:
+            self.send(("call", name, *args))
+            return self._replies.get()
+
+    def notify(self, name: str, *args: Any) -> None:
+        self.send(("notify", name, *args))
+
+    def _read(self) -> None:
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == "cancel" and self.on_cancel is not None:
+                self.on_cancel()
+            elif message[0] == "reply":
+                self._replies.put(message[1])
+        self._replies.put(None)
+        if self.on_disconnect is not None:
+            self.on_disconnect()
+
+
+class _RemoteSlots:
+    """``stages.StageSlots`` of the server, as seen from a job process."""
+
+    def __init__(self, channel: _Channel):
+        self.channel = channel
+
+    @contextmanager
+    def slot(
+        self,
+        stage: str,
+        log_callback: Callable[[str, str], None],
+        scheduling_class: Optional[str] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+    ) -> Iterator[bool]:
+        # The server logs the stage and watches for cancellation itself.
+        if not self.channel.call("slot_acquire", stage, scheduling_class):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self.channel.notify("slot_release", stage)
+
+
+class _RemoteBudget(resources.ThreadBudget):
+    """``resources.BUDGET`` of the server, as seen from a job process."""
+
+    def __init__(self, channel: _Channel):
+        super().__init__()
+        self.channel = channel
+
+    @property
+    def total(self) -> int:
+        return self.channel.call("budget_total") or 1
+
+    def acquire(self, label: str, weight: float = 1.0, limit: Optional[int] = None) -> resources.Allocation:
+        reply = self.channel.call("budget_acquire", label, weight, limit)
+        alloc_id, threads = reply if reply else (0, 1)
+        return resources.Allocation(alloc_id, label, threads, weight)
+
+    def release(self, allocation: resources.Allocation) -> None:
+        self.channel.notify("budget_release", allocation.id)
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        return self.channel.call("budget_snapshot") or []
+
+
+def _convert(job_pipeline: JobPipeline, job_config: Any, plan: Any, resume_dir: Optional[str]) -> str:
+    return job_pipeline.run(job_config, plan, resume_dir=resume_dir)
+
+
+def _conform(job_pipeline: JobPipeline, conform_config: Any) -> str:
+    return conform.run(job_pipeline, conform_config)
+
+
+def _calibrate(job_pipeline: JobPipeline) -> str:
+    """Encode the synthetic calibration clip with every codec."""
+    log = job_pipeline.log_callback
+    try:
+        # Calibration encodes, so it takes an encode slot like a job's encode.
+        with stages.SLOTS.slot(
+            stages.ENCODE, log, is_cancelled=lambda: job_pipeline.is_cancelled
+        ) as held:
+            if not held:
+                return CANCELLED
+            log("output", "Starting throughput calibration...\n")
+            results = throughput.calibrate(log)
+        log("success", f"Calibration complete ({len(results)} codecs measured).")
+        return SUCCESS
+    except Exception as exc:  # noqa: BLE001
+        log("error", f"Calibration Error: {exc}")
+        return FAILED
+
+
+# Job kinds a ``JobProcess`` can run, called with the job's pipeline and args.
+RUNNERS: Dict[str, Callable[..., str]] = {
+    "convert": _convert,
+    "conform": _conform,
+    "calibration": _calibrate,
+}
+
+
+def _child_main(conn: Connection, kind: str, args: Tuple[Any, ...]) -> None:
+    # A group of its own: Ctrl+C on the server's terminal does not reach the
+    # job (the server decides what happens to it), and the server can stop
+    # everything the job started if this process dies.
+    if hasattr(os, "setsid"):
+        os.setsid()
+    channel = _Channel(conn)
+    resources.BUDGET = _RemoteBudget(channel)
+    stages.SLOTS = _RemoteSlots(channel)
+    job_pipeline = JobPipeline(channel.log)
+
+    def disconnect() -> None:
+        job_pipeline.keep_temp = True
+        job_pipeline.cancel()
+
+    channel.on_cancel = job_pipeline.cancel
+    channel.on_disconnect = disconnect
+    signal.signal(signal.SIGTERM, lambda signum, frame: disconnect())
+    channel.start()
+    try:
+        outcome = RUNNERS[kind](job_pipeline, *args)
+    except Exception as exc:  # noqa: BLE001
+        channel.log("error", f"Critical Job Error: {exc}")
+        outcome = FAILED
+    channel.send(("outcome", outcome))
+    conn.close()
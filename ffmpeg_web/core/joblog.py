@@ -0,0 +1,152 @@
+"""Batch job log messages for WebSocket clients and keep the recent ones per job.
+
+FFmpeg's stderr and ``oiiotool -v`` produce a line per frame, and each used
+to become a WebSocket message of its own. ``LogBatcher`` holds a job's log
+lines and progress for a short window (``BATCH_SECONDS``) and then emits
+them as one ``output`` message (the lines joined) plus the latest
+``progress`` and ``eta``. Any other message of the job flushes what is held
+first, so clients see everything in order. Every emitted job message gets a
+per-job ``seq`` number.
+
+``LogRing`` keeps the last messages of recent jobs so that a client that
+subscribes to a job mid-job (or after reconnecting) can be sent what it
+missed; clients skip ``seq`` numbers they have seen. The complete log of a
+job is in the job store (``store.JobStore.logs``).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+# How long log lines are held before they are sent together.
+BATCH_SECONDS = 0.1
+
+# Log lines, sent joined in one message per window.
+BATCHED_TYPES = {"output"}
+# Only the latest per job is sent per window (and kept for replay).
+LATEST_TYPES = ("progress", "eta")
+
+# Messages kept for replay per job, and how many jobs are kept.
+RING_MESSAGES = 200
+RING_JOBS = 10
+
+
+class LogBatcher:
+    """Emit each job's log lines and progress at most once per ``window``.
+
+    Args:
+        emit: Called with every message to send, in order per job; called
+            with the batcher's lock held.
+        window: Seconds log lines are held.
+    """
+
+    def __init__(self, emit: Callable[[Dict[str, Any]], None], window: float = BATCH_SECONDS):
+        self.emit = emit
+        self.window = window
+        self._cond = threading.Condition()
+        # Per job: held log lines and the latest progress-type messages.
+        self._lines: Dict[str, List[str]] = {}
+        self._latest: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._seqs: Dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, message: Dict[str, Any]) -> None:
+        """Send ``message`` now, or hold it until the job's window ends."""
+        job_id = message.get("job")
+        msg_type = message.get("type")
+        with self._cond:
+            if job_id and msg_type in BATCHED_TYPES:
+                self._lines.setdefault(job_id, []).append(str(message.get("content", "")))
+                self._start()
+            elif job_id and msg_type in LATEST_TYPES:
+                self._latest.setdefault(job_id, {})[msg_type] = message
+                self._start()
+            else:
+                if job_id:
+                    self._flush_job(job_id)
+                self._send(message)
+
+    def flush(self) -> None:
+        """Send everything held now."""
+        with self._cond:
+            for job_id in list(set(self._lines) | set(self._latest)):
+                self._flush_job(job_id)
+
+    def _start(self) -> None:
+        """Wake the flushing thread (started on first use); call with the lock held."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not (self._lines or self._latest):
+                    self._cond.wait()
+            time.sleep(self.window)
+            self.flush()
+
+    def _flush_job(self, job_id: str) -> None:
+        lines = self._lines.pop(job_id, None)
+        if lines:
+            content = "".join(line if line.endswith("\n") else f"{line}\n" for line in lines)
+            self._send({"type": "output", "content": content, "job": job_id, "lines": len(lines)})
+        latest = self._latest.pop(job_id, {})
+        for msg_type in LATEST_TYPES:
+            if msg_type in latest:
+                self._send(latest[msg_type])
+
+    def _send(self, message: Dict[str, Any]) -> None:
+        job_id = message.get("job")
+        if job_id:
+            self._seqs[job_id] = self._seqs.get(job_id, 0) + 1
+            message = {**message, "seq": self._seqs[job_id]}
+        self.emit(message)
+
+
+class LogRing:
+    """The most recent messages of the most recently active jobs, for replay.
+
+    Args:
+        per_job: Messages kept per job.
+        jobs: Jobs kept; the least recently active is forgotten first.
+    """
+
+    def __init__(self, per_job: int = RING_MESSAGES, jobs: int = RING_JOBS):
+        self.per_job = per_job
+        self.jobs = jobs
+        self._lock = threading.Lock()
+        self._messages: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+        # Latest progress-type message per job, kept apart so they do not
+        # push log lines out of the ring.
+        self._latest: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def add(self, message: Dict[str, Any]) -> None:
+        """Keep a job's message; messages without a job are not kept."""
+        job_id = message.get("job")
+        if not job_id:
+            return
+        with self._lock:
+            messages = self._messages.setdefault(job_id, deque(maxlen=self.per_job))
+            self._messages.move_to_end(job_id)
+            if message.get("type") in LATEST_TYPES:
+                self._latest.setdefault(job_id, {})[message["type"]] = message
+            else:
+                messages.append(message)
+            while len(self._messages) > self.jobs:
+                forgotten, _ = self._messages.popitem(last=False)
+                self._latest.pop(forgotten, None)
+
+    def replay(self, job_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Return the kept messages of ``job_ids`` (default: every kept job), in ``seq`` order per job."""
+        with self._lock:
+            selected = [job_id for job_id in self._messages if job_ids is None or job_id in job_ids]
+            replay = []
+            for job_id in selected:
+                messages = list(self._messages[job_id]) + list(self._latest.get(job_id, {}).values())
+                replay.extend(sorted(messages, key=lambda message: message.get("seq", 0)))
+            return replay
@@ -0,0 +1,262 @@
+"""Queue of jobs submitted to the web server, run with a concurrency limit.
+
+Every job gets an id and moves from ``queued`` to ``running`` to ``done``,
+``failed`` or ``cancelled``. Up to ``max_concurrent`` jobs run at once, each
+in its own thread with its own handlers; the rest wait in submission order.
+Within a running job, the pre-pass and encode also wait for a slot of their
+stage (see ``stages``), which the job reports as its ``stage``.
+The most recent ``HISTORY_LIMIT`` finished jobs are kept for inspection.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .pipeline import CANCELLED as OUTCOME_CANCELLED
+from .pipeline import SUCCESS
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = (DONE, FAILED, CANCELLED)
+
+HISTORY_LIMIT = 100
+
+
+class Job:
+    """One submitted job and its state.
+
+    Args:
+        kind: ``convert``, ``conform`` or ``calibration``.
+        label: Short description for job lists (usually the output file).
+        config: The submitted settings, for inspection.
+        batch: Id of the batch the job was submitted with, if any.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        label: str,
+        config: Optional[Dict[str, Any]] = None,
+        batch: Optional[str] = None,
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.label = label
+        self.config = config or {}
+        self.batch = batch
+        self.state = QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.position: Optional[int] = None
+        # ``prepass`` or ``encode``, or ``waiting:<stage>`` while all its slots are taken.
+        self.stage: Optional[str] = None
+        # Movies written, EXR temp directories created, and the PID of the
+        # running FFmpeg process, from the job's log.
+        self.outputs: List[str] = []
+        self.temp_dirs: List[str] = []
+        self.pid: Optional[int] = None
+        self.cancel_requested = False
+        # Runs the job and returns a ``pipeline`` outcome.
+        self.target: Optional[Callable[[], str]] = None
+        # The job's ``JobPipeline`` (or anything with ``cancel()``).
+        self.pipeline: Any = None
+
+    def observe(self, msg_type: str, content: str) -> None:
+        """Track progress, stage, outputs and the last error from the job's log messages."""
+        if msg_type == "progress":
+            try:
+                self.progress = float(content)
+            except ValueError:
+                pass
+        elif msg_type == "error":
+            self.error = content.strip()
+        elif msg_type == "stage":
+            self.stage = content
+        elif msg_type == "output_file" and content not in self.outputs:
+            self.outputs.append(content)
+        elif msg_type == "temp_dir" and content not in self.temp_dirs:
+            self.temp_dirs.append(content)
+        elif msg_type == "pid":
+            self.pid = int(content)
+
+    def summary(self, detail: bool = False) -> Dict[str, Any]:
+        """Return the job as a JSON-serialisable dict; ``detail`` adds its config."""
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "label": self.label,
+            "batch": self.batch,
+            "state": self.state,
+            "position": self.position,
+            "stage": self.stage,
+            "progress": round(self.progress, 1),
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if detail:
+            data["config"] = self.config
+            data["outputs"] = self.outputs
+        return data
+
+
+class JobQueue:
+    """Run submitted jobs in order, at most ``max_concurrent()`` at a time.
+
+    Args:
+        on_change: Called with a job whenever its state or queue position
+            changes.
+        max_concurrent: Returns the current limit; read each time a job
+            could start, so settings changes apply to the next job.
+    """
+
+    def __init__(self, on_change: Callable[[Job], None], max_concurrent: Callable[[], int]):
+        self.on_change = on_change
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._queued: Deque[Job] = deque()
+        self._running: Dict[str, Job] = {}
+        self._history: Deque[Job] = deque(maxlen=HISTORY_LIMIT)
+        self._jobs: Dict[str, Job] = {}
+
+    @property
+    def busy(self) -> bool:
+        """True while any job is queued or running."""
+        return bool(self._queued or self._running)
+
+    def running(self) -> List[Job]:
+        return list(self._running.values())
+
+    def submit(self, job: Job) -> Job:
+        """Queue a job; it starts as soon as a slot is free."""
+        return self.submit_all([job])[0]
+
+    def submit_all(self, jobs: List[Job]) -> List[Job]:
+        """Queue jobs one after the other, with no other job between them."""
+        with self._lock:
+            for job in jobs:
+                self._jobs[job.id] = job
+                self._queued.append(job)
+            # The new jobs either start or get a queue position.
+            started, moved = self._dispatch()
+        self._notify(started + moved)
+        self._start(started)
+        return jobs
+
+    def restore(self, finished: List[Job]) -> None:
+        """Add finished jobs from an earlier run to the history, oldest first."""
+        with self._lock:
+            for job in finished:
+                self._jobs[job.id] = job
+                self._remember(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Job]:
+        """Return running, then queued, then finished jobs (newest first)."""
+        with self._lock:
+            return list(self._running.values()) + list(self._queued) + list(reversed(self._history))
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job.
+
+        Returns:
+            The job, or None if the id is unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED:
+                return job
+            job.cancel_requested = True
+            changed: List[Job] = []
+            if job.state == QUEUED:
+                self._queued.remove(job)
+                self._finish(job, CANCELLED)
+                changed = [job] + self._renumber()
+        if job.state == RUNNING and job.pipeline is not None:
+            job.pipeline.cancel()
+        self._notify(changed)
+        return job
+
+    def _renumber(self) -> List[Job]:
+        """Update the positions of queued jobs; return those that moved."""
+        moved = []
+        for position, job in enumerate(self._queued, start=1):
+            if job.position != position:
+                job.position = position
+                moved.append(job)
+        return moved
+
+    def _dispatch(self) -> Tuple[List[Job], List[Job]]:
+        """Move queued jobs to running while slots are free; call with the lock held.
+
+        Returns:
+            ``(started, moved)``: jobs to start with ``_start`` once their
+            state has been announced, and queued jobs whose position changed.
+        """
+        started = []
+        limit = max(int(self.max_concurrent()), 1)
+        while self._queued and len(self._running) < limit:
+            job = self._queued.popleft()
+            job.state = RUNNING
+            job.position = None
+            job.started = time.time()
+            self._running[job.id] = job
+            started.append(job)
+        return started, self._renumber()
+
+    def _start(self, jobs: List[Job]) -> None:
+        for job in jobs:
+            threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _finish(self, job: Job, state: str) -> None:
+        """Record a job as finished; call with the lock held."""
+        job.state = state
+        job.position = None
+        job.stage = None
+        job.pid = None
+        job.finished = time.time()
+        self._remember(job)
+
+    def _remember(self, job: Job) -> None:
+        """Add a finished job to the history, forgetting the oldest."""
+        if len(self._history) == self._history.maxlen:
+            self._jobs.pop(self._history[0].id, None)
+        self._history.append(job)
+
+    def _run(self, job: Job) -> None:
+        try:
+            outcome = job.target() if job.target is not None else SUCCESS
+        except Exception as exc:  # noqa: BLE001
+            job.error = f"Critical Job Error: {exc}"
+            outcome = FAILED
+        if outcome == SUCCESS:
+            state = DONE
+        elif job.cancel_requested or outcome == OUTCOME_CANCELLED:
+            state = CANCELLED
+        else:
+            state = FAILED
+
+        with self._lock:
+            self._running.pop(job.id, None)
+            self._finish(job, state)
+            started, moved = self._dispatch()
+        self._notify([job] + started + moved)
+        self._start(started)
+
+    def _notify(self, jobs: List[Job]) -> None:
+        for job in jobs:
+            self.on_change(job)
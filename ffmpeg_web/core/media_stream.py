@@ -0,0 +1,72 @@
+"""HTTP range serving for movies that may still be growing on disk.
+
+Fragmented MP4 outputs (``frag_keyframe+empty_moov``) are playable as soon as
+the first fragment is written. The helpers here answer ``Range`` requests
+against the file's *current* size, so a browser can start playing the head of
+a movie while FFmpeg is still appending to it.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Iterator, Optional, Tuple
+
+CHUNK_SIZE = 256 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".mov": "video/quicktime",
+}
+
+
+def media_type_for(path: str) -> str:
+    """Return the MIME type to advertise for a movie file."""
+    return MEDIA_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range ``Range`` header into inclusive ``(start, end)``.
+
+    Returns:
+        None when no (or an unsupported multi-) range was requested.
+
+    Raises:
+        ValueError: If the range cannot be satisfied for the current size.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, min(end, size - 1)
+
+
+def iter_file_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    """Yield the bytes ``start..end`` (inclusive) of ``path`` in chunks."""
+    remaining = end - start + 1
+    with open(path, "rb") as f:
+        f.seek(start)
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,404 @@
+"""One conversion job, end to end, independent of how it was submitted.
+
+``JobPipeline`` plans, preflights, pre-passes, encodes and records
+throughput for a single ``FFmpegJobConfig``. The web ``JobManager`` runs it in
+a job process (``job_process``) and broadcasts its log over WebSockets; the CLI
+(``python -m ffmpeg_web.cli``) runs it directly and prints the log as JSON.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from .. import config
+from . import planner, preflight, profiles, scheduling, smart_encode, stages, throughput
+from .exr_handler import ExrHandler
+from .ffmpeg_handler import FFmpegHandler, FFmpegJobConfig
+from .utils import normalize_fps
+
+# Outcomes of ``JobPipeline.run``.
+SUCCESS = "success"
+FAILED = "failed"
+REJECTED = "rejected"  # Preflight found bad input frames.
+CANCELLED = "cancelled"
+
+
+class JobPipeline:
+    """Run conversion jobs with one set of FFmpeg and oiiotool handlers.
+
+    Args:
+        log_callback: Receives ``(msg_type, content)`` for every log line,
+            progress update and status message.
+        prewarmer: Optional ``prewarm.Prewarmer`` whose cache a job may claim.
+        output_paths: List to record written movies in, shared between
+            pipelines; a new list by default.
+    """
+
+    def __init__(
+        self,
+        log_callback: Callable[[str, str], None],
+        prewarmer: Any = None,
+        output_paths: Optional[List[str]] = None,
+    ):
+        self.log_callback = log_callback
+        self.ffmpeg_handler = FFmpegHandler(log_callback)
+        self.proxy_handler = FFmpegHandler(self._proxy_log_callback)
+        self.exr_handler = ExrHandler(log_callback)
+        self.prewarmer = prewarmer
+        self.is_cancelled = False
+        # Leave the EXR temp directory behind for a restarted server to resume.
+        self.keep_temp = False
+        # Movies written by jobs of this pipeline.
+        self.output_paths: List[str] = output_paths if output_paths is not None else []
+
+    def _proxy_log_callback(self, msg_type: str, content: str) -> None:
+        """Forward proxy encode logs; completion is announced as ``proxy_ready``."""
+        if msg_type == "success":
+            return
+        self.log_callback(msg_type, content)
+
+    @staticmethod
+    def plan(filename_pattern: str, profile: Optional[str], codec: Optional[str]) -> planner.PipelinePlan:
+        """Return the fastest valid pipeline for a job from the probed tool capabilities."""
+        return planner.plan_job(filename_pattern, profile, codec, config.load_settings())
+
+    @classmethod
+    def prepare(cls, job_config: FFmpegJobConfig) -> planner.PipelinePlan:
+        """Validate a job and plan its pipeline before it starts.
+
+        The plan's LUT (if any) is applied to ``job_config``; callers must
+        reject the job if ``plan.problems`` is not empty.
+
+        Raises:
+            ValueError: If the profile or scheduling class is unknown.
+        """
+        profiles.get_profile(job_config.profile)
+        scheduling.get_class(job_config.scheduling_class)
+        # Draft jobs with a baked LUT read the EXRs directly in FFmpeg when
+        # the build can.
+        plan = cls.plan(job_config.filename_pattern, job_config.profile, job_config.codec)
+        job_config.lut_path = plan.lut_path
+        # Submitted frames are the source, never pre-pass output.
+        job_config.input_scale = 1.0
+        return plan
+
+    @classmethod
+    def prepass_mode(cls, job_config: FFmpegJobConfig) -> str:
+        """Return how EXR colour is handled for a job: none, oiiotool or lut3d."""
+        return cls.plan(job_config.filename_pattern, job_config.profile, job_config.codec).prepass
+
+    @classmethod
+    def estimate(cls, job_config: FFmpegJobConfig) -> Dict[str, Any]:
+        """Predict how long ``job_config`` will take from throughput history."""
+        try:
+            first_frame = job_config.filename_pattern % job_config.start_frame
+        except (TypeError, ValueError):
+            first_frame = job_config.filename_pattern
+        width, height = throughput.probe_resolution(
+            os.path.join(job_config.input_folder, first_frame)
+        )
+        # The frames the encoder reads may already be pre-pass output.
+        scale = profiles.get_profile(job_config.profile)["scale"] / job_config.input_scale
+        if width and height and scale < 1.0:
+            width, height = int(width * scale) // 2 * 2, int(height * scale) // 2 * 2
+
+        out_fps = normalize_fps(job_config.frame_rate)[0]
+        try:
+            output_frames = int(round(out_fps * float(job_config.desired_duration)))
+        except ValueError:
+            output_frames = 0
+
+        return throughput.estimate_job(
+            codec=job_config.codec,
+            input_frames=job_config.end_frame - job_config.start_frame + 1,
+            output_frames=output_frames,
+            prepass=cls.prepass_mode(job_config),
+            width=width,
+            height=height,
+            preset=profiles.encoder_preset(job_config.codec, job_config.profile),
+        )
+
+    def preflight(self, source: Any, label: str, frames: Optional[List[int]] = None) -> bool:
+        """Check the EXR headers of a job or shot; False if it has bad frames."""
+        report = preflight.preflight_sequence(
+            source.input_folder,
+            source.filename_pattern,
+            source.start_frame,
+            source.end_frame,
+            frames=frames,
+        )
+        preflight.log_report(report, label, self.log_callback)
+        return report.ok
+
+    def run(
+        self,
+        job_config: FFmpegJobConfig,
+        plan: Optional[planner.PipelinePlan] = None,
+        resume_dir: Optional[str] = None,
+    ) -> str:
+        """Execute the EXR pre-pass (if any) and FFmpeg conversion.
+
+        Blocks until the job ends. ``plan`` comes from ``prepare``.
+        ``resume_dir`` is a temp directory of already converted frames, from an
+        interrupted run of the same job or a speculative pre-pass; they are kept.
+
+        Returns:
+            ``SUCCESS``, ``FAILED``, ``REJECTED`` or ``CANCELLED``.
+        """
+        self.is_cancelled = False
+        plan = plan or self.plan(job_config.filename_pattern, job_config.profile, job_config.codec)
+        is_exr = plan.uses_oiiotool
+        exr_phase_started = False
+        try:
+            # Resume an interrupted pre-pass, take over a speculative one, or stop it.
+            prewarm_dir = ""
+            if is_exr and resume_dir and os.path.isdir(resume_dir):
+                prewarm_dir = resume_dir
+                self.log_callback("output", f"Reusing converted frames in {resume_dir}\n")
+            elif self.prewarmer is not None:
+                if is_exr:
+                    prewarm_dir = self.prewarmer.claim(
+                        job_config.input_folder,
+                        job_config.filename_pattern,
+                        job_config.start_frame,
+                        job_config.end_frame,
+                        job_config.profile,
+                    )
+                else:
+                    self.prewarmer.cancel()
+
+            estimate = self.estimate(job_config)
+            prepass_mode = plan.prepass
+            self.log_callback("estimate", json.dumps(estimate))
+            if estimate["seconds"] is not None:
+                self.log_callback(
+                    "output",
+                    f"Estimated duration: {estimate['seconds']:.0f}s "
+                    f"(based on {estimate['basis']}).\n",
+                )
+
+            if job_config.lut_path:
+                self.log_callback(
+                    "output",
+                    f"Draft profile: reading EXRs directly with LUT {job_config.lut_path}\n",
+                )
+            if plan.notes:
+                self.log_callback(
+                    "output", f"Pipeline: {plan.prepass} ({'; '.join(plan.notes)}).\n"
+                )
+
+            # The pre-pass repoints the job at temp frames; keep the source
+            # settings for the smart re-encode manifest.
+            source_config = job_config.model_copy()
+            output_path = os.path.join(
+                job_config.output_folder,
+                profiles.tag_filename(job_config.output_filename, job_config.profile),
+            )
+
+            smart_gop = None
+            smart_plan = None
+            if job_config.smart_reencode:
+                reason = smart_encode.ineligible_reason(job_config)
+                if reason:
+                    self.log_callback("output", f"Smart re-encode disabled: {reason}.\n")
+                else:
+                    smart_gop = smart_encode.gop_for(job_config)
+                    smart_plan, note = smart_encode.plan_update(source_config, output_path)
+                    self.log_callback(
+                        "output",
+                        f"Smart re-encode: {note}"
+                        f"{'' if smart_plan else '; encoding everything'}.\n",
+                    )
+                    if smart_plan and not smart_plan.changed_frames:
+                        self.log_callback("output", "Output is already up to date.\n")
+                        self.log_callback("success", "Conversion complete!")
+                        return SUCCESS
+
+            # Reject sequences with bad frames before any pixels are decoded.
+            if source_config.filename_pattern.lower().endswith(".exr") and not self.preflight(
+                source_config,
+                source_config.filename_pattern,
+                frames=smart_plan.source_frames_to_encode if smart_plan else None,
+            ):
+                return REJECTED
+
+            # 1. EXR Conversion Pass
+            if is_exr:
+                # Waits while other jobs' pre-passes hold every slot.
+                with stages.SLOTS.slot(
+                    stages.PREPASS,
+                    self.log_callback,
+                    job_config.scheduling_class,
+                    lambda: self.is_cancelled,
+                ) as held:
+                    if not held:
+                        return CANCELLED
+                    self.log_callback("output", "Starting EXR Conversion Phase...\n")
+                    exr_phase_started = True
+
+                    temp_dir = self.exr_handler.convert_exr_sequence(
+                        input_folder=job_config.input_folder,
+                        pattern=job_config.filename_pattern,
+                        start_frame=job_config.start_frame,
+                        end_frame=job_config.end_frame,
+                        predicted_fps=estimate["prepass_fps"],
+                        profile=job_config.profile,
+                        frames=smart_plan.source_frames_to_encode if smart_plan else None,
+                        scheduling_class=job_config.scheduling_class,
+                        temp_dir=prewarm_dir or None,
+                    )
+
+                    if not temp_dir or self.exr_handler.is_cancelled:
+                        if not self.exr_handler.is_cancelled:
+                            self.log_callback("error", "EXR Conversion failed.")
+                            return FAILED
+                        return CANCELLED
+
+                    self.record_throughput(
+                        "prepass", self.exr_handler.last_stats, estimate, prepass_mode
+                    )
+
+                    # Update config for FFmpeg Pass
+                    # Point to temp PNG sequence
+                    # Assuming oiiotool output pattern logic from exr_handler (prefix + %04d.png)
+                    prefix = job_config.filename_pattern.split("%")[0]
+                    job_config.input_folder = temp_dir
+                    job_config.filename_pattern = f"{prefix}%04d.png"
+                    job_config.input_scale = profiles.prepass_scale(job_config.profile)
+
+                    self.log_callback(
+                        "output", "EXR Phase Complete. Starting FFmpeg Phase...\n"
+                    )
+
+            # Proxy and master encode; waits while other jobs' encodes hold every slot.
+            with stages.SLOTS.slot(
+                stages.ENCODE,
+                self.log_callback,
+                job_config.scheduling_class,
+                lambda: self.is_cancelled,
+            ) as held:
+                if not held:
+                    return CANCELLED
+                if job_config.fragmented_mp4:
+                    # The growing master is playable from the first fragment on.
+                    self.register_output(output_path)
+
+                # 2. Optional review proxy, reading the same (converted) frames.
+                if job_config.proxy_first and not self.is_cancelled:
+                    self._run_proxy(job_config)
+                    if self.proxy_handler.is_cancelled:
+                        return CANCELLED
+
+                # 3. FFmpeg Pass (Skipped if cancelled)
+                if self.is_cancelled:
+                    return CANCELLED
+
+                if smart_plan:
+                    if smart_encode.splice(
+                        self.ffmpeg_handler, job_config, smart_plan, self.log_callback
+                    ):
+                        smart_encode.write_manifest(
+                            source_config, output_path, smart_plan.gop, previous=smart_plan.manifest
+                        )
+                        self.log_callback(
+                            "output",
+                            f"Replaced {len(smart_plan.source_frames_to_encode)} of "
+                            f"{smart_plan.total_frames} frames.\n",
+                        )
+                        self.log_callback("success", "Conversion complete!")
+                        return SUCCESS
+                    if self.ffmpeg_handler.is_cancelled:
+                        return CANCELLED
+                    self.log_callback("error", "Smart re-encode failed; the previous output is unchanged.")
+                    return FAILED
+
+                if self.ffmpeg_handler.run_ffmpeg(
+                    job_config, predicted_fps=estimate["encode_fps"], gop=smart_gop
+                ):
+                    if smart_gop:
+                        smart_encode.write_manifest(source_config, output_path, smart_gop)
+                    self.record_throughput(
+                        "encode",
+                        self.ffmpeg_handler.last_stats,
+                        estimate,
+                        prepass_mode,
+                        codec=job_config.codec,
+                        preset=profiles.encoder_preset(job_config.codec, job_config.profile),
+                    )
+                    return SUCCESS
+                return CANCELLED if self.ffmpeg_handler.is_cancelled else FAILED
+
+        except Exception as exc:  # noqa: BLE001
+            self.log_callback("error", f"Critical Job Error: {exc}")
+            return FAILED
+        finally:
+            # 4. Cleanup (for EXR paths)
+            if is_exr and exr_phase_started and self.exr_handler.temp_dir and not self.keep_temp:
+                try:
+                    if os.path.exists(self.exr_handler.temp_dir):
+                        self.exr_handler.cleanup()
+                except Exception as cleanup_exc:  # noqa: BLE001
+                    self.log_callback(
+                        "output",
+                        f"Warning: problem during EXR temp cleanup: {cleanup_exc}\n",
+                    )
+
+    def register_output(self, path: str) -> None:
+        """Record a movie this pipeline writes and announce it as ``output_file``."""
+        path = os.path.abspath(path)
+        if path not in self.output_paths:
+            self.output_paths.append(path)
+        self.log_callback("output_file", path)
+
+    def _run_proxy(self, job_config: FFmpegJobConfig) -> None:
+        """Encode the quarter-res review proxy and notify clients when ready."""
+        proxy_config = job_config.model_copy(
+            update=profiles.proxy_overrides(job_config.output_filename)
+        )
+        self.log_callback("output", "Encoding review proxy before the master...\n")
+        if not self.proxy_handler.run_ffmpeg(proxy_config):
+            if not self.proxy_handler.is_cancelled:
+                self.log_callback(
+                    "output", "Warning: proxy encode failed; continuing with the master.\n"
+                )
+            return
+
+        proxy_path = os.path.join(
+            proxy_config.output_folder,
+            profiles.tag_filename(proxy_config.output_filename, proxy_config.profile),
+        )
+        self.register_output(proxy_path)
+        self.log_callback("proxy_ready", proxy_path)
+        self.log_callback("output", "Proxy ready. Starting full-quality master...\n")
+
+    @staticmethod
+    def record_throughput(
+        stage: str,
+        stats: Optional[Dict[str, float]],
+        estimate: Dict[str, Any],
+        prepass: str,
+        codec: str = "",
+        preset: str = "",
+    ) -> None:
+        """Store a finished stage's throughput so future estimates improve."""
+        if not stats:
+            return
+        throughput.record_sample(
+            stage,
+            int(stats["frames"]),
+            stats["seconds"],
+            codec=codec,
+            width=estimate.get("width"),
+            height=estimate.get("height"),
+            preset=preset,
+            prepass=prepass,
+        )
+
+    def cancel(self) -> None:
+        """Signal the running job (if any) to cancel."""
+        self.is_cancelled = True
+        self.proxy_handler.cancel()
+        self.ffmpeg_handler.cancel()
+        self.exr_handler.cancel()
@@ -0,0 +1,105 @@
+"""Choose the fastest valid pipeline for a job from the probed capabilities.
+
+For EXR input the candidates, fastest first, are:
+
+- ``lut3d``: FFmpeg decodes the EXRs itself and applies the baked LUT; no
+  intermediate frames. Draft profile only, needs a LUT file, FFmpeg's ``exr``
+  decoder and ``lut3d`` filter.
+- ``oiiotool_draft``: oiiotool pre-pass resampling early (draft profile).
+- ``oiiotool``: full-resolution oiiotool pre-pass, the reference pipeline.
+
+Other input is read by FFmpeg directly (``none``). A plan also checks that the
+FFmpeg build has the job's encoder. When the tools could not be probed at all,
+the plan assumes they can do what the job needs rather than blocking it.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from . import capabilities, profiles
+
+ENCODERS = {"h264": "libx264", "h265": "libx265", "qtrle": "qtrle"}
+
+
+class PipelinePlan(BaseModel):
+    """How a job will be run."""
+
+    prepass: str
+    lut_path: Optional[str] = None
+    # Why faster pipelines were not chosen, for the job log.
+    notes: List[str] = []
+    # Missing capabilities that leave the job without a valid pipeline.
+    problems: List[str] = []
+
+    @property
+    def uses_oiiotool(self) -> bool:
+        return self.prepass.startswith("oiiotool")
+
+
+def _encoder_for(codec: str) -> str:
+    return "prores_ks" if codec.startswith("prores") else ENCODERS.get(codec, codec)
+
+
+def _exr_candidates(
+    profile: str, settings: Dict[str, Any], caps: Dict[str, Dict[str, Any]]
+) -> List[Tuple[str, Optional[str], List[str]]]:
+    """Return ``(prepass, lut_path, missing)`` for each EXR pipeline, fastest first."""
+    candidates: List[Tuple[str, Optional[str], List[str]]] = []
+    lut_path = profiles.lut_path_for(profile, settings)
+    if lut_path:
+        missing = []
+        if caps["ffmpeg"].get("available"):
+            if not capabilities.has(caps, "ffmpeg", "decoders", "exr"):
+                missing.append("FFmpeg has no EXR decoder")
+            if not capabilities.has(caps, "ffmpeg", "filters", "lut3d"):
+                missing.append("FFmpeg has no lut3d filter")
+        candidates.append(("lut3d", lut_path, missing))
+
+    oiiotool_missing = [] if capabilities.has(caps, "oiiotool") else ["oiiotool is not on PATH"]
+    mode = "oiiotool_draft" if profile == "draft" else "oiiotool"
+    candidates.append((mode, None, oiiotool_missing))
+    return candidates
+
+
+def plan_job(
+    filename_pattern: str,
+    profile: Optional[str],
+    codec: Optional[str],
+    settings: Dict[str, Any],
+    caps: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> PipelinePlan:
+    """Pick the fastest pipeline whose requirements the installed tools meet.
+
+    ``codec`` may be None to plan the input side only.
+
+    Returns:
+        The plan; ``problems`` is non-empty if no pipeline is valid.
+    """
+    caps = caps if caps is not None else capabilities.get_capabilities()
+    profile = profile or profiles.DEFAULT_PROFILE
+    notes: List[str] = []
+    problems: List[str] = []
+
+    encoder = _encoder_for(codec) if codec else None
+    if (
+        encoder in capabilities.FFMPEG_ENCODERS
+        and caps["ffmpeg"].get("available")
+        and not capabilities.has(caps, "ffmpeg", "encoders", encoder)
+    ):
+        problems.append(f"FFmpeg has no {encoder} encoder")
+
+    if not filename_pattern.lower().endswith(".exr"):
+        return PipelinePlan(prepass="none", problems=problems)
+
+    candidates = _exr_candidates(profile, settings, caps)
+    for prepass, lut_path, missing in candidates:
+        if not missing:
+            return PipelinePlan(prepass=prepass, lut_path=lut_path, notes=notes, problems=problems)
+        notes.append(f"{prepass} unavailable: {', '.join(missing)}")
+
+    # Nothing is valid; report the reference pipeline and what it lacks.
+    prepass, lut_path, missing = candidates[-1]
+    return PipelinePlan(prepass=prepass, lut_path=lut_path, notes=notes, problems=problems + missing)
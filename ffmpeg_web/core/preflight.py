@@ -0,0 +1,307 @@
+"""EXR header preflight: find bad frames before any pixels are decoded.
+
+A job that dies at frame 1800 because one EXR is truncated or was rendered at
+the wrong resolution wastes everything before it. The preflight reads only the
+header and chunk offset table of every frame, in parallel, and checks that:
+
+- the file is an OpenEXR file and its header parses;
+- the display window, data window, channel list and compression match the
+  rest of the sequence;
+- every chunk the offset table points at lies inside the file (a truncated or
+  still-being-written file fails this);
+- the file is not much smaller than its neighbours, which usually means a
+  truncated file in a layout whose offset table cannot be checked here.
+
+Structural problems are errors and reject the job; size outliers are warnings.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import struct
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .frames import FrameManifest, format_frame_ranges
+
+EXR_MAGIC = 20000630
+
+# Version field flags.
+_TILED = 0x200
+_DEEP = 0x800
+_MULTIPART = 0x1000
+
+COMPRESSION_NAMES = ["none", "rle", "zips", "zip", "piz", "pxr24", "b44", "b44a", "dwaa", "dwab"]
+# Scanlines stored per chunk for each compression.
+_LINES_PER_CHUNK = {0: 1, 1: 1, 2: 1, 3: 16, 4: 32, 5: 16, 6: 32, 7: 32, 8: 32, 9: 256}
+
+# Attribute values larger than this mean the header is corrupt.
+_MAX_ATTRIBUTE_SIZE = 16 * 1024 * 1024
+# Files below this fraction of their neighbours' median size are flagged.
+SIZE_OUTLIER_RATIO = 0.5
+_NEIGHBOURS = 4
+_MAX_WORKERS = 16
+
+# How long the web server waits for a preflight (see ``fs_pool``); a long
+# sequence on a slow mount needs much longer than a directory listing.
+TIMEOUT_SECONDS = 120.0
+
+# Attributes that must agree across the sequence, with their log names.
+CONSISTENCY_KEYS = [
+    ("display_window", "resolution"),
+    ("data_window", "data window"),
+    ("channels", "channels"),
+    ("compression", "compression"),
+]
+
+
+class PreflightReport(BaseModel):
+    """Result of preflighting one sequence."""
+
+    checked: int = 0
+    seconds: float = 0.0
+    # Most common header values across the sequence.
+    reference: Dict[str, Any] = {}
+    errors: Dict[int, str] = {}
+    warnings: Dict[int, str] = {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def describe_errors(self, limit: int = 20) -> str:
+        """Return the bad frames as log lines, most useful first."""
+        lines = [f"  frame {frame}: {reason}" for frame, reason in sorted(self.errors.items())[:limit]]
+        if len(self.errors) > limit:
+            lines.append(f"  ... and {len(self.errors) - limit} more")
+        return "\n".join(lines)
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("header ends early (truncated)")
+    return data
+
+
+def _read_cstring(f: BinaryIO, limit: int = 256) -> str:
+    chars = bytearray()
+    while True:
+        byte = _read_exact(f, 1)
+        if byte == b"\0":
+            return chars.decode("latin-1")
+        chars += byte
+        if len(chars) > limit:
+            raise ValueError("corrupt header (unterminated name)")
+
+
+def _parse_channels(value: bytes) -> Tuple[str, ...]:
+    names = []
+    pos = 0
+    while pos < len(value) and value[pos] != 0:
+        end = value.index(b"\0", pos)
+        names.append(value[pos:end].decode("latin-1"))
+        # pixel type, pLinear + reserved, x/y sampling.
+        pos = end + 1 + 16
+    return tuple(sorted(names))
+
+
+def read_exr_header(path: str) -> Dict[str, Any]:
+    """Read the header of a single-part EXR and check its chunk offsets.
+
+    Returns:
+        ``display_window``/``data_window`` as ``(xmin, ymin, xmax, ymax)``,
+        sorted ``channels``, ``compression`` name and file ``size``.
+
+    Raises:
+        ValueError: If the file is not a readable, complete EXR.
+        OSError: If the file cannot be read.
+    """
+    size = os.path.getsize(path)
+    header: Dict[str, Any] = {"size": size}
+    attributes: Dict[str, Tuple[str, bytes]] = {}
+    with open(path, "rb") as f:
+        magic, version = struct.unpack("<ii", _read_exact(f, 8))
+        if magic != EXR_MAGIC:
+            raise ValueError("not an OpenEXR file")
+        while True:
+            name = _read_cstring(f)
+            if not name:
+                break
+            type_name = _read_cstring(f)
+            (attr_size,) = struct.unpack("<i", _read_exact(f, 4))
+            if attr_size < 0 or attr_size > _MAX_ATTRIBUTE_SIZE:
+                raise ValueError(f"corrupt header (attribute '{name}')")
+            attributes[name] = (type_name, _read_exact(f, attr_size))
+
+        for required in ("channels", "compression", "dataWindow", "displayWindow"):
+            if required not in attributes:
+                raise ValueError(f"header has no '{required}' attribute")
+        data_window = struct.unpack("<iiii", attributes["dataWindow"][1][:16])
+        compression = attributes["compression"][1][0]
+        header["data_window"] = data_window
+        header["display_window"] = struct.unpack("<iiii", attributes["displayWindow"][1][:16])
+        header["channels"] = _parse_channels(attributes["channels"][1])
+        header["compression"] = (
+            COMPRESSION_NAMES[compression] if compression < len(COMPRESSION_NAMES) else str(compression)
+        )
+
+        # Multi-part, deep and mip-mapped tiled files are checked by header only.
+        if version & (_MULTIPART | _DEEP):
+            return header
+        width = data_window[2] - data_window[0] + 1
+        height = data_window[3] - data_window[1] + 1
+        if version & _TILED:
+            tiles = attributes.get("tiles", ("", b""))[1]
+            if len(tiles) < 9 or tiles[8] & 0x0F != 0:
+                return header
+            tile_x, tile_y = struct.unpack("<II", tiles[:8])
+            if not tile_x or not tile_y:
+                raise ValueError("corrupt header (zero tile size)")
+            chunks = math.ceil(width / tile_x) * math.ceil(height / tile_y)
+            chunk_header = 20
+        else:
+            lines = _LINES_PER_CHUNK.get(compression)
+            if lines is None:
+                return header
+            chunks = math.ceil(height / lines)
+            chunk_header = 8
+
+        table = _read_exact(f, 8 * chunks)
+        offsets = struct.unpack(f"<{chunks}Q", table)
+        table_end = f.tell()
+        for index, offset in enumerate(offsets):
+            if offset < table_end or offset + chunk_header > size:
+                raise ValueError(
+                    f"truncated: chunk {index + 1} of {chunks} is missing "
+                    f"({size} bytes on disk)"
+                )
+        last = max(offsets)
+        f.seek(last + chunk_header - 4)
+        (data_size,) = struct.unpack("<i", _read_exact(f, 4))
+        if data_size < 0 or last + chunk_header + data_size > size:
+            raise ValueError(
+                f"truncated: last chunk needs {last + chunk_header + data_size} bytes, "
+                f"file has {size}"
+            )
+    return header
+
+
+def _read_or_error(path: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    try:
+        return read_exr_header(path), None
+    except (OSError, ValueError, struct.error) as exc:
+        return None, str(exc)
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, tuple) and len(value) == 4 and all(isinstance(v, int) for v in value):
+        return f"{value[0]},{value[1]}-{value[2]},{value[3]}"
+    if isinstance(value, tuple):
+        return ",".join(value)
+    return str(value)
+
+
+def _size_outliers(sizes: Dict[int, int]) -> Dict[int, str]:
+    """Flag frames much smaller than the frames around them."""
+    frames = sorted(sizes)
+    outliers: Dict[int, str] = {}
+    for index, frame in enumerate(frames):
+        around = frames[max(0, index - _NEIGHBOURS):index] + frames[index + 1:index + 1 + _NEIGHBOURS]
+        if len(around) < 2:
+            continue
+        typical = median(sizes[f] for f in around)
+        if typical and sizes[frame] < typical * SIZE_OUTLIER_RATIO:
+            outliers[frame] = (
+                f"{sizes[frame]} bytes, {sizes[frame] * 100 // int(typical)}% of its neighbours"
+            )
+    return outliers
+
+
+def preflight_sequence(
+    folder: str,
+    pattern: str,
+    start_frame: int,
+    end_frame: int,
+    frames: Optional[Iterable[int]] = None,
+) -> PreflightReport:
+    """Check the headers of every existing frame of an EXR sequence.
+
+    Missing frames are not reported; they are held at encode time.
+
+    Args:
+        frames: Only check these frames (all of the range by default).
+
+    Raises:
+        ValueError: If the pattern has no frame number placeholder.
+    """
+    started = time.monotonic()
+    manifest = FrameManifest.scan(folder, pattern, with_stat=True)
+    wanted = set(frames) if frames is not None else None
+    todo = [
+        frame for frame in manifest
+        if start_frame <= frame <= end_frame and (wanted is None or frame in wanted)
+    ]
+
+    headers: Dict[int, Dict[str, Any]] = {}
+    report = PreflightReport(checked=len(todo))
+    if todo:
+        with ThreadPoolExecutor(max_workers=min(_MAX_WORKERS, len(todo))) as executor:
+            results = executor.map(_read_or_error, (manifest.path(frame) for frame in todo))
+            for frame, (header, error) in zip(todo, results):
+                if error:
+                    report.errors[frame] = error
+                else:
+                    headers[frame] = header
+
+    for key, label in CONSISTENCY_KEYS:
+        counts = Counter(header[key] for header in headers.values())
+        if not counts:
+            continue
+        expected = counts.most_common(1)[0][0]
+        report.reference[key] = expected
+        for frame, header in headers.items():
+            if header[key] != expected and frame not in report.errors:
+                report.errors[frame] = (
+                    f"{label} {_format_value(header[key])}, "
+                    f"sequence has {_format_value(expected)}"
+                )
+
+    # Sizes come from the listing, so every frame is compared, including
+    # ones whose header failed.
+    sizes = {frame: manifest.stat(frame)[0] for frame in todo}
+    for frame, note in _size_outliers(sizes).items():
+        if frame not in report.errors:
+            report.warnings[frame] = note
+
+    report.seconds = time.monotonic() - started
+    return report
+
+
+def log_report(
+    report: PreflightReport, label: str, log_callback: Callable[[str, str], None]
+) -> None:
+    """Write a preflight report to the job log."""
+    log_callback(
+        "output",
+        f"Preflight: checked {report.checked} EXR headers of {label} in {report.seconds:.1f}s.\n",
+    )
+    if report.warnings:
+        log_callback(
+            "output",
+            f"Preflight warning: {len(report.warnings)} frames are much smaller than their "
+            f"neighbours and may be truncated: {format_frame_ranges(report.warnings)}\n",
+        )
+    if report.errors:
+        log_callback(
+            "error",
+            f"Preflight failed: {len(report.errors)} bad frame{'s' if len(report.errors) != 1 else ''} "
+            f"in {label} "
+            f"({format_frame_ranges(report.errors)}):\n{report.describe_errors()}",
+        )
@@ -0,0 +1,193 @@
+"""Speculative EXR pre-pass, started as soon as a sequence is selected.
+
+Between picking an EXR sequence and pressing Run the machine is usually idle.
+When the ``prewarm`` setting is on, selecting a sequence starts converting it
+into a cache directory at ``background`` priority. The job that follows for
+the same sequence and profile claims the cache and only converts what is
+left. Selecting something else, or starting any other job, cancels the
+speculative work and deletes its cache.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from .exr_handler import ExrHandler
+from .frames import FrameManifest
+
+SCHEDULING_CLASS = "background"
+
+
+class _Run:
+    """One speculative conversion."""
+
+    def __init__(self, key: Tuple[str, str, str], start_frame: int, end_frame: int, cache_dir: str):
+        self.key = key
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.cache_dir = cache_dir
+        self.state = "running"
+        self.handler: Optional[ExrHandler] = None
+        self.thread: Optional[threading.Thread] = None
+
+
+class Prewarmer:
+    """Run at most one speculative pre-pass and hand its cache to the next job."""
+
+    def __init__(self, log_callback: Callable[[str, str], None]):
+        self.log_callback = log_callback
+        self._lock = threading.Lock()
+        self._run: Optional[_Run] = None
+
+    @staticmethod
+    def _key(input_folder: str, pattern: str, profile: Optional[str]) -> Tuple[str, str, str]:
+        return (os.path.abspath(input_folder), pattern, profile or "")
+
+    def _handler_log(self, run: _Run, msg_type: str, content: str) -> None:
+        # Speculative work stays out of the job log; only progress is reported.
+        if msg_type == "progress" and self._run is run:
+            self._report(progress=float(content))
+
+    def _report(self, progress: Optional[float] = None) -> None:
+        """Broadcast the state of the current selection as a ``prewarm`` message."""
+        run = self._run
+        if run is None:
+            self.log_callback("prewarm", json.dumps({"state": "idle"}))
+            return
+        status = {"state": run.state, "pattern": run.key[1]}
+        if progress is not None:
+            status["progress"] = round(progress, 1)
+        self.log_callback("prewarm", json.dumps(status))
+
+    def start(
+        self,
+        input_folder: str,
+        pattern: str,
+        start_frame: int,
+        end_frame: int,
+        profile: Optional[str] = None,
+    ) -> str:
+        """Start converting a selected sequence, replacing any other selection.
+
+        Returns:
+            The state of the speculative run for this selection.
+        """
+        key = self._key(input_folder, pattern, profile)
+        with self._lock:
+            previous = self._run
+            if (
+                previous is not None
+                and previous.key == key
+                and (previous.start_frame, previous.end_frame) == (start_frame, end_frame)
+                and previous.state in ("running", "ready")
+            ):
+                return previous.state
+            cache_dir = os.path.join(input_folder, f"ffmpeg_web_tmp_prewarm_{int(time.time() * 1000)}")
+            run = _Run(key, start_frame, end_frame, cache_dir)
+            run.handler = ExrHandler(lambda msg_type, content: self._handler_log(run, msg_type, content))
+            self._run = run
+            # The previous run is stopped by the new thread, so selecting a
+            # sequence never waits for oiiotool processes to exit.
+            run.thread = threading.Thread(
+                target=self._convert, args=(run, previous, input_folder, pattern, profile), daemon=True
+            )
+            run.thread.start()
+        return run.state
+
+    def _convert(
+        self,
+        run: _Run,
+        previous: Optional[_Run],
+        input_folder: str,
+        pattern: str,
+        profile: Optional[str],
+    ) -> None:
+        if previous is not None:
+            self._stop(previous, evict=True)
+        if self._run is not run:
+            return
+        self._report()
+        temp_dir = run.handler.convert_exr_sequence(
+            input_folder=input_folder,
+            pattern=pattern,
+            start_frame=run.start_frame,
+            end_frame=run.end_frame,
+            profile=profile,
+            scheduling_class=SCHEDULING_CLASS,
+            temp_dir=run.cache_dir,
+        )
+        # The handler falls back to /tmp if the input folder is read-only.
+        run.cache_dir = run.handler.temp_dir or run.cache_dir
+        if run.state == "running":
+            run.state = "ready" if temp_dir else "failed"
+        if self._run is run:
+            self._report()
+
+    def _stop(self, run: _Run, evict: bool) -> None:
+        """Cancel a run, wait for its workers and optionally delete its cache."""
+        if run.state == "running":
+            run.state = "cancelled"
+        if run.thread is not None and run.thread is not threading.current_thread():
+            # Cancel repeatedly: a cancel that lands before the conversion has
+            # started is reset by it.
+            while run.thread.is_alive():
+                run.handler.cancel()
+                run.thread.join(0.2)
+        if evict:
+            shutil.rmtree(run.cache_dir, ignore_errors=True)
+
+    def cancel(self) -> None:
+        """Stop any speculative work and delete its cache."""
+        with self._lock:
+            run, self._run = self._run, None
+        if run is not None:
+            self._stop(run, evict=True)
+            self._report()
+
+    def claim(
+        self,
+        input_folder: str,
+        pattern: str,
+        start_frame: int,
+        end_frame: int,
+        profile: Optional[str] = None,
+    ) -> str:
+        """Hand the cache of a matching selection to a job.
+
+        Speculative work always stops; the cache is kept only if it was made
+        for the same sequence and profile, with frames outside the job's
+        range removed.
+
+        Returns:
+            The cache directory, or an empty string if there is nothing to reuse.
+        """
+        with self._lock:
+            run, self._run = self._run, None
+        if run is None:
+            return ""
+        matches = run.key == self._key(input_folder, pattern, profile)
+        self._stop(run, evict=not matches)
+        self._report()
+        if not matches or not os.path.isdir(run.cache_dir):
+            return ""
+
+        manifest = FrameManifest.scan(run.cache_dir, f"{pattern.split('%')[0]}%04d.png")
+        ready = 0
+        for frame in manifest:
+            if start_frame <= frame <= end_frame:
+                ready += 1
+                continue
+            try:
+                os.remove(manifest.path(frame))
+            except OSError:
+                pass
+        self.log_callback(
+            "output",
+            f"Speculative pre-pass: {ready} of {end_frame - start_frame + 1} frames already converted.\n",
+        )
+        return run.cache_dir
@@ -0,0 +1,142 @@
+"""Speed profiles for conversion jobs.
+
+``delivery`` is the historical behaviour: ``-preset medium`` with strict CBR
+and a full-resolution, exact oiiotool colour pre-pass for EXR input.
+
+``draft`` is meant for internal dailies and trades quality for turnaround:
+
+- the fastest encoder presets and ProRes Proxy,
+- half resolution, applied as the first filter (and inside the EXR pre-pass),
+- capped VBR instead of strict CBR,
+- EXR colour handled by FFmpeg's ``lut3d`` filter when a baked LUT is
+  configured (``exr_lut_path`` setting), skipping the oiiotool pass entirely.
+
+Draft outputs are tagged with ``_draft`` in the filename and in the container
+``comment`` metadata so they cannot be mistaken for deliverables.
+
+``proxy`` is the quarter-resolution H.264 review movie produced ahead of the
+master when a job asks for ``proxy_first``.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional
+
+SPEED_PROFILES: Dict[str, Dict[str, Any]] = {
+    "delivery": {
+        "presets": {"h264": "medium", "h265": "medium"},
+        "scale": 1.0,
+        "strict_cbr": True,
+        "prores_profile": None,
+        "filename_tag": "",
+    },
+    "draft": {
+        "presets": {"h264": "ultrafast", "h265": "ultrafast"},
+        "scale": 0.5,
+        "strict_cbr": False,
+        "prores_profile": "0",  # ProRes Proxy
+        "filename_tag": "_draft",
+    },
+    "proxy": {
+        "presets": {"h264": "ultrafast", "h265": "ultrafast"},
+        "scale": 0.25,
+        "strict_cbr": False,
+        "prores_profile": "0",
+        "filename_tag": "_proxy",
+    },
+}
+
+# Proxies are always small H.264 MP4s so any browser or player can open them.
+PROXY_CODEC = "h264"
+PROXY_BITRATE = "8"
+
+DEFAULT_PROFILE = "delivery"
+
+
+def get_profile(name: Optional[str]) -> Dict[str, Any]:
+    """Return the settings of a speed profile.
+
+    Raises:
+        ValueError: If ``name`` is not a known profile.
+    """
+    name = name or DEFAULT_PROFILE
+    if name not in SPEED_PROFILES:
+        raise ValueError(
+            f"Unknown profile '{name}'. Expected one of: {', '.join(SPEED_PROFILES)}"
+        )
+    return SPEED_PROFILES[name]
+
+
+def encoder_preset(codec: str, profile: Optional[str] = None) -> str:
+    """Return the x264/x265 preset used for ``codec`` under ``profile``."""
+    return get_profile(profile)["presets"].get(codec, "")
+
+
+def tag_filename(filename: str, profile: Optional[str] = None) -> str:
+    """Insert the profile tag before the extension, e.g. ``shot_draft.mp4``."""
+    tag = get_profile(profile)["filename_tag"]
+    if not tag:
+        return filename
+    base, ext = os.path.splitext(filename)
+    if base.endswith(tag):
+        return filename
+    return f"{base}{tag}{ext}"
+
+
+def prepass_scale(profile: Optional[str] = None) -> float:
+    """Return the scale ``oiiotool_resample_args`` applies to pre-pass frames."""
+    return min(get_profile(profile)["scale"], 1.0)
+
+
+def scale_filter(profile: Optional[str] = None, input_scale: float = 1.0) -> Optional[str]:
+    """Return an FFmpeg ``scale`` filter for the profile, or None at full size.
+
+    ``input_scale`` is the scale already applied to the input frames (by the
+    EXR pre-pass, see ``prepass_scale``); only the rest is applied here.
+    Dimensions are rounded down to even numbers so 4:2:0 output stays valid.
+    """
+    factor = get_profile(profile)["scale"] / input_scale
+    if factor >= 1.0:
+        return None
+    return f"scale=trunc(iw*{factor}/2)*2:trunc(ih*{factor}/2)*2"
+
+
+def oiiotool_resample_args(profile: Optional[str] = None) -> List[str]:
+    """Return oiiotool arguments that shrink frames early in the pre-pass."""
+    factor = get_profile(profile)["scale"]
+    if factor >= 1.0:
+        return []
+    return ["--resample", f"{factor * 100:g}%"]
+
+
+def metadata_args(profile: Optional[str] = None) -> List[str]:
+    """Return FFmpeg ``-metadata`` arguments recording the profile."""
+    name = profile or DEFAULT_PROFILE
+    if name == DEFAULT_PROFILE:
+        return []
+    return ["-metadata", f"comment=ffmpeg_web profile={name}"]
+
+
+def proxy_overrides(output_filename: str) -> Dict[str, Any]:
+    """Return the job fields that turn a master job into its review proxy."""
+    base, _ = os.path.splitext(output_filename)
+    return {
+        "profile": "proxy",
+        "codec": PROXY_CODEC,
+        "mp4_bitrate": PROXY_BITRATE,
+        "audio_option": "No Audio",
+        "output_filename": tag_filename(f"{base}.mp4", "proxy"),
+    }
+
+
+def lut_path_for(profile: Optional[str], settings: Dict[str, Any]) -> Optional[str]:
+    """Return the baked colour LUT used to skip the EXR pre-pass, if any.
+
+    Only the ``draft`` profile trades the exact OCIO transform for a LUT, and
+    only when ``exr_lut_path`` points to an existing file.
+    """
+    if (profile or DEFAULT_PROFILE) != "draft":
+        return None
+    lut_path = settings.get("exr_lut_path") or ""
+    return lut_path if lut_path and os.path.isfile(lut_path) else None
@@ -0,0 +1,149 @@
+"""CPU thread budget shared by every encode and EXR pre-pass in the process.
+
+FFmpeg, x264/x265 and the oiiotool pool all size themselves to the whole
+machine by default, so two concurrent stages oversubscribe the cores and lose
+throughput to context switching. Each stage instead reserves a share of the
+budget for as long as it runs and passes that share on as explicit thread
+flags.
+
+A running process cannot be resized, so shares are fixed when a stage starts:
+a stage gets ``budget * weight / total_weight`` of the stages active at that
+moment (at least one thread). The budget defaults to every core and can be
+lowered with the ``cpu_budget`` setting to keep cores free for other work.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .. import config
+from . import capabilities
+
+
+class Allocation:
+    """Threads granted to one running stage."""
+
+    def __init__(self, alloc_id: int, label: str, threads: int, weight: float):
+        self.id = alloc_id
+        self.label = label
+        self.threads = threads
+        self.weight = weight
+
+    def __repr__(self) -> str:
+        return f"Allocation({self.label!r}, threads={self.threads})"
+
+
+class ThreadBudget:
+    """Hand out CPU shares to concurrently running stages."""
+
+    def __init__(self, total: Optional[int] = None):
+        self._total = total
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._active: Dict[int, Allocation] = {}
+
+    @property
+    def total(self) -> int:
+        """Number of threads the budget distributes."""
+        if self._total:
+            return self._total
+        cores = os.cpu_count() or 4
+        try:
+            configured = int(config.load_settings().get("cpu_budget") or 0)
+        except (TypeError, ValueError):
+            configured = 0
+        return min(configured, cores) if configured > 0 else cores
+
+    def acquire(self, label: str, weight: float = 1.0, limit: Optional[int] = None) -> Allocation:
+        """Reserve a share of the budget for a stage that is about to start.
+
+        ``limit`` caps the share, e.g. to the size of a pinned CPU set.
+        """
+        total = self.total
+        with self._lock:
+            weights = sum(a.weight for a in self._active.values()) + weight
+            threads = max(1, int(total * weight / weights))
+            if limit:
+                threads = min(threads, limit)
+            allocation = Allocation(next(self._ids), label, threads, weight)
+            self._active[allocation.id] = allocation
+        return allocation
+
+    def release(self, allocation: Allocation) -> None:
+        """Return a stage's share once its process has exited."""
+        with self._lock:
+            self._active.pop(allocation.id, None)
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        """Return the current allocations, for status reporting."""
+        with self._lock:
+            return [
+                {"label": a.label, "threads": a.threads, "weight": a.weight}
+                for a in self._active.values()
+            ]
+
+    def log_allocation(self, allocation: Allocation, log_callback: Callable[[str, str], None]) -> None:
+        """Write an allocation to the job log."""
+        running = len(self.snapshot())
+        log_callback(
+            "output",
+            f"CPU budget: {allocation.label} gets {allocation.threads} of {self.total} threads "
+            f"({running} stage{'s' if running != 1 else ''} running)\n",
+        )
+
+    @contextmanager
+    def reserve(
+        self,
+        label: str,
+        log_callback: Optional[Callable[[str, str], None]] = None,
+        weight: float = 1.0,
+        limit: Optional[int] = None,
+    ) -> Iterator[Allocation]:
+        """Hold an allocation for the duration of a ``with`` block.
+
+        The allocation is written to the job log when ``log_callback`` is given.
+        """
+        allocation = self.acquire(label, weight, limit)
+        if log_callback:
+            self.log_allocation(allocation, log_callback)
+        try:
+            yield allocation
+        finally:
+            self.release(allocation)
+
+
+# Process-wide budget used by the handlers.
+BUDGET = ThreadBudget()
+
+
+def ffmpeg_thread_args(threads: Optional[int]) -> List[str]:
+    """Return FFmpeg output options limiting encoder and filter threads."""
+    if not threads:
+        return []
+    args = ["-threads", str(threads)]
+    if capabilities.ffmpeg_option("filter_threads"):
+        args += ["-filter_threads", str(threads)]
+    return args
+
+
+def x265_frame_threads(threads: int) -> int:
+    """Return x265 ``frame-threads`` for a pool size (x265's own defaults)."""
+    for cores, frame_threads in ((32, 6), (16, 5), (8, 3), (4, 2)):
+        if threads >= cores:
+            return frame_threads
+    return 1
+
+
+def encoder_thread_params(codec: str, threads: Optional[int]) -> List[str]:
+    """Return x264/x265 parameter entries (``key=value``) for a thread share."""
+    if not threads:
+        return []
+    if codec == "h264":
+        return [f"threads={threads}"]
+    if codec == "h265":
+        return [f"pools={threads}", f"frame-threads={x265_frame_threads(threads)}"]
+    return []
@@ -0,0 +1,160 @@
+"""Scheduling classes for the FFmpeg and oiiotool processes a job spawns.
+
+A job picks one of three classes:
+
+- ``interactive``: default priority, for a shot someone is waiting on.
+- ``batch``: lower CPU priority and best-effort I/O at the lowest level, so the
+  workstation and the web server stay responsive.
+- ``background``: lowest CPU priority and idle I/O, only using what nobody
+  else wants (speculative or overnight work).
+
+Each class may also be pinned to a CPU set through the ``cpu_sets`` setting,
+e.g. ``{"background": "8-15"}``. The policy is applied in the child between
+``fork`` and ``exec`` (``preexec_fn``), so every thread FFmpeg or oiiotool
+starts inherits it. ioprio is Linux-only and CPU pinning needs
+``os.sched_setaffinity``; both are skipped where unsupported.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import os
+import platform
+from typing import Any, Callable, Dict, Optional, Set
+
+from .. import config
+
+DEFAULT_CLASS = "interactive"
+
+# ioprio classes from linux/ioprio.h.
+IOPRIO_CLASS_BE = 2
+IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_WHO_PROCESS = 1
+
+SCHEDULING_CLASSES: Dict[str, Dict[str, Any]] = {
+    "interactive": {"nice": 0, "ioprio": None},
+    "batch": {"nice": 10, "ioprio": (IOPRIO_CLASS_BE, 7)},
+    "background": {"nice": 19, "ioprio": (IOPRIO_CLASS_IDLE, 0)},
+}
+
+# ioprio_set syscall numbers for the architectures we run on.
+_IOPRIO_SET_SYSCALL = {"x86_64": 251, "aarch64": 30, "i386": 289, "i686": 289}
+
+
+def get_class(name: Optional[str]) -> Dict[str, Any]:
+    """Return the settings of a scheduling class.
+
+    Raises:
+        ValueError: If ``name`` is not a known class.
+    """
+    name = name or DEFAULT_CLASS
+    if name not in SCHEDULING_CLASSES:
+        raise ValueError(
+            f"Unknown scheduling class '{name}'. "
+            f"Expected one of: {', '.join(SCHEDULING_CLASSES)}"
+        )
+    return SCHEDULING_CLASSES[name]
+
+
+def parse_cpu_set(spec: str) -> Set[int]:
+    """Parse a CPU list such as ``0-3,8,10-11``.
+
+    Raises:
+        ValueError: If the list is malformed.
+    """
+    cpus: Set[int] = set()
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = (int(value) for value in part.split("-", 1))
+            if last < first:
+                raise ValueError(f"Invalid CPU range '{part}'")
+            cpus.update(range(first, last + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def cpu_set_for(name: Optional[str]) -> Optional[Set[int]]:
+    """Return the CPUs a class is pinned to, or None if it is not pinned.
+
+    CPUs the machine does not have are ignored; a set with none left is
+    treated as unpinned.
+    """
+    spec = (config.load_settings().get("cpu_sets") or {}).get(name or DEFAULT_CLASS) or ""
+    if not spec or not hasattr(os, "sched_setaffinity"):
+        return None
+    try:
+        cpus = parse_cpu_set(spec) & os.sched_getaffinity(0)
+    except (ValueError, OSError):
+        return None
+    return cpus or None
+
+
+def _ioprio_setter() -> Optional[Callable[[int, int], None]]:
+    """Return a function calling the ``ioprio_set`` syscall, if available."""
+    number = _IOPRIO_SET_SYSCALL.get(platform.machine())
+    if platform.system() != "Linux" or number is None:
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+    except OSError:
+        return None
+
+    def _set(io_class: int, level: int) -> None:
+        libc.syscall(number, _IOPRIO_WHO_PROCESS, 0, (io_class << _IOPRIO_CLASS_SHIFT) | level)
+
+    return _set
+
+
+def preexec_for(name: Optional[str]) -> Optional[Callable[[], None]]:
+    """Return a ``preexec_fn`` applying a scheduling class in the child.
+
+    Everything is resolved in the parent; the returned function only makes
+    system calls. Returns None when there is nothing to change (interactive
+    and unpinned) or on platforms without ``preexec_fn``.
+
+    Raises:
+        ValueError: If ``name`` is not a known class.
+    """
+    settings = get_class(name)
+    if os.name != "posix":
+        return None
+
+    nice = settings["nice"]
+    ioprio = settings["ioprio"]
+    set_ioprio = _ioprio_setter() if ioprio else None
+    cpus = cpu_set_for(name)
+    if not nice and not set_ioprio and not cpus:
+        return None
+
+    def _apply() -> None:
+        try:
+            if nice:
+                # Never raise priority above the server's own niceness.
+                current = os.getpriority(os.PRIO_PROCESS, 0)
+                os.setpriority(os.PRIO_PROCESS, 0, max(current, nice))
+            if set_ioprio:
+                set_ioprio(*ioprio)
+            if cpus:
+                os.sched_setaffinity(0, cpus)
+        except OSError:
+            # Scheduling is best effort; never prevent the tool from starting.
+            pass
+
+    return _apply
+
+
+def describe(name: Optional[str]) -> str:
+    """Return a one-line summary of a class for the job log."""
+    settings = get_class(name)
+    parts = [f"nice {settings['nice']}"]
+    if settings["ioprio"]:
+        io_class, level = settings["ioprio"]
+        parts.append("idle I/O" if io_class == IOPRIO_CLASS_IDLE else f"best-effort I/O level {level}")
+    cpus = cpu_set_for(name)
+    if cpus:
+        parts.append(f"CPUs {','.join(str(cpu) for cpu in sorted(cpus))}")
+    return f"{name or DEFAULT_CLASS} ({', '.join(parts)})"
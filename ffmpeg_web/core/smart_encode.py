@@ -0,0 +1,357 @@
+"""Smart re-encode: replace only the GOPs whose source frames changed.
+
+A job run with ``smart_reencode`` encodes with fixed-length closed GOPs and
+stores a manifest next to the output (``<movie>.manifest.json``) recording
+every source frame's size, mtime and content hash. When the same job runs
+again, frames are diffed against the manifest (size/mtime first, then a
+content hash to ignore files that were merely touched). Only the GOP-aligned
+segments containing changed frames are re-encoded; they are spliced between
+the untouched parts of the previous movie with FFmpeg's concat demuxer in
+stream-copy mode, so turnaround scales with the size of the fix.
+
+Splicing needs output frame N to be source frame ``start + N``, so jobs that
+retime (duration or frame-rate changes), carry audio or write fragmented MP4
+always fall back to a full encode.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .frames import FrameManifest
+from .utils import normalize_fps
+
+MANIFEST_VERSION = 1
+
+# GOP length used for spliceable encodes, in seconds of output.
+SMART_GOP_SECONDS = 1.0
+
+# Above this share of changed frames a full encode is simpler and as fast.
+MAX_CHANGED_RATIO = 0.5
+
+# Fields that change the encoded pixels or bitstream; any difference forces a
+# full encode.
+_SETTINGS_FIELDS = (
+    "input_folder", "filename_pattern", "start_frame", "end_frame",
+    "frame_rate", "source_frame_rate", "desired_duration", "codec",
+    "mp4_bitrate", "prores_profile", "prores_qscale", "profile", "lut_path",
+)
+
+
+class SmartPlan(BaseModel):
+    """What a smart re-encode has to do."""
+
+    output_path: str
+    gop: int
+    total_frames: int
+    # (first_output_frame, end_output_frame_exclusive, changed) runs.
+    runs: List[Tuple[int, int, bool]]
+    changed_frames: List[int]
+    manifest: Dict[str, Any]
+
+    @property
+    def source_frames_to_encode(self) -> List[int]:
+        """Source frame numbers covered by the re-encoded segments."""
+        start = self.manifest["start_frame"]
+        frames: List[int] = []
+        for first, end, changed in self.runs:
+            if changed:
+                frames.extend(range(start + first, start + end))
+        return frames
+
+
+def manifest_path(output_path: str) -> str:
+    """Return the manifest location for a movie."""
+    return f"{output_path}.manifest.json"
+
+
+def gop_for(job_config: Any) -> int:
+    """Return the fixed GOP length used for spliceable encodes of a job."""
+    out_fps = normalize_fps(job_config.frame_rate)[0]
+    return max(int(round(out_fps * SMART_GOP_SECONDS)), 1)
+
+
+def ineligible_reason(job_config: Any) -> Optional[str]:
+    """Return why a job cannot be spliced, or None if it can."""
+    if job_config.audio_option != "No Audio":
+        return "audio tracks are not spliced"
+    if job_config.fragmented_mp4:
+        return "fragmented MP4 output is not spliced"
+
+    src_fps = normalize_fps(job_config.source_frame_rate)[0]
+    out_fps = normalize_fps(job_config.frame_rate)[0]
+    if src_fps <= 0 or abs(src_fps - out_fps) > 1e-6:
+        return "source and output frame rates differ"
+
+    input_frames = job_config.end_frame - job_config.start_frame + 1
+    try:
+        output_frames = int(round(out_fps * float(job_config.desired_duration)))
+    except ValueError:
+        return "invalid duration"
+    if output_frames != input_frames:
+        return "the job retimes the sequence"
+    return None
+
+
+def settings_key(job_config: Any) -> str:
+    """Hash the encode-relevant settings of a job."""
+    data = {name: getattr(job_config, name, None) for name in _SETTINGS_FIELDS}
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def frame_path(folder: str, pattern: str, frame: int) -> str:
+    """Return the path of one frame of a printf-style sequence pattern."""
+    return os.path.join(folder, pattern % frame)
+
+
+def file_hash(path: str) -> str:
+    """Return a content hash of a frame file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat_frames(job_config: Any) -> Dict[int, Tuple[int, int]]:
+    """Return ``{frame: (size, mtime_ns)}`` for the frames that exist."""
+    manifest = FrameManifest.scan(job_config.input_folder, job_config.filename_pattern, with_stat=True)
+    info: Dict[int, Tuple[int, int]] = {}
+    for frame in manifest:
+        if job_config.start_frame <= frame <= job_config.end_frame:
+            info[frame] = manifest.stat(frame)
+    return info
+
+
+def _hash_frames(job_config: Any, frames: List[int]) -> Dict[int, str]:
+    """Hash the given frames in parallel."""
+    paths = [frame_path(job_config.input_folder, job_config.filename_pattern, f) for f in frames]
+    with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 4, 8)) as executor:
+        return dict(zip(frames, executor.map(file_hash, paths)))
+
+
+def load_manifest(output_path: str) -> Optional[Dict[str, Any]]:
+    """Load the manifest stored with a previous output, if any."""
+    try:
+        with open(manifest_path(output_path), "r") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(
+    job_config: Any,
+    output_path: str,
+    gop: int,
+    previous: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Record the source frames an output was encoded from.
+
+    Hashes of frames whose size and mtime match ``previous`` are reused so
+    only new or changed frames are read.
+    """
+    stats = _stat_frames(job_config)
+    old_frames = (previous or {}).get("frames", {})
+    hashes: Dict[int, str] = {}
+    to_hash = []
+    for frame, (size, mtime_ns) in stats.items():
+        old = old_frames.get(str(frame))
+        if old and old[0] == size and old[1] == mtime_ns:
+            hashes[frame] = old[2]
+        else:
+            to_hash.append(frame)
+    hashes.update(_hash_frames(job_config, to_hash))
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "settings_key": settings_key(job_config),
+        "gop": gop,
+        "start_frame": job_config.start_frame,
+        "end_frame": job_config.end_frame,
+        "frames": {
+            str(frame): [size, mtime_ns, hashes[frame]]
+            for frame, (size, mtime_ns) in sorted(stats.items())
+        },
+    }
+    tmp_path = manifest_path(output_path) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path(output_path))
+
+
+def plan_update(job_config: Any, output_path: str) -> Tuple[Optional[SmartPlan], str]:
+    """Diff a job's frames against the previous output's manifest.
+
+    Returns:
+        ``(plan, note)``. ``plan`` is None when a full encode is needed, with
+        ``note`` explaining why; otherwise ``plan.runs`` lists which output
+        frame ranges to re-encode and which to copy.
+    """
+    manifest = load_manifest(output_path)
+    if manifest is None or not os.path.isfile(output_path):
+        return None, "no previous output with a manifest"
+    if manifest.get("settings_key") != settings_key(job_config):
+        return None, "encode settings changed since the previous output"
+
+    gop = int(manifest["gop"])
+    start = job_config.start_frame
+    total = job_config.end_frame - start + 1
+    old_frames = manifest.get("frames", {})
+
+    stats = _stat_frames(job_config)
+    changed: List[int] = []
+    suspects: List[int] = []
+    for frame in range(start, job_config.end_frame + 1):
+        old = old_frames.get(str(frame))
+        cur = stats.get(frame)
+        if old is None and cur is None:
+            # Still a hole; it is held from the previous frame either way.
+            continue
+        if old is None or cur is None:
+            changed.append(frame)
+        elif cur[0] != old[0] or cur[1] != old[1]:
+            suspects.append(frame)
+
+    # Size/mtime differences are confirmed by content, so a re-render that
+    # produced identical pixels (or a plain touch) costs nothing.
+    for frame, digest in _hash_frames(job_config, suspects).items():
+        if digest != old_frames[str(frame)][2]:
+            changed.append(frame)
+    changed.sort()
+
+    if len(changed) > total * MAX_CHANGED_RATIO:
+        return None, f"{len(changed)} of {total} frames changed"
+
+    changed_gops = {(frame - start) // gop for frame in changed}
+    runs: List[Tuple[int, int, bool]] = []
+    for index in range((total + gop - 1) // gop):
+        first, end = index * gop, min((index + 1) * gop, total)
+        is_changed = index in changed_gops
+        if runs and runs[-1][2] == is_changed:
+            runs[-1] = (runs[-1][0], end, is_changed)
+        else:
+            runs.append((first, end, is_changed))
+
+    plan = SmartPlan(
+        output_path=output_path,
+        gop=gop,
+        total_frames=total,
+        runs=runs,
+        changed_frames=changed,
+        manifest=manifest,
+    )
+    return plan, f"{len(changed)} changed frames in {len(changed_gops)} GOPs of {gop} frames"
+
+
+def concat_line(path: str) -> str:
+    """Quote a path for an FFmpeg concat list."""
+    return "file '" + path.replace("'", "'\\''") + "'"
+
+
+def concat_copy(
+    handler: Any,
+    job_config: Any,
+    lines: List[str],
+    output_path: str,
+    total_frames: int,
+    work_dir: str,
+) -> bool:
+    """Join concat-demuxer entries into ``output_path`` with stream copy.
+
+    Args:
+        handler: ``FFmpegHandler`` used to run FFmpeg.
+        job_config: Job settings (frame rate and scheduling class).
+        lines: Concat list entries, see ``concat_line``.
+        output_path: Movie to write.
+        total_frames: Output frames, for progress.
+        work_dir: Directory for the concat list.
+
+    Returns:
+        True if FFmpeg succeeded.
+    """
+    out_fps, _, out_num, _ = normalize_fps(job_config.frame_rate)
+    track_timescale = str(out_num) if out_num is not None else str(int(round(out_fps * 1000)))
+    list_path = os.path.join(work_dir, "concat.txt")
+    with open(list_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+    cmd = [
+        "ffmpeg", "-y",
+        "-f", "concat", "-safe", "0",
+        "-i", list_path,
+        "-map", "0:v",
+        "-c", "copy",
+        "-video_track_timescale", track_timescale,
+        output_path,
+    ]
+    return handler.run_command(cmd, total_frames, scheduling_class=job_config.scheduling_class)
+
+
+def splice(
+    handler: Any,
+    job_config: Any,
+    plan: SmartPlan,
+    log_callback: Callable[[str, str], None],
+) -> bool:
+    """Re-encode the changed runs and splice them into the previous output.
+
+    Args:
+        handler: ``FFmpegHandler`` used to run the encodes.
+        job_config: Job settings, pointing at the frames to encode (the
+            pre-pass output for EXR jobs).
+        plan: Result of ``plan_update``.
+        log_callback: Job log callback.
+
+    Returns:
+        True if the output was replaced successfully.
+    """
+    out_fps = normalize_fps(job_config.frame_rate)[0]
+    output_dir = os.path.dirname(plan.output_path) or "."
+    work_dir = tempfile.mkdtemp(prefix=".ffmpeg_web_smart_", dir=output_dir)
+    spliced_path = os.path.join(work_dir, "spliced" + os.path.splitext(plan.output_path)[1])
+
+    try:
+        lines = []
+        for first, end, changed in plan.runs:
+            if not changed:
+                # The concat demuxer works in microseconds: round the in point
+                # up and the out point down so neither lands in a neighbouring
+                # GOP (stream copy starts at the keyframe before ``inpoint``).
+                lines.append(concat_line(plan.output_path))
+                lines.append(f"inpoint {math.ceil(first * 1e6 / out_fps) / 1e6:.6f}")
+                lines.append(f"outpoint {math.floor(end * 1e6 / out_fps) / 1e6:.6f}")
+                continue
+
+            segment_path = os.path.join(work_dir, f"segment_{first:08d}{os.path.splitext(plan.output_path)[1]}")
+            segment_config = job_config.model_copy(update={
+                "start_frame": job_config.start_frame + first,
+                "end_frame": job_config.start_frame + end - 1,
+                "desired_duration": repr((end - first) / out_fps),
+            })
+            log_callback("output", f"Re-encoding output frames {first}-{end - 1}...\n")
+            if not handler.run_ffmpeg(
+                segment_config, output_path=segment_path, gop=plan.gop, announce=False
+            ):
+                return False
+            lines.append(concat_line(segment_path))
+
+        log_callback("output", "Splicing segments into the previous output (stream copy)...\n")
+        if not concat_copy(handler, job_config, lines, spliced_path, plan.total_frames, work_dir):
+            return False
+
+        os.replace(spliced_path, plan.output_path)
+        return True
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,138 @@
+"""Slots for the stages of running jobs, so one job's pre-pass overlaps another's encode.
+
+The EXR pre-pass is bound by disk reads and EXR decoding, the encode by the
+video encoder. Running whole jobs one after the other leaves one of the two
+idle; running them freely lets two pre-passes fight over the same disks.
+Each stage instead takes a slot from its own pool for as long as it runs:
+with one ``prepass`` and one ``encode`` slot, job B converts its EXRs while
+job A encodes, and never while another pre-pass is reading.
+
+Pool sizes come from the ``stage_slots`` setting and are read whenever a
+slot frees up. Waiting stages get slots in scheduling-class order
+(interactive before batch before background), then in the order they asked.
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .. import config
+from .scheduling import DEFAULT_CLASS, SCHEDULING_CLASSES
+
+PREPASS = "prepass"
+ENCODE = "encode"
+
+DEFAULT_SLOTS = {PREPASS: 1, ENCODE: 1}
+
+# How often a waiting stage checks whether its job was cancelled.
+POLL_SECONDS = 0.5
+
+
+class StageSlots:
+    """Hand out a limited number of slots per stage to concurrently running jobs."""
+
+    def __init__(self, slots: Optional[Dict[str, int]] = None):
+        self._slots = slots
+        self._cond = threading.Condition()
+        self._ids = itertools.count(1)
+        self._active: Dict[str, int] = {}
+        # Per stage: (class rank, ticket) of every waiting stage.
+        self._waiting: Dict[str, List[Tuple[int, int]]] = {}
+
+    def capacity(self, stage: str) -> int:
+        """Number of slots the ``stage`` pool holds (at least one)."""
+        slots = self._slots
+        if slots is None:
+            configured = config.load_settings().get("stage_slots")
+            slots = configured if isinstance(configured, dict) else {}
+        try:
+            return max(1, int(slots.get(stage, DEFAULT_SLOTS.get(stage, 1))))
+        except (TypeError, ValueError):
+            return 1
+
+    def acquire(
+        self,
+        stage: str,
+        scheduling_class: Optional[str] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+    ) -> bool:
+        """Block until a ``stage`` slot is free and take it.
+
+        Returns:
+            True once the slot is held, False if ``is_cancelled`` became true
+            while waiting (no slot is held then).
+        """
+        ranks = {name: rank for rank, name in enumerate(SCHEDULING_CLASSES)}
+        rank = ranks.get(scheduling_class or DEFAULT_CLASS, len(ranks))
+        entry = (rank, next(self._ids))
+        with self._cond:
+            waiting = self._waiting.setdefault(stage, [])
+            waiting.append(entry)
+            try:
+                while not (
+                    min(waiting) == entry and self._active.get(stage, 0) < self.capacity(stage)
+                ):
+                    if is_cancelled is not None and is_cancelled():
+                        return False
+                    self._cond.wait(POLL_SECONDS)
+                self._active[stage] = self._active.get(stage, 0) + 1
+                return True
+            finally:
+                waiting.remove(entry)
+                # The next waiter may be able to go now.
+                self._cond.notify_all()
+
+    def release(self, stage: str) -> None:
+        """Return a slot taken with ``acquire``."""
+        with self._cond:
+            self._active[stage] = max(0, self._active.get(stage, 0) - 1)
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Return running and waiting stages per pool, for status reporting."""
+        with self._cond:
+            return {
+                stage: {
+                    "running": self._active.get(stage, 0),
+                    "waiting": len(self._waiting.get(stage, [])),
+                    "slots": self.capacity(stage),
+                }
+                for stage in sorted(set(DEFAULT_SLOTS) | set(self._active) | set(self._waiting))
+            }
+
+    @contextmanager
+    def slot(
+        self,
+        stage: str,
+        log_callback: Callable[[str, str], None],
+        scheduling_class: Optional[str] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+    ) -> Iterator[bool]:
+        """Hold a ``stage`` slot for the duration of a ``with`` block.
+
+        Reports the stage to the job log as ``stage`` messages: ``waiting:<stage>``
+        while all slots are taken, then ``<stage>``. Yields False, without a
+        slot, if the job was cancelled while waiting.
+        """
+        with self._cond:
+            busy = self._active.get(stage, 0) >= self.capacity(stage) or bool(
+                self._waiting.get(stage)
+            )
+        if busy:
+            log_callback("stage", f"waiting:{stage}")
+            log_callback("output", f"Waiting for a free {stage} slot...\n")
+        if not self.acquire(stage, scheduling_class, is_cancelled):
+            yield False
+            return
+        log_callback("stage", stage)
+        try:
+            yield True
+        finally:
+            self.release(stage)
+
+
+# Process-wide pools used by the pipelines.
+SLOTS = StageSlots()
@@ -0,0 +1,266 @@
+"""SQLite store of web server jobs and their logs, so work survives a restart.
+
+Every job the ``JobManager`` accepts is written to ``config.JOBS_DB_FILE``
+with its settings, batch, state, stage, progress, outputs, temp directories
+and the PID of its running FFmpeg process, and every log line it emits (except
+progress and ETA updates, which only update the job row). The database runs
+in WAL mode, so the job threads can write while the API reads.
+
+After a reload or crash the server reads back the jobs that were queued or
+running (``unfinished``) and reconciles them: see ``JobManager.recover``.
+Workers of a multi-worker server that do not run jobs themselves answer job
+queries from the store, and leave their submissions and cancellations in it
+for the scheduler (see ``bus``).
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .. import config
+from .jobs import FINISHED, HISTORY_LIMIT, RUNNING, Job
+
+# Log messages that only update the job row.
+_UNLOGGED = {"progress", "eta"}
+
+# Log messages that change the job row (see ``Job.observe``).
+_ROW_MESSAGES = {"stage", "output_file", "temp_dir", "pid", "error"}
+
+# Progress is written to the job row at most this often.
+PROGRESS_SAVE_SECONDS = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    label TEXT NOT NULL,
+    config TEXT NOT NULL,
+    state TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    outputs TEXT NOT NULL DEFAULT '[]',
+    temp_dirs TEXT NOT NULL DEFAULT '[]',
+    pid INTEGER,
+    batch TEXT
+);
+CREATE TABLE IF NOT EXISTS logs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    time REAL NOT NULL,
+    type TEXT NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS logs_job ON logs (job_id, seq);
+CREATE TABLE IF NOT EXISTS cancels (
+    job_id TEXT PRIMARY KEY
+);
+"""
+
+# Columns added since the first schema, for databases created before them.
+_ADDED_COLUMNS = {"batch": "TEXT"}
+
+
+class JobStore:
+    """Persist jobs and their logs in one SQLite database.
+
+    Args:
+        path: Database file; ``config.JOBS_DB_FILE`` by default.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or config.JOBS_DB_FILE
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # When each running job's row was last written.
+        self._saved: Dict[str, float] = {}
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # WAL stays consistent without a sync per commit; a power cut
+            # may lose the last log lines, never the database.
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in _ADDED_COLUMNS.items():
+                if name not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+            self._conn.commit()
+
+    def save(self, job: Job) -> None:
+        """Insert or update a job's row."""
+        self.save_all([job])
+
+    def save_all(self, jobs: List[Job]) -> None:
+        """Insert or update the rows of several jobs in one transaction."""
+        rows = [
+            (
+                job.id,
+                job.kind,
+                job.label,
+                json.dumps(job.config),
+                job.state,
+                job.stage,
+                job.progress,
+                job.error,
+                job.created,
+                job.started,
+                job.finished,
+                json.dumps(job.outputs),
+                json.dumps(job.temp_dirs),
+                job.pid,
+                job.batch,
+            )
+            for job in jobs
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO jobs (id, kind, label, config, state, stage, progress, "
+                "error, created, started, finished, outputs, temp_dirs, pid, batch) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        now = time.monotonic()
+        for job in jobs:
+            if job.state in FINISHED:
+                self._saved.pop(job.id, None)
+            else:
+                self._saved[job.id] = now
+
+    def record(self, job: Job, msg_type: str, content: str) -> None:
+        """Persist one log message of a job and whatever it changed in the job row."""
+        self.append_log(job.id, msg_type, content)
+        if msg_type in _ROW_MESSAGES or (
+            msg_type == "progress"
+            and time.monotonic() - self._saved.get(job.id, 0.0) >= PROGRESS_SAVE_SECONDS
+        ):
+            self.save(job)
+
+    def append_log(self, job_id: str, msg_type: str, content: str) -> None:
+        """Record one log message of a job; progress and ETA updates are skipped."""
+        if msg_type in _UNLOGGED:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO logs (job_id, time, type, content) VALUES (?, ?, ?, ?)",
+                (job_id, time.time(), msg_type, str(content)),
+            )
+            self._conn.commit()
+
+    def logs(self, job_id: str, offset: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Return ``limit`` of a job's log messages, skipping the first ``offset``, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT time, type, content FROM logs WHERE job_id = ? "
+                "ORDER BY seq LIMIT ? OFFSET ?",
+                (job_id, limit, offset),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        jobs = self._load("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def list_jobs(self, limit: int = HISTORY_LIMIT) -> List[Job]:
+        """Return running, then queued (with positions), then finished jobs (newest first)."""
+        unfinished = self.unfinished()
+        running = [job for job in unfinished if job.state == RUNNING]
+        queued = [job for job in unfinished if job.state != RUNNING]
+        for position, job in enumerate(queued, start=1):
+            job.position = position
+        finished = list(reversed(self.history(limit)))
+        return running + queued + finished
+
+    def batch_jobs(self, batch_id: str) -> List[Job]:
+        """Return the jobs of a batch in submission order, queued ones with their positions."""
+        batch_jobs = self._load("SELECT * FROM jobs WHERE batch = ? ORDER BY created", (batch_id,))
+        queued = [job for job in self.unfinished() if job.state != RUNNING]
+        positions = {job.id: position for position, job in enumerate(queued, start=1)}
+        for job in batch_jobs:
+            job.position = positions.get(job.id)
+        return batch_jobs
+
+    def request_cancel(self, job_ids: List[str]) -> None:
+        """Ask the worker that runs the jobs to cancel them (see ``take_cancels``)."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO cancels (job_id) VALUES (?)", [(job_id,) for job_id in job_ids]
+            )
+            self._conn.commit()
+
+    def take_cancels(self) -> List[str]:
+        """Return and forget the ids of the jobs other workers asked to cancel."""
+        with self._lock:
+            # Held from the read to the delete, so no other worker's request is lost.
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute("SELECT job_id FROM cancels").fetchall()
+            self._conn.execute("DELETE FROM cancels")
+            self._conn.commit()
+        return [row["job_id"] for row in rows]
+
+    def outputs(self) -> List[str]:
+        """Return the movies written by the jobs in the store."""
+        with self._lock:
+            rows = self._conn.execute("SELECT outputs FROM jobs").fetchall()
+        return [path for row in rows for path in json.loads(row["outputs"])]
+
+    def unfinished(self) -> List[Job]:
+        """Return jobs that were queued or running, oldest first."""
+        return self._load(
+            f"SELECT * FROM jobs WHERE state NOT IN ({', '.join('?' * len(FINISHED))}) "
+            "ORDER BY created",
+            FINISHED,
+        )
+
+    def history(self, limit: int = HISTORY_LIMIT) -> List[Job]:
+        """Return the most recently finished jobs, oldest first."""
+        jobs = self._load(
+            f"SELECT * FROM jobs WHERE state IN ({', '.join('?' * len(FINISHED))}) "
+            "ORDER BY finished DESC LIMIT ?",
+            (*FINISHED, limit),
+        )
+        return list(reversed(jobs))
+
+    def prune(self, keep: int = HISTORY_LIMIT) -> None:
+        """Delete finished jobs (and their logs) beyond the newest ``keep``."""
+        with self._lock:
+            self._conn.execute(
+                f"DELETE FROM jobs WHERE state IN ({', '.join('?' * len(FINISHED))}) AND id NOT IN "
+                "(SELECT id FROM jobs WHERE finished IS NOT NULL ORDER BY finished DESC LIMIT ?)",
+                (*FINISHED, keep),
+            )
+            self._conn.execute("DELETE FROM logs WHERE job_id NOT IN (SELECT id FROM jobs)")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _load(self, query: str, params: Any) -> List[Job]:
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [_job_from_row(row) for row in rows]
+
+
+def _job_from_row(row: sqlite3.Row) -> Job:
+    job = Job(row["kind"], row["label"], json.loads(row["config"]), row["batch"])
+    job.id = row["id"]
+    job.state = row["state"]
+    job.stage = row["stage"]
+    job.progress = row["progress"]
+    job.error = row["error"]
+    job.created = row["created"]
+    job.started = row["started"]
+    job.finished = row["finished"]
+    job.outputs = json.loads(row["outputs"])
+    job.temp_dirs = json.loads(row["temp_dirs"])
+    job.pid = row["pid"]
+    return job
@@ -0,0 +1,364 @@
+"""Throughput history, duration estimates and live ETA for conversion jobs.
+
+Every finished job records how fast its stages ran (frames per second),
+keyed by codec, resolution, encoder preset, pre-pass mode and host. A one-off
+calibration run seeds the history by encoding a synthetic clip with every
+codec offered by the UI, so estimates are available before the first real job
+has completed on a machine.
+
+Run a calibration from a shell with::
+
+    python -m ffmpeg_web.core.throughput
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .. import config
+from .profiles import encoder_preset
+
+# Codecs offered by ``update_codec`` in the Tk UI and the web codec dropdown.
+CALIBRATION_CODECS = ["h264", "h265", "prores_422", "prores_422_lt", "prores_444", "qtrle"]
+
+# ProRes profile numbers matching the UI codec names.
+PRORES_PROFILES = {"prores_422": "2", "prores_422_lt": "1", "prores_444": "4"}
+
+# Keep the history file bounded; older samples are the least representative.
+MAX_HISTORY_RECORDS = 1000
+
+_history_lock = threading.Lock()
+
+
+def current_host() -> str:
+    """Return the short host name used to key throughput samples."""
+    return socket.gethostname().split(".")[0]
+
+
+def probe_resolution(path: str) -> Tuple[Optional[int], Optional[int]]:
+    """Return ``(width, height)`` of an image or movie using ``ffprobe``.
+
+    Returns ``(None, None)`` if ``ffprobe`` is missing or cannot read the file.
+    """
+    if not shutil.which("ffprobe") or not os.path.exists(path):
+        return None, None
+    try:
+        out = subprocess.run(  # noqa: S603,S607
+            [
+                "ffprobe", "-v", "error",
+                "-select_streams", "v:0",
+                "-show_entries", "stream=width,height",
+                "-of", "csv=p=0",
+                path,
+            ],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            check=False,
+        ).stdout.strip()
+        width, height = out.splitlines()[0].split(",")[:2]
+        return int(width), int(height)
+    except Exception:  # noqa: BLE001
+        return None, None
+
+
+def load_history() -> List[Dict[str, Any]]:
+    """Load all recorded throughput samples."""
+    try:
+        with open(config.THROUGHPUT_FILE, "r") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else []
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+
+def record_sample(
+    stage: str,
+    frames: int,
+    seconds: float,
+    codec: str = "",
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    preset: str = "",
+    prepass: str = "none",
+    source: str = "job",
+) -> Optional[Dict[str, Any]]:
+    """Append one throughput sample to the history file.
+
+    Args:
+        stage: ``"encode"`` for FFmpeg or ``"prepass"`` for EXR conversion.
+        frames: Number of frames the stage processed.
+        seconds: Wall-clock time the stage took.
+        codec: UI codec name (``h264``, ``prores_422``...), empty for pre-pass.
+        width: Frame width in pixels, if known.
+        height: Frame height in pixels, if known.
+        preset: Encoder preset, if the codec has one.
+        prepass: Pre-pass mode that fed the encode (``none``, ``oiiotool``).
+        source: ``"job"`` or ``"calibration"``.
+
+    Returns:
+        The stored record, or None if the sample was unusable.
+    """
+    if frames <= 0 or seconds <= 0:
+        return None
+
+    record = {
+        "stage": stage,
+        "codec": codec,
+        "width": width,
+        "height": height,
+        "preset": preset,
+        "prepass": prepass,
+        "host": current_host(),
+        "frames": int(frames),
+        "seconds": round(float(seconds), 3),
+        "fps": round(frames / seconds, 4),
+        "source": source,
+        "timestamp": time.time(),
+    }
+
+    with _history_lock:
+        history = load_history()
+        history.append(record)
+        history = history[-MAX_HISTORY_RECORDS:]
+        try:
+            with open(config.THROUGHPUT_FILE, "w") as f:
+                json.dump(history, f, indent=1)
+        except Exception as e:  # noqa: BLE001
+            print(f"Error saving throughput history: {e}")
+    return record
+
+
+def _predict_fps(
+    history: List[Dict[str, Any]],
+    stage: str,
+    keys: List[Tuple[str, Any]],
+    pixels: Optional[int],
+) -> Tuple[Optional[float], str, int]:
+    """Predict frames per second for a stage from the best matching samples.
+
+    ``keys`` are ordered from least to most important; the most specific match
+    wins and keys are dropped from the front until some samples remain; the
+    last key is always required. Rates are normalised to pixels per second so
+    that samples from other resolutions still contribute.
+
+    Returns:
+        ``(fps, basis, sample_count)`` with ``fps`` None if nothing matched.
+    """
+    candidates = [r for r in history if r.get("stage") == stage]
+    for depth in range(len(keys)):
+        wanted = keys[depth:]
+        matched = [r for r in candidates if all(r.get(k) == v for k, v in wanted)]
+        if not matched:
+            continue
+
+        basis = "history" if any(r.get("source") == "job" for r in matched) else "calibration"
+        sized = [r for r in matched if r.get("width") and r.get("height")]
+        if pixels and sized:
+            pps = statistics.median(r["fps"] * r["width"] * r["height"] for r in sized)
+            return pps / pixels, basis, len(sized)
+        return statistics.median(r["fps"] for r in matched), basis, len(matched)
+    return None, "none", 0
+
+
+def estimate_job(
+    codec: str,
+    input_frames: int,
+    output_frames: int,
+    prepass: str = "none",
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    preset: Optional[str] = None,
+    history: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Estimate how long a job will take before it is submitted.
+
+    Returns:
+        A dictionary with ``seconds`` (None if there is no usable history),
+        per-stage breakdown, predicted rates, and the ``basis`` of the
+        estimate (``history``, ``calibration`` or ``none``).
+    """
+    history = load_history() if history is None else history
+    host = current_host()
+    pixels = width * height if width and height else None
+    preset = encoder_preset(codec) if preset is None else preset
+
+    encode_fps, basis, samples = _predict_fps(
+        history,
+        "encode",
+        [("prepass", prepass), ("host", host), ("preset", preset), ("codec", codec)],
+        pixels,
+    )
+
+    prepass_fps = None
+    prepass_seconds = 0.0
+    if prepass != "none":
+        prepass_fps, _, _ = _predict_fps(
+            history, "prepass", [("host", host), ("prepass", prepass)], pixels
+        )
+        if prepass_fps:
+            prepass_seconds = input_frames / prepass_fps
+
+    encode_seconds = output_frames / encode_fps if encode_fps else None
+    total = None
+    if encode_seconds is not None and (prepass == "none" or prepass_fps):
+        total = round(encode_seconds + prepass_seconds, 1)
+
+    return {
+        "seconds": total,
+        "encode_seconds": round(encode_seconds, 1) if encode_seconds is not None else None,
+        "prepass_seconds": round(prepass_seconds, 1) if prepass_fps else None,
+        "encode_fps": round(encode_fps, 2) if encode_fps else None,
+        "prepass_fps": round(prepass_fps, 2) if prepass_fps else None,
+        "basis": basis,
+        "samples": samples,
+        "host": host,
+        "width": width,
+        "height": height,
+    }
+
+
+class EtaTracker:
+    """Turn ``done/total`` progress updates into a smoothed remaining time.
+
+    Until enough progress has been observed the tracker falls back to the
+    rate predicted from history, if one was supplied.
+    """
+
+    def __init__(self, total: int, predicted_fps: Optional[float] = None, smoothing: float = 0.2):
+        self.total = max(int(total), 0)
+        self.predicted_fps = predicted_fps
+        self.smoothing = smoothing
+        self.started = time.monotonic()
+        self._last_time = self.started
+        self._last_done = 0
+        self._rate: Optional[float] = None
+
+    def update(self, done: int) -> Optional[float]:
+        """Record progress and return the estimated seconds remaining."""
+        now = time.monotonic()
+        delta_t = now - self._last_time
+        delta_n = done - self._last_done
+        if delta_t > 0 and delta_n > 0:
+            rate = delta_n / delta_t
+            if self._rate is None:
+                self._rate = rate
+            else:
+                self._rate = self.smoothing * rate + (1 - self.smoothing) * self._rate
+            self._last_time = now
+            self._last_done = done
+
+        remaining = max(self.total - done, 0)
+        rate = self._rate
+        # Very early samples are noisy (encoder start-up); prefer the prediction.
+        if (rate is None or done < 10) and self.predicted_fps:
+            rate = self.predicted_fps
+        if not rate:
+            return None
+        return remaining / rate
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the tracker was created."""
+        return time.monotonic() - self.started
+
+
+def calibrate(
+    log_callback: Callable[[str, str], None],
+    codecs: Optional[List[str]] = None,
+    frames: int = 96,
+    width: int = 1920,
+    height: int = 1080,
+) -> List[Dict[str, Any]]:
+    """Encode a synthetic clip with each codec and record the throughput.
+
+    The clip is generated by FFmpeg's ``testsrc2`` source and encoded to the
+    ``null`` muxer, so nothing is written to disk.
+
+    Returns:
+        The recorded samples, one per codec that encoded successfully.
+    """
+    # Imported here to avoid a circular import with the handler module.
+    from .ffmpeg_handler import FFmpegHandler, FFmpegJobConfig  # pylint: disable=import-outside-toplevel
+
+    handler = FFmpegHandler(log_callback)
+    results = []
+    for codec in codecs or CALIBRATION_CODECS:
+        job = FFmpegJobConfig(
+            input_folder="",
+            filename_pattern="",
+            output_folder="",
+            output_filename="",
+            frame_rate="24",
+            source_frame_rate="24",
+            desired_duration=str(frames / 24),
+            codec=codec,
+            mp4_bitrate=str(config.DEFAULT_SETTINGS["mp4_bitrate"]),
+            prores_profile=PRORES_PROFILES.get(codec, config.DEFAULT_SETTINGS["prores_profile"]),
+            prores_qscale=str(config.DEFAULT_SETTINGS["prores_qscale"]),
+            start_frame=1,
+            end_frame=frames,
+        )
+        try:
+            pix_fmt, codec_params = handler.video_codec_params(job)
+        except ValueError as e:
+            log_callback("error", f"Calibration skipped {codec}: {e}")
+            continue
+
+        cmd = [
+            "ffmpeg", "-hide_banner", "-y",
+            "-f", "lavfi",
+            "-i", f"testsrc2=size={width}x{height}:rate=24",
+            "-frames:v", str(frames),
+            "-pix_fmt", pix_fmt,
+            *codec_params,
+            "-f", "null", "-",
+        ]
+        log_callback("output", f"Calibrating {codec}: {' '.join(cmd)}\n")
+        started = time.monotonic()
+        try:
+            proc = subprocess.run(cmd, capture_output=True, text=True, check=False)  # noqa: S603
+        except OSError as e:
+            log_callback("error", f"Calibration could not start FFmpeg: {e}")
+            break
+        seconds = time.monotonic() - started
+        if proc.returncode != 0:
+            log_callback("error", f"Calibration of {codec} failed:\n{proc.stderr[-2000:]}")
+            continue
+
+        record = record_sample(
+            "encode",
+            frames,
+            seconds,
+            codec=codec,
+            width=width,
+            height=height,
+            preset=encoder_preset(codec),
+            source="calibration",
+        )
+        if record:
+            results.append(record)
+            log_callback("output", f"  {codec}: {record['fps']:.1f} fps\n")
+    return results
+
+
+def main() -> None:
+    """Run a calibration from the command line and print the results."""
+
+    def _print(msg_type: str, content: str) -> None:
+        print(content, end="" if content.endswith("\n") else "\n")
+
+    results = calibrate(_print)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
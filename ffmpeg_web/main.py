@@ -2,18 +2,41 @@ import os
 import asyncio
 import json
 import logging
+import shutil
+import signal
+import sqlite3
 import threading
-from typing import Any, Dict, List, Optional
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
 
-from fastapi import Body, FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import Body, FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import ValidationError
 
 from . import config
 from .core import explorer
 from .core.deps import check_dependencies
-from .core.ffmpeg_handler import FFmpegHandler, FFmpegJobConfig
-from .core.exr_handler import ExrHandler
+from .core.ffmpeg_handler import FFmpegJobConfig
+from .core.conform import ConformJobConfig, ConformShot
+from .core import (
+    batch,
+    bus,
+    capabilities,
+    conform,
+    fs_pool,
+    job_process,
+    joblog,
+    jobs,
+    media_stream,
+    pipeline,
+    planner,
+    preflight,
+    prewarm,
+    store,
+)
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO)
@@ -47,36 +70,205 @@ async def startup_event() -> None:
         logger.warning("Dependency issues detected: %s", DEPENDENCY_STATUS.get("issues"))
     else:
         logger.info("All FFmpeg Web UI dependencies look healthy.")
+    job_manager.start(asyncio.get_running_loop())
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    """FastAPI shutdown hook that leaves the workers' event bus."""
+    job_manager.stop()
 
 
 # --- Connection Manager for WebSockets ---
+# Messages waiting for one client before its log lines are dropped.
+CLIENT_QUEUE_LIMIT = 1000
+# A client whose queue grows past this even without log lines is closed.
+CLIENT_CLOSE_LIMIT = 2 * CLIENT_QUEUE_LIMIT
+# A send that takes longer than this closes the client.
+CLIENT_SEND_TIMEOUT = 10.0
+# Only the latest of these is kept per job while a client is behind.
+COALESCED_TYPES = {"progress", "eta", "prewarm", "summary"}
+# Dropped, and counted, when a client is behind.
+DROPPABLE_TYPES = {"output"}
+# How often clients of the summary channel get the progress of all jobs.
+SUMMARY_SECONDS = 1.0
+
+
+class _Client:
+    """One WebSocket client: a bounded outbound queue drained by its own sender task."""
+
+    def __init__(self, websocket: WebSocket) -> None:
+        self.websocket = websocket
+        # Messages, or the (type, job) key of a coalesced message in ``latest``.
+        self.queue: Deque[Any] = deque()
+        self.latest: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        # Log lines dropped per job since the client last caught up.
+        self.dropped: Dict[Optional[str], int] = {}
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.task: Optional["asyncio.Task[None]"] = None
+        # Jobs whose messages the client wants; None for every job.
+        self.jobs: Optional[Set[str]] = None
+        # Whether the client wants the once-a-second summary of all jobs.
+        self.summary = False
+
+    def wants(self, message: Dict[str, Any]) -> bool:
+        """True if the client subscribed to the job of ``message`` (or it has none)."""
+        job_id = message.get("job")
+        return not job_id or self.jobs is None or job_id in self.jobs
+
+    def put(self, message: Dict[str, Any]) -> bool:
+        """Queue a message; False if the client is hopelessly behind."""
+        msg_type = message.get("type")
+        if msg_type in COALESCED_TYPES:
+            key = (msg_type, message.get("job"))
+            if key not in self.latest:
+                self.queue.append(key)
+            self.latest[key] = message
+        elif msg_type in DROPPABLE_TYPES and len(self.queue) >= CLIENT_QUEUE_LIMIT:
+            job_id = message.get("job")
+            self.dropped[job_id] = self.dropped.get(job_id, 0) + message.get("lines", 1)
+            return True
+        else:
+            self.queue.append(message)
+        self.ready.set()
+        return len(self.queue) < CLIENT_CLOSE_LIMIT
+
+    def _next(self) -> Optional[Dict[str, Any]]:
+        if self.queue:
+            item = self.queue.popleft()
+            return self.latest.pop(item) if isinstance(item, tuple) else item
+        if self.dropped:
+            # Caught up: tell the client what it missed.
+            job_id, count = self.dropped.popitem()
+            notice = {"type": "output", "content": f"[{count} log lines skipped: connection too slow]\n"}
+            if job_id:
+                notice["job"] = job_id
+            return notice
+        return None
+
+    async def send_all(self) -> None:
+        """Send queued messages as they arrive, until the client goes away."""
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            message = self._next()
+            while message is not None:
+                await asyncio.wait_for(self.websocket.send_json(message), CLIENT_SEND_TIMEOUT)
+                message = self._next()
+
+
 class ConnectionManager:
-    """Track active WebSocket clients and broadcast messages to them."""
+    """Track active WebSocket clients and broadcast messages to them.
+
+    Each client has its own bounded queue and sender task, so a slow or
+    half-dead browser tab only delays itself: while it is behind, progress
+    updates are coalesced (latest wins) and log lines are dropped and
+    counted; one that stops reading is disconnected.
+
+    A client gets the messages of every job until it sends a subscription
+    (see ``subscribe``); from then on only those of the jobs it named,
+    and, if it asked for it, a ``summary`` of all jobs once a second.
+    Messages without a job (``job_status``, ``prewarm``) go to everyone.
+    Recent messages of recent jobs are kept in a ``joblog.LogRing`` and
+    replayed, marked ``replay``, to a client that subscribes to their job.
+    """
 
     def __init__(self) -> None:
-        self.active_connections: List[WebSocket] = []
+        self.clients: Dict[WebSocket, _Client] = {}
+        self.ring = joblog.LogRing()
+        # Returns the jobs for the summary channel (set with the job manager).
+        self.summarize: Optional[Callable[[], List[Dict[str, Any]]]] = None
+        self._summary_task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.clients)
 
     async def connect(self, websocket: WebSocket) -> None:
         """Accept and register a new WebSocket connection."""
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = _Client(websocket)
+        client.task = asyncio.create_task(self._run_sender(client))
+        self.clients[websocket] = client
 
     def disconnect(self, websocket: WebSocket) -> None:
-        """Remove a WebSocket connection from the active list."""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        """Remove a WebSocket connection and stop its sender."""
+        client = self.clients.pop(websocket, None)
+        if client is not None and client.task is not None:
+            client.task.cancel()
 
-    async def broadcast(self, message: Dict[str, Any]) -> None:
-        """Send a JSON message to all connected WebSocket clients."""
-        for connection in list(self.active_connections):
+    def broadcast(self, message: Dict[str, Any]) -> None:
+        """Queue a JSON message for every client that wants it; call on the event loop."""
+        self.ring.add(message)
+        for client in list(self.clients.values()):
+            if client.wants(message) and not client.put(message):
+                self._close(client)
+
+    def subscribe(self, websocket: WebSocket, request: Dict[str, Any]) -> None:
+        """Apply a client's subscription request.
+
+        ``{"subscribe": [job ids]}`` replaces the jobs the client follows and
+        replays the recent history of the ones it did not follow yet;
+        ``{"summary": true}`` turns the summary channel on (false: off).
+        """
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        if client.jobs is None:
+            client.jobs = set()
+        if isinstance(request.get("subscribe"), list):
+            jobs = {str(job_id) for job_id in request["subscribe"]}
+            added = sorted(jobs - client.jobs)
+            client.jobs = jobs
+            if added:
+                for message in self.ring.replay(added):
+                    client.put({**message, "replay": True})
+        if "summary" in request:
+            client.summary = bool(request["summary"])
+            if client.summary and (self._summary_task is None or self._summary_task.done()):
+                self._summary_task = asyncio.create_task(self._send_summaries())
+
+    async def _send_summaries(self) -> None:
+        """Send the summary channel its tick while anyone listens."""
+        loop = asyncio.get_running_loop()
+        while self.summarize is not None:
+            listeners = [client for client in self.clients.values() if client.summary]
+            if not listeners:
+                return
             try:
-                await connection.send_json(message)
+                jobs = await loop.run_in_executor(None, self.summarize)
             except Exception:  # noqa: BLE001
-                # Drop any connections that error during send.
-                try:
-                    self.active_connections.remove(connection)
-                except ValueError:
-                    continue
+                jobs = None
+            if jobs is not None:
+                message = {"type": "summary", "content": json.dumps(jobs)}
+                for client in listeners:
+                    if not client.put(message):
+                        self._close(client)
+            await asyncio.sleep(SUMMARY_SECONDS)
+
+    async def _run_sender(self, client: _Client) -> None:
+        try:
+            await client.send_all()
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001
+            # A send that failed or timed out: drop the connection.
+            self._close(client)
+
+    def _close(self, client: _Client) -> None:
+        if client.closed:
+            return
+        client.closed = True
+        self.disconnect(client.websocket)
+        asyncio.ensure_future(self._close_socket(client.websocket))
+
+    @staticmethod
+    async def _close_socket(websocket: WebSocket) -> None:
+        try:
+            await websocket.close()
+        except Exception:  # noqa: BLE001
+            pass
 
 
 manager = ConnectionManager()
@@ -84,129 +276,555 @@ manager = ConnectionManager()
 
 # --- Job Manager ---
 class JobManager:
-    """Coordinate EXR pre-pass work and FFmpeg conversion jobs."""
+    """Queue conversion jobs and run each in its own process (``job_process``).
+
+    Jobs and their logs are kept in a ``store.JobStore`` so that ``recover``
+    can pick up the work of a server that was reloaded or crashed.
+
+    Under ``uvicorn --workers N`` only the worker holding the scheduler lock
+    runs jobs (see ``bus``). The others save submissions and cancellations
+    to the store, where the scheduler reads them every
+    ``bus.RECONCILE_SECONDS`` and as soon as the event bus tells it, and
+    forward pre-pass requests over the bus; they answer job queries from the
+    store and relay the scheduler's log messages to their own WebSocket
+    clients.
+    """
 
     def __init__(self) -> None:
-        self.is_running = False
-        self.ffmpeg_handler = FFmpegHandler(self._log_callback)
-        self.exr_handler = ExrHandler(self._log_callback)
-        self.current_thread: Optional[threading.Thread] = None
+        # Speculative pre-pass of the selected sequence, claimed by the next job.
+        self.prewarmer = prewarm.Prewarmer(self._log_callback)
+        # Log lines and progress go out in batches (see ``joblog``).
+        self.batcher = joblog.LogBatcher(self._emit)
+        self.queue = jobs.JobQueue(self._job_changed, self._max_concurrent)
+        self.store = store.JobStore()
+        self.bus = bus.EventBus(self._on_bus_message)
+        self.scheduler_lock = bus.SchedulerLock()
+        # Movies written by jobs in this process; only these can be previewed.
+        self.output_paths: List[str] = []
         # Reference to the event loop for broadcasting from worker threads.
         self.loop: Optional[asyncio.AbstractEventLoop] = None
 
-    def _log_callback(self, msg_type: str, content: str) -> None:
+    @property
+    def is_running(self) -> bool:
+        """True while any job is queued or running."""
+        return self.queue.busy
+
+    @property
+    def is_scheduler(self) -> bool:
+        """True in the worker that runs the jobs."""
+        return self.scheduler_lock.held
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Join the server's workers; run the jobs if no other worker does."""
+        self.loop = loop
+        self.bus.start()
+        if self.scheduler_lock.try_acquire():
+            self._take_over()
+        else:
+            logger.info("Worker %s serves the API; another worker runs the jobs.", os.getpid())
+            self.scheduler_lock.wait(lambda: loop.call_soon_threadsafe(self._take_over))
+
+    def stop(self) -> None:
+        self.bus.close()
+
+    def _take_over(self) -> None:
+        """Become the scheduler and pick up the jobs left in the store."""
+        logger.info("Worker %s runs the jobs.", os.getpid())
+        for line in self.recover():
+            logger.info("Restart recovery: %s", line)
+        self._poll_store()
+
+    def _poll_store(self) -> None:
+        """Reconcile with the store now and every ``bus.RECONCILE_SECONDS``."""
+        self._reconcile()
+        if self.loop:
+            self.loop.call_later(bus.RECONCILE_SECONDS, self._poll_store)
+
+    def _reconcile(self) -> None:
+        """Queue the jobs other workers saved to the store and cancel those they asked to.
+
+        Bus messages only make this run early: the store is what counts, so
+        a message lost on a full socket buffer delays a job or cancellation
+        until the next poll rather than losing it.
+        """
+        try:
+            for job in self.store.unfinished():
+                if job.state == jobs.QUEUED and self.queue.get(job.id) is None:
+                    self._requeue(job)
+            for job_id in self.store.take_cancels():
+                if self.queue.get(job_id) is not None:
+                    self.cancel_job(job_id)
+        except (HTTPException, sqlite3.Error) as exc:
+            logger.warning("Could not read the requests of other workers from the store: %s", exc)
+
+    @staticmethod
+    def _max_concurrent() -> int:
+        try:
+            return int(config.load_settings().get("max_concurrent_jobs", 2))
+        except (TypeError, ValueError):
+            return 1
+
+    def _log_callback(self, msg_type: str, content: str, job_id: Optional[str] = None) -> None:
         """Called by handlers to stream logs back to all WebSocket clients."""
+        message = {"type": msg_type, "content": content}
+        if job_id:
+            message["job"] = job_id
+        self.batcher.add(message)
+
+    def _emit(self, message: Dict[str, Any]) -> None:
+        """Send a (batched) message to the clients of every worker."""
+        self._broadcast(message)
+        self.bus.publish({"event": message})
+
+    def _broadcast(self, message: Dict[str, Any]) -> None:
+        """Send a message to the WebSocket clients of this worker."""
         if self.loop:
-            asyncio.run_coroutine_threadsafe(
-                manager.broadcast({"type": msg_type, "content": content}),
-                self.loop,
+            self.loop.call_soon_threadsafe(manager.broadcast, message)
+
+    def _on_bus_message(self, message: Dict[str, Any]) -> None:
+        """Handle a message from another worker (in the bus's reader thread)."""
+        if "event" in message:
+            self._broadcast(message["event"])
+        elif self.is_scheduler and self.loop:
+            self.loop.call_soon_threadsafe(self._serve_request, message)
+
+    def _serve_request(self, message: Dict[str, Any]) -> None:
+        """Act on a request forwarded by a worker that does not run jobs."""
+        try:
+            if "submit" in message or "cancel" in message:
+                self._reconcile()
+            elif "prewarm" in message:
+                self.prewarm(message["prewarm"])
+            elif "cleanup" in message:
+                self.cleanup()
+        except (HTTPException, sqlite3.Error) as exc:
+            logger.warning("Could not serve forwarded request %s: %s", message, exc)
+
+    def _job_logger(self, job: jobs.Job) -> Callable[[str, str], None]:
+        """Return the log callback of one job; its messages carry the job id."""
+
+        def log(msg_type: str, content: str) -> None:
+            job.observe(msg_type, content)
+            if msg_type == "output_file" and content not in self.output_paths:
+                self.output_paths.append(content)
+            self._persist(self.store.record, job, msg_type, content)
+            self._log_callback(msg_type, content, job.id)
+
+        return log
+
+    @staticmethod
+    def _persist(write: Callable[..., None], *args: Any) -> None:
+        """Write to the job store; a failing database must not fail the job."""
+        try:
+            write(*args)
+        except sqlite3.Error as exc:
+            logger.warning("Could not write job store: %s", exc)
+
+    def _job_changed(self, job: jobs.Job) -> None:
+        """Persist and broadcast a job's new state; ``job_status idle`` once nothing is left."""
+        self._persist(self.store.save, job)
+        if job.state in jobs.FINISHED:
+            self._persist(self.store.prune)
+        self._log_callback("job", json.dumps(job.summary()), job.id)
+        if not self.queue.busy:
+            self._log_callback("job_status", "idle")
+
+    def _submit(
+        self,
+        kind: str,
+        label: str,
+        settings: Dict[str, Any],
+        target: Callable[[jobs.Job, job_process.JobProcess], str],
+        previous: Optional[jobs.Job] = None,
+    ) -> jobs.Job:
+        """Queue a job that runs ``target(job, process)`` in a new job process.
+
+        ``previous`` is the interrupted run of the same job from the store;
+        the job keeps its id, batch, submission time and temp directories.
+        """
+        return self._enqueue([self._create(kind, label, settings, target, previous)])[0]
+
+    def _create(
+        self,
+        kind: str,
+        label: str,
+        settings: Dict[str, Any],
+        target: Callable[[jobs.Job, job_process.JobProcess], str],
+        previous: Optional[jobs.Job] = None,
+        batch_id: Optional[str] = None,
+    ) -> jobs.Job:
+        """Return a job for ``_enqueue`` that runs ``target(job, process)`` (see ``_submit``)."""
+        job = jobs.Job(kind, label, settings, batch_id)
+        if previous is not None:
+            job.id = previous.id
+            job.batch = previous.batch
+            job.created = previous.created
+            job.temp_dirs = list(previous.temp_dirs)
+        if self.is_scheduler:
+            job.pipeline = job_process.JobProcess(self._job_logger(job))
+            job.target = lambda: target(job, job.pipeline)
+        return job
+
+    def _enqueue(self, new_jobs: List[jobs.Job]) -> List[jobs.Job]:
+        """Queue jobs one after the other, with no other job between them.
+
+        A worker that is not the scheduler saves the jobs (in one
+        transaction) and forwards them instead.
+        """
+        if not self.is_scheduler:
+            try:
+                self.store.save_all(new_jobs)
+            except sqlite3.Error as exc:
+                raise HTTPException(status_code=503, detail=f"Could not queue the job: {exc}") from exc
+            # The scheduler polls the store; this only saves it the wait.
+            self.bus.publish({"submit": [job.id for job in new_jobs]})
+            return new_jobs
+        return self.queue.submit_all(new_jobs)
+
+    def estimate(self, job_config: FFmpegJobConfig) -> Dict[str, Any]:
+        """Predict how long ``job_config`` will take from throughput history."""
+        return pipeline.JobPipeline.estimate(job_config)
+
+    def start_calibration(self, previous: Optional[jobs.Job] = None) -> jobs.Job:
+        """Queue a throughput calibration, run like a job."""
+        return self._submit(
+            "calibration",
+            "Throughput calibration",
+            {},
+            lambda job, process: self._run(process, "calibration"),
+            previous,
+        )
+
+    def _run(self, process: job_process.JobProcess, kind: str, *args: Any) -> str:
+        """Run a job other than a conversion; it takes no speculative pre-pass."""
+        self.prewarmer.cancel()
+        return process.run(kind, *args)
+
+    def start_job(self, config_data: FFmpegJobConfig, previous: Optional[jobs.Job] = None) -> jobs.Job:
+        """Validate a conversion job and queue it.
+
+        A job re-queued with ``previous`` resumes the EXR pre-pass in its
+        adopted temp directory, if any.
+        """
+        # Pick the pipeline before queueing the job.
+        try:
+            plan = pipeline.JobPipeline.prepare(config_data)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        self._require(plan)
+        return self._enqueue([self._create_convert(config_data, plan, previous)])[0]
+
+    def _create_convert(
+        self,
+        config_data: FFmpegJobConfig,
+        plan: planner.PipelinePlan,
+        previous: Optional[jobs.Job] = None,
+        batch_id: Optional[str] = None,
+    ) -> jobs.Job:
+        return self._create(
+            "convert",
+            config_data.output_filename,
+            config_data.model_dump(),
+            lambda job, process: self._run_convert(job, process, config_data, plan),
+            previous,
+            batch_id,
+        )
+
+    def start_batch(
+        self, shots: List[Tuple[FFmpegJobConfig, planner.PipelinePlan]]
+    ) -> Tuple[str, List[jobs.Job]]:
+        """Queue validated conversions (see ``batch``) together under a new batch id."""
+        batch_id = uuid.uuid4().hex[:12]
+        new_jobs = [
+            self._create_convert(config_data, plan, batch_id=batch_id) for config_data, plan in shots
+        ]
+        return batch_id, self._enqueue(new_jobs)
+
+    def _run_convert(
+        self,
+        job: jobs.Job,
+        process: job_process.JobProcess,
+        config_data: FFmpegJobConfig,
+        plan: planner.PipelinePlan,
+    ) -> str:
+        """Run a conversion, resuming its own or a speculative pre-pass."""
+        resume_dir = job.temp_dirs[0] if job.temp_dirs else ""
+        if not plan.uses_oiiotool:
+            self.prewarmer.cancel()
+        elif not resume_dir:
+            # The prewarmer lives in this process; hand its cache to the job.
+            resume_dir = self.prewarmer.claim(
+                config_data.input_folder,
+                config_data.filename_pattern,
+                config_data.start_frame,
+                config_data.end_frame,
+                config_data.profile,
             )
+        return process.run("convert", config_data, plan, resume_dir or None)
 
-    def start_job(self, config_data: FFmpegJobConfig) -> None:
-        """Start a new conversion job in a background thread."""
-        if self.is_running:
-            raise HTTPException(status_code=400, detail="A job is already running")
-
-        # Determine if EXR pre-pass is needed before marking the job as running.
-        is_exr = config_data.filename_pattern.lower().endswith(".exr")
-
-        if is_exr:
-            # Ensure EXR-specific dependencies (oiiotool) are available.
-            status = DEPENDENCY_STATUS or check_dependencies(install_missing=False)
-            oiiotool_info = status.get("details", {}).get("oiiotool", {})
-            if not oiiotool_info.get("available"):
-                raise HTTPException(
-                    status_code=503,
-                    detail=(
-                        "EXR conversion requires 'oiiotool' on PATH, "
-                        "but it was not found. Please install OpenImageIO tools."
-                    ),
-                )
-
-        self.is_running = True
-        self.loop = asyncio.get_running_loop()
-
-        # Start background thread
-        self.current_thread = threading.Thread(
-            target=self._run_job_thread,
-            args=(config_data, is_exr),
-            daemon=True,
+    @staticmethod
+    def _require(plan: planner.PipelinePlan) -> None:
+        """Reject a job for which the installed tools offer no valid pipeline."""
+        if plan.problems:
+            raise HTTPException(
+                status_code=503,
+                detail=f"No valid pipeline for this job: {'; '.join(plan.problems)}.",
+            )
+
+    def start_conform(
+        self,
+        conform_config: ConformJobConfig,
+        previous: Optional[jobs.Job] = None,
+        validated: bool = False,
+    ) -> jobs.Job:
+        """Validate a reel conform (many shots, one encode) and queue it.
+
+        ``validated`` skips ``conform.validate``, which the caller has run
+        (it checks every shot's folder on disk).
+        """
+        if not validated:
+            try:
+                conform.validate(conform_config)
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+        # Every EXR shot of a reel uses the same pipeline.
+        exr_patterns = [
+            shot.filename_pattern
+            for shot in conform_config.shots
+            if shot.filename_pattern.lower().endswith(".exr")
+        ]
+        plan = pipeline.JobPipeline.plan(
+            exr_patterns[0] if exr_patterns else conform_config.shots[0].filename_pattern,
+            conform_config.profile,
+            conform_config.codec,
         )
-        self.current_thread.start()
+        self._require(plan)
+        conform_config.lut_path = plan.lut_path
 
-    def _run_job_thread(self, job_config: FFmpegJobConfig, is_exr: bool) -> None:
-        """Execute the EXR pre-pass (if any) and FFmpeg conversion."""
-        import os as _os  # Local import to avoid polluting module namespace.
+        return self._submit(
+            "conform",
+            conform_config.output_filename,
+            conform_config.model_dump(),
+            lambda job, process: self._run(process, "conform", conform_config),
+            previous,
+        )
+
+    def prewarm(self, selection: Dict[str, Any]) -> Dict[str, str]:
+        """Start (or stop) the speculative pre-pass for a selected sequence."""
+        if not self.is_scheduler:
+            # The pre-pass must run where the next job will claim it.
+            self.bus.publish({"prewarm": selection})
+            return {"status": "forwarded"}
+        if not config.load_settings().get("prewarm"):
+            threading.Thread(target=self.prewarmer.cancel, daemon=True).start()
+            return {"status": "disabled"}
+        if self.is_running:
+            return {"status": "busy"}
 
-        temp_dir = ""
-        exr_phase_started = False
+        pattern = selection.get("filename_pattern") or ""
+        profile = selection.get("profile") or "delivery"
+        plan = pipeline.JobPipeline.plan(pattern, profile, None)
+        if not plan.uses_oiiotool or not selection.get("input_folder"):
+            threading.Thread(target=self.prewarmer.cancel, daemon=True).start()
+            return {"status": "idle"}
+        if plan.problems:
+            return {"status": "unavailable"}
         try:
-            # 1. EXR Conversion Pass
-            if is_exr:
-                self._log_callback("output", "Starting EXR Conversion Phase...\n")
-                exr_phase_started = True
-
-                temp_dir = self.exr_handler.convert_exr_sequence(
-                    input_folder=job_config.input_folder,
-                    pattern=job_config.filename_pattern,
-                    start_frame=job_config.start_frame,
-                    end_frame=job_config.end_frame,
-                )
-
-                if not temp_dir or self.exr_handler.is_cancelled:
-                    if not self.exr_handler.is_cancelled:
-                        self._log_callback("error", "EXR Conversion failed.")
-                    self.is_running = False
-                    return
-
-                # Update config for FFmpeg Pass
-                # Point to temp PNG sequence
-                # Assuming oiiotool output pattern logic from exr_handler (prefix + %04d.png)
-                prefix = job_config.filename_pattern.split("%")[0]
-                job_config.input_folder = temp_dir
-                job_config.filename_pattern = f"{prefix}%04d.png"
-
-                self._log_callback(
-                    "output", "EXR Phase Complete. Starting FFmpeg Phase...\n"
-                )
-
-            # 2. FFmpeg Pass (Skipped if cancelled)
-            if not self.is_running:
-                return
+            state = self.prewarmer.start(
+                selection["input_folder"],
+                pattern,
+                int(selection.get("start_frame", 0)),
+                int(selection.get("end_frame", 0)),
+                profile,
+            )
+        except (TypeError, ValueError) as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        return {"status": state}
 
-            self.ffmpeg_handler.run_ffmpeg(job_config)
-
-        except Exception as exc:  # noqa: BLE001
-            self._log_callback("error", f"Critical Job Error: {exc}")
-        finally:
-            # 3. Cleanup (for EXR paths) and status reset
-            if is_exr and exr_phase_started and self.exr_handler.temp_dir:
-                try:
-                    if _os.path.exists(self.exr_handler.temp_dir):
-                        self.exr_handler.cleanup()
-                except Exception as cleanup_exc:  # noqa: BLE001
-                    self._log_callback(
-                        "output",
-                        f"Warning: problem during EXR temp cleanup: {cleanup_exc}\n",
-                    )
-
-            self.is_running = False
-            self._log_callback("job_status", "idle")
+    def cancel_job(self, job_id: Optional[str] = None) -> List[jobs.Job]:
+        """Cancel one job, or every running job when ``job_id`` is None.
 
-    def cancel_job(self) -> None:
-        """Signal the current job (if any) to cancel."""
-        if not self.is_running:
+        Raises:
+            HTTPException: 404 if ``job_id`` is unknown.
+        """
+        if not self.is_scheduler:
+            return self._forward_cancel(job_id)
+        if job_id is not None:
+            job = self.queue.cancel(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail="Unknown job")
+            return [job]
+        cancelled = []
+        for job in self.queue.running():
+            job.pipeline.log_callback("output", "Cancelling job...\n")
+            cancelled.append(self.queue.cancel(job.id))
+        return cancelled
+
+    def _forward_cancel(self, job_id: Optional[str]) -> List[jobs.Job]:
+        """Ask the scheduler, through the store, to cancel a job or every running job."""
+        try:
+            if job_id is not None:
+                job = self.store.get(job_id)
+                if job is None:
+                    raise HTTPException(status_code=404, detail="Unknown job")
+                if job.state in jobs.FINISHED:
+                    return [job]
+                cancelled = [job]
+            else:
+                cancelled = [job for job in self.store.unfinished() if job.state == jobs.RUNNING]
+            self.store.request_cancel([job.id for job in cancelled])
+        except sqlite3.Error as exc:
+            raise HTTPException(status_code=503, detail=f"Could not cancel: {exc}") from exc
+        # The scheduler polls the store; this only saves it the wait.
+        self.bus.publish({"cancel": job_id})
+        return cancelled
+
+    def list_jobs(self) -> List[jobs.Job]:
+        """Return running, then queued, then finished jobs (newest first)."""
+        if self.is_scheduler:
+            return self.queue.list_jobs()
+        return self.store.list_jobs()
+
+    def get_job(self, job_id: str) -> Optional[jobs.Job]:
+        if self.is_scheduler:
+            return self.queue.get(job_id)
+        return self.store.get(job_id)
+
+    def batch_jobs(self, batch_id: str) -> List[jobs.Job]:
+        """Return the jobs of a batch in submission order (empty if the id is unknown)."""
+        stored = self.store.batch_jobs(batch_id)
+        if not self.is_scheduler:
+            return stored
+        # The queue's jobs carry the latest progress and queue positions.
+        return [self.queue.get(job.id) or job for job in stored]
+
+    def summarize(self) -> List[Dict[str, Any]]:
+        """Return the running and queued jobs, for the summary channel."""
+        return [job.summary() for job in self.list_jobs() if job.state not in jobs.FINISHED]
+
+    def is_output(self, path: str) -> bool:
+        """True if ``path`` is a movie written by a job, which may be previewed."""
+        if path in self.output_paths:
+            return True
+        try:
+            return path in self.store.outputs()
+        except sqlite3.Error:
+            return False
+
+    def cleanup(self) -> None:
+        """Remove EXR temp directories left by finished jobs."""
+        if not self.is_scheduler:
+            self.bus.publish({"cleanup": True})
             return
+        for job in self.queue.list_jobs():
+            if job.state in jobs.FINISHED:
+                for path in job.temp_dirs:
+                    self._remove_temp_dir(path)
+        if not self.is_running:
+            threading.Thread(target=self.prewarmer.cancel, daemon=True).start()
+
+    def recover(self) -> List[str]:
+        """Reconcile the store with this process after a reload or crash.
+
+        Finished jobs return to the job list (and their movies to preview).
+        Jobs that were queued or running are re-queued under their id: their
+        leftover FFmpeg process is stopped, a conversion's EXR temp directory
+        is adopted so the pre-pass resumes, and other temp directories are
+        removed. Jobs that no longer validate are marked failed.
+
+        Returns:
+            One line per interrupted job describing what was done.
+        """
+        history = self.store.history()
+        self.queue.restore(history)
+        for job in history:
+            if job.state == jobs.DONE:
+                self.output_paths.extend(path for path in job.outputs if path not in self.output_paths)
+
+        report = []
+        for previous in self.store.unfinished():
+            notes = [f"was {previous.state}"]
+            if self._stop_orphan(previous.pid):
+                notes.append(f"stopped leftover FFmpeg process {previous.pid}")
+            # A conversion has one pre-pass to resume; a conform starts over.
+            adopt = ""
+            if previous.kind == "convert" and len(previous.temp_dirs) == 1:
+                adopt = previous.temp_dirs[0] if os.path.isdir(previous.temp_dirs[0]) else ""
+            for path in previous.temp_dirs:
+                if path != adopt and self._remove_temp_dir(path):
+                    notes.append(f"removed {path}")
+            previous.temp_dirs = [adopt] if adopt else []
+            if adopt:
+                notes.append(f"resuming the EXR pre-pass in {adopt}")
+
+            summary = f"Server restarted ({'; '.join(notes)})"
+            self._persist(self.store.append_log, previous.id, "output", f"{summary}.\n")
+            detail = self._requeue(previous, "Not resumed after a server restart")
+            if detail is not None:
+                if adopt:
+                    self._remove_temp_dir(adopt)
+                report.append(f"{previous.label} [{previous.id}]: {summary}; failed: {detail}")
+                continue
+            report.append(f"{previous.label} [{previous.id}]: {summary}; re-queued")
+        return report
+
+    def _requeue(self, previous: jobs.Job, failure: str = "Not queued") -> Optional[str]:
+        """Queue a job from the store again under its id.
+
+        Returns:
+            None once queued; otherwise why the job no longer validates, after
+            marking it failed with ``failure`` and that reason.
+        """
+        try:
+            if previous.kind == "convert":
+                self.start_job(FFmpegJobConfig(**previous.config), previous)
+            elif previous.kind == "conform":
+                self.start_conform(ConformJobConfig(**previous.config), previous)
+            else:
+                self.start_calibration(previous)
+        except (HTTPException, ValidationError) as exc:
+            detail = exc.detail if isinstance(exc, HTTPException) else str(exc)
+            previous.state = jobs.FAILED
+            previous.stage = None
+            previous.pid = None
+            previous.finished = time.time()
+            previous.error = f"{failure}: {detail}"
+            self._persist(self.store.save, previous)
+            self._persist(self.store.append_log, previous.id, "error", previous.error)
+            self.queue.restore([previous])
+            self._log_callback("job", json.dumps(previous.summary()), previous.id)
+            return str(detail)
+        return None
 
-        self._log_callback("output", "Cancelling job...\n")
+    @staticmethod
+    def _stop_orphan(pid: Optional[int]) -> bool:
+        """Terminate an FFmpeg process left running by a previous server."""
+        if not pid:
+            return False
+        try:
+            # Only a process that is still FFmpeg, not a reused PID.
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                if b"ffmpeg" not in f.read():
+                    return False
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            return False
+        return True
 
-        # Signal both handlers
-        self.ffmpeg_handler.cancel()
-        self.exr_handler.cancel()
-        # The worker thread will exit naturally once handlers abort.
+    @staticmethod
+    def _remove_temp_dir(path: str) -> bool:
+        """Remove an EXR pre-pass temp directory left by a previous server."""
+        if not os.path.basename(path.rstrip(os.sep)).startswith("ffmpeg_web_tmp_"):
+            return False
+        if not os.path.isdir(path):
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+        return True
 
 
 job_manager = JobManager()
+manager.summarize = job_manager.summarize
 
 
 # --- Endpoints ---
@@ -232,10 +850,20 @@ async def update_settings(settings: Dict[str, Any]) -> Dict[str, str]:
     return {"status": "success"}
 
 
+async def _on_filesystem(
+    path: Optional[str], func: Callable[..., Any], *args: Any, timeout: Optional[float] = None
+) -> Any:
+    """Run blocking filesystem work on ``path`` in ``fs_pool``; 504 if its mount hangs."""
+    try:
+        return await fs_pool.POOL.run(path, func, *args, timeout=timeout)
+    except fs_pool.FilesystemTimeout as exc:
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
+
+
 @app.get("/api/browse")
 async def browse(path: str = "") -> Any:
     """List the contents of a directory for the file browser."""
-    return explorer.get_directory_contents(path)
+    return await _on_filesystem(path, explorer.get_directory_contents, path)
 
 
 @app.post("/api/scan")
@@ -244,33 +872,276 @@ async def scan(payload: Dict[str, Any] = Body(...)) -> Any:
     folder = payload.get("path")
     if not folder:
         raise HTTPException(status_code=400, detail="Path required")
-    return explorer.scan_for_sequences(folder)
+    return await _on_filesystem(folder, explorer.scan_for_sequences, folder)
+
+
+async def _probe_tools() -> None:
+    """Probe the tools off the event loop; jobs are then planned from the cache.
+
+    Normally a cache hit (startup probes them); after a binary is replaced
+    it runs FFmpeg several times.
+    """
+    await asyncio.get_running_loop().run_in_executor(None, capabilities.get_capabilities)
 
 
 @app.post("/api/convert")
-async def start_conversion(job_config: FFmpegJobConfig) -> Dict[str, str]:
-    """Start a new conversion job with the provided configuration."""
-    job_manager.start_job(job_config)
-    return {"status": "started"}
+async def start_conversion(job_config: FFmpegJobConfig) -> Dict[str, Any]:
+    """Queue a new conversion job with the provided configuration."""
+    await _probe_tools()
+    job = job_manager.start_job(job_config)
+    return {"status": job.state, "job_id": job.id, "position": job.position}
+
+
+@app.post("/api/conform")
+async def start_conform(conform_config: ConformJobConfig) -> Dict[str, Any]:
+    """Queue a reel conform: many shots encoded into one movie."""
+    folder = conform_config.shots[0].input_folder if conform_config.shots else None
+    try:
+        await _on_filesystem(folder, conform.validate, conform_config)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    await _probe_tools()
+    job = job_manager.start_conform(conform_config, validated=True)
+    return {"status": job.state, "job_id": job.id, "position": job.position}
+
+
+@app.post("/api/conform/import")
+async def import_shot_list(payload: Dict[str, Any] = Body(...)) -> List[ConformShot]:
+    """Parse a CSV, EDL or OTIO shot list into conform shots."""
+    # EDL clips are resolved to sequences on disk under ``media_root``.
+    media_root = payload.get("media_root", "")
+    try:
+        return await _on_filesystem(
+            media_root or None,
+            conform.import_shot_list,
+            payload.get("format", ""),
+            payload.get("content", ""),
+            str(payload.get("frame_rate", "24")),
+            media_root,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@app.post("/api/batch")
+async def start_batch(batch_request: batch.BatchRequest) -> Dict[str, Any]:
+    """Queue many conversions together: job configs and/or a shot folder rule.
+
+    Every shot is validated (in parallel, in ``fs_pool``) before any is
+    queued; if one is invalid or its filesystem does not respond, nothing
+    is queued and the 400 lists each such shot by its index. Returns the
+    batch as ``/api/batch/{id}`` does.
+    """
+    folder = batch_request.rule.folder if batch_request.rule else None
+    try:
+        raw_jobs = await _on_filesystem(folder, batch.expand, batch_request)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    # Not in the shots' validation, which would hold fs_pool slots meanwhile.
+    await _probe_tools()
+    results = await asyncio.gather(
+        *(
+            fs_pool.POOL.run(str(raw.get("input_folder") or ""), batch.validate_job, raw)
+            for raw in raw_jobs
+        ),
+        return_exceptions=True,
+    )
+    errors = []
+    shots = []
+    for index, (raw, result) in enumerate(zip(raw_jobs, results)):
+        if isinstance(result, (ValueError, OSError, fs_pool.FilesystemTimeout)):
+            errors.append({"index": index, "label": raw.get("output_filename"), "error": str(result)})
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            shots.append(result)
+    if not errors:
+        errors = [
+            {
+                "index": index,
+                "label": raw_jobs[index].get("output_filename"),
+                "error": "Writes the same movie as an earlier job",
+            }
+            for index in batch.duplicate_outputs([job_config for job_config, _ in shots])
+        ]
+    if errors:
+        message = f"{len(errors)} of {len(raw_jobs)} jobs are invalid; none were queued."
+        raise HTTPException(status_code=400, detail={"message": message, "errors": errors})
+    problems = [
+        {"index": index, "label": job_config.output_filename, "error": "; ".join(plan.problems)}
+        for index, (job_config, plan) in enumerate(shots)
+        if plan.problems
+    ]
+    if problems:
+        raise HTTPException(
+            status_code=503,
+            detail={"message": "No valid pipeline for some jobs; none were queued.", "errors": problems},
+        )
+
+    batch_id, batch_jobs = job_manager.start_batch(shots)
+    return batch.summarize(batch_id, batch_jobs)
+
+
+def _batch_jobs(batch_id: str) -> List[jobs.Job]:
+    """Return the jobs of a batch; 404 if there are none."""
+    try:
+        batch_jobs = job_manager.batch_jobs(batch_id)
+    except sqlite3.Error as exc:
+        raise HTTPException(status_code=503, detail=f"Could not read the job store: {exc}") from exc
+    if not batch_jobs:
+        raise HTTPException(status_code=404, detail="Unknown batch")
+    return batch_jobs
+
+
+@app.get("/api/batch/{batch_id}")
+async def get_batch(batch_id: str) -> Dict[str, Any]:
+    """Return a batch's state, aggregated progress and the state of every shot."""
+    return batch.summarize(batch_id, _batch_jobs(batch_id))
+
+
+@app.post("/api/batch/{batch_id}/cancel")
+async def cancel_batch(batch_id: str) -> Dict[str, str]:
+    """Cancel every queued or running job of a batch."""
+    # Last first, so no queued shot starts in the slot of a cancelled one.
+    for job in reversed(_batch_jobs(batch_id)):
+        if job.state not in jobs.FINISHED:
+            job_manager.cancel_job(job.id)
+    return {"status": "cancelling"}
+
+
+@app.post("/api/preflight")
+async def preflight_sequence(payload: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+    """Check the EXR headers of a sequence without starting a job."""
+    folder = payload.get("input_folder", "")
+    try:
+        report = await _on_filesystem(
+            folder,
+            preflight.preflight_sequence,
+            folder,
+            payload.get("filename_pattern", ""),
+            int(payload.get("start_frame", 0)),
+            int(payload.get("end_frame", 0)),
+            timeout=preflight.TIMEOUT_SECONDS,
+        )
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {**report.model_dump(), "ok": report.ok}
+
+
+@app.post("/api/prewarm")
+async def prewarm_selection(payload: Dict[str, Any] = Body(...)) -> Dict[str, str]:
+    """Speculatively pre-pass the selected EXR sequence (``prewarm`` setting)."""
+    await _probe_tools()
+    return job_manager.prewarm(payload)
+
+
+@app.post("/api/estimate")
+async def estimate_conversion(job_config: FFmpegJobConfig) -> Dict[str, Any]:
+    """Predict the duration of a job before it is submitted."""
+    # Reads the first frame's header for its resolution.
+    return await _on_filesystem(job_config.input_folder, job_manager.estimate, job_config)
+
+
+@app.post("/api/calibrate")
+async def start_calibration() -> Dict[str, Any]:
+    """Encode a synthetic clip with every codec to seed throughput history."""
+    job = job_manager.start_calibration()
+    return {"status": job.state, "job_id": job.id, "position": job.position}
+
+
+@app.get("/api/jobs")
+async def list_jobs() -> List[Dict[str, Any]]:
+    """List running, queued and recently finished jobs."""
+    return [job.summary() for job in job_manager.list_jobs()]
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str) -> Dict[str, Any]:
+    """Return one job, including the settings it was submitted with."""
+    job = job_manager.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.summary(detail=True)
+
+
+@app.get("/api/jobs/{job_id}/logs")
+async def get_job_logs(job_id: str, offset: int = 0, limit: int = 1000) -> Dict[str, Any]:
+    """Return a job's complete log, ``limit`` messages from ``offset`` on."""
+    if job_manager.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    offset, limit = max(offset, 0), min(max(limit, 1), 10000)
+    try:
+        entries = job_manager.store.logs(job_id, offset, limit)
+    except sqlite3.Error as exc:
+        raise HTTPException(status_code=503, detail=f"Could not read the job log: {exc}") from exc
+    return {"id": job_id, "offset": offset, "next": offset + len(entries), "entries": entries}
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_one_job(job_id: str) -> Dict[str, str]:
+    """Cancel a queued or running job."""
+    job = job_manager.cancel_job(job_id)[0]
+    return {"status": job.state if job.state in jobs.FINISHED else "cancelling"}
+
+
+@app.get("/api/preview")
+def preview_output(path: str, request: Request) -> Any:
+    """Stream a job output with HTTP range support, even while it is growing."""
+    path = os.path.abspath(path)
+    if not job_manager.is_output(path) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Unknown output")
+
+    size = os.path.getsize(path)
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": "no-store"}
+    try:
+        byte_range = media_stream.parse_range(request.headers.get("range"), size)
+    except ValueError as exc:
+        # Typically a player asking beyond what FFmpeg has written so far.
+        raise HTTPException(
+            status_code=416, detail=str(exc), headers={"Content-Range": f"bytes */{size}"}
+        ) from exc
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(end - start + 1, 0))
+
+    return StreamingResponse(
+        media_stream.iter_file_range(path, start, end),
+        status_code=status_code,
+        media_type=media_stream.media_type_for(path),
+        headers=headers,
+    )
 
 
 @app.post("/api/cancel")
 async def cancel_job() -> Dict[str, str]:
-    """Request cancellation of the currently running job, if any."""
+    """Request cancellation of every running job (see ``/api/jobs/{id}/cancel``)."""
     job_manager.cancel_job()
     return {"status": "cancelling"}
 
 
 @app.post("/api/cleanup")
 async def cleanup_temp() -> Dict[str, str]:
-    """Force cleanup of any temporary EXR conversion directory, if present."""
-    job_manager.exr_handler.cleanup()
+    """Force cleanup of temporary EXR conversion directories of idle jobs."""
+    job_manager.cleanup()
     return {"status": "cleanup_triggered"}
 
 
 @app.get("/api/deps")
-async def get_dependency_status() -> Dict[str, Any]:
-    """Expose the cached dependency status for frontend health checks."""
+def get_dependency_status(refresh: bool = False) -> Dict[str, Any]:
+    """Expose the cached dependency status and tool capabilities.
+
+    ``refresh`` probes the FFmpeg and oiiotool builds again.
+    """
+    global DEPENDENCY_STATUS  # noqa: PLW0603
+    if refresh:
+        DEPENDENCY_STATUS = check_dependencies(install_missing=False, refresh=True)
+        return DEPENDENCY_STATUS
     if not DEPENDENCY_STATUS or not DEPENDENCY_STATUS.get("details"):
         # Fallback in case startup has not run (e.g., in some test harness).
         status = check_dependencies(install_missing=False)
@@ -280,12 +1151,21 @@ async def get_dependency_status() -> Dict[str, Any]:
 
 @app.websocket("/ws/status")
 async def websocket_endpoint(websocket: WebSocket) -> None:
-    """WebSocket endpoint for streaming job logs and progress."""
+    """WebSocket endpoint for streaming job logs and progress.
+
+    Clients may send ``{"subscribe": [job ids]}`` and ``{"summary": true}``
+    (see ``ConnectionManager.subscribe``); other payloads are ignored.
+    """
     await manager.connect(websocket)
     try:
         while True:
-            # Keep connection alive; payloads from the client are ignored for now.
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            try:
+                request = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(request, dict):
+                manager.subscribe(websocket, request)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
@@ -35,8 +35,37 @@ const API = {
         return await res.json();
     },
 
-    async cancelConversion() {
-        const res = await fetch('/api/cancel', { method: 'POST' });
+    async prewarm(selection) {
+        const res = await fetch('/api/prewarm', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(selection)
+        });
+        return await res.json();
+    },
+
+    async estimate(config) {
+        const res = await fetch('/api/estimate', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(config)
+        });
+        return await res.json();
+    },
+
+    async calibrate() {
+        const res = await fetch('/api/calibrate', { method: 'POST' });
+        return await res.json();
+    },
+
+    async cancelConversion(jobId = null) {
+        const url = jobId ? `/api/jobs/${encodeURIComponent(jobId)}/cancel` : '/api/cancel';
+        const res = await fetch(url, { method: 'POST' });
+        return await res.json();
+    },
+
+    async listJobs() {
+        const res = await fetch('/api/jobs');
         return await res.json();
     },
 
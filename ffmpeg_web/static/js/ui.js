@@ -4,8 +4,15 @@ document.addEventListener('DOMContentLoaded', async () => {
         browsingPath: "",
         inputFolder: "",
         frameRange: { start: 0, end: 0 },
-        isConverting: false
+        isConverting: false,
+        // Id of the job started here; PENDING_JOB until the server replies.
+        jobId: null,
+        pendingMessages: [],
+        // Last message number seen per job, to skip replayed messages.
+        lastSeq: {},
+        ws: null
     };
+    const PENDING_JOB = 'pending';
 
     // --- DOM Elements ---
     const dom = {
@@ -16,6 +23,13 @@ document.addEventListener('DOMContentLoaded', async () => {
         sourceFps: document.getElementById('source_frame_rate'),
 
         codec: document.getElementById('codec'),
+        profile: document.getElementById('profile'),
+        schedulingClass: document.getElementById('scheduling_class'),
+        proxyFirst: document.getElementById('proxy_first'),
+        fragmentedMp4: document.getElementById('fragmented_mp4'),
+        smartReencode: document.getElementById('smart_reencode'),
+        prewarm: document.getElementById('prewarm'),
+        previewPlayer: document.getElementById('preview-player'),
         outputFps: document.getElementById('frame_rate'),
         mp4Bitrate: document.getElementById('mp4_bitrate'),
         proresQscale: document.getElementById('prores_qscale'),
@@ -28,6 +42,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         runBtn: document.getElementById('run-btn'),
         stopBtn: document.getElementById('stop-btn'),
         progressBar: document.getElementById('progress-bar'),
+        etaLabel: document.getElementById('eta-label'),
         logContainer: document.getElementById('log-container'),
         statusIndicator: document.getElementById('status-indicator'),
         depsWarning: document.getElementById('deps-warning'),
@@ -59,6 +74,8 @@ document.addEventListener('DOMContentLoaded', async () => {
         ws.onopen = () => {
             dom.statusIndicator.textContent = "Connected";
             dom.statusIndicator.className = "log-success";
+            state.ws = ws;
+            subscribe();
         };
 
         ws.onmessage = (event) => {
@@ -73,14 +90,83 @@ document.addEventListener('DOMContentLoaded', async () => {
         };
     }
 
+    // Follow only the job started here; a (re)subscription replays what it missed.
+    function subscribe() {
+        if (!state.ws || state.ws.readyState !== WebSocket.OPEN) return;
+        const jobs = state.jobId && state.jobId !== PENDING_JOB ? [state.jobId] : [];
+        state.ws.send(JSON.stringify({ subscribe: jobs }));
+    }
+
     function handleWsMessage(msg) {
+        // Other users' jobs share the server; follow only the job started here.
+        if (msg.job && state.jobId === PENDING_JOB) {
+            state.pendingMessages.push(msg);
+            return;
+        }
+        if (msg.job && msg.job !== state.jobId) return;
+        // A reconnect replays recent history; skip what was already shown.
+        if (msg.job && msg.seq) {
+            if (msg.replay && msg.seq <= (state.lastSeq[msg.job] || 0)) return;
+            state.lastSeq[msg.job] = msg.seq;
+        }
+
         if (msg.type === 'output' || msg.type === 'error') {
-            log(msg.content, msg.type);
+            // Log lines arrive in batches; show one entry per line.
+            msg.content.split('\n').filter(line => line.trim()).forEach(line => log(line, msg.type));
         } else if (msg.type === 'progress') {
             const pct = parseFloat(msg.content);
             if (!isNaN(pct)) {
                 dom.progressBar.style.width = `${pct}%`;
             }
+        } else if (msg.type === 'eta') {
+            const seconds = parseFloat(msg.content);
+            if (!isNaN(seconds)) {
+                dom.etaLabel.textContent = `ETA ${formatSeconds(seconds)}`;
+            }
+        } else if (msg.type === 'estimate') {
+            const estimate = JSON.parse(msg.content);
+            if (estimate.seconds !== null) {
+                dom.etaLabel.textContent = `Estimated ${formatSeconds(estimate.seconds)}`;
+            }
+        } else if (msg.type === 'output_file') {
+            // Give FFmpeg a moment to write the first fragment before loading.
+            setTimeout(() => showPreview(msg.content), 3000);
+        } else if (msg.type === 'prewarm') {
+            const status = JSON.parse(msg.content);
+            if (state.isConverting) return;
+            if (status.state === 'running') {
+                const pct = status.progress !== undefined ? ` ${Math.round(status.progress)}%` : '';
+                dom.statusIndicator.textContent = `Ready (pre-converting${pct})`;
+            } else if (status.state === 'ready') {
+                dom.statusIndicator.textContent = "Ready (pre-converted)";
+            } else {
+                dom.statusIndicator.textContent = "Ready";
+            }
+        } else if (msg.type === 'missing_frames') {
+            dom.statusIndicator.textContent = `Processing (missing frames held: ${msg.content})...`;
+        } else if (msg.type === 'proxy_ready') {
+            log(`Proxy ready for review: ${msg.content}`, 'success');
+            log('Full-quality master is encoding; press Stop to cancel it.', 'info');
+            dom.statusIndicator.textContent = "Proxy ready, encoding master...";
+        } else if (msg.type === 'job') {
+            const job = JSON.parse(msg.content);
+            if (job.state === 'queued') {
+                dom.statusIndicator.textContent = `Queued (position ${job.position})...`;
+            } else if (job.state === 'running') {
+                dom.statusIndicator.textContent = "Processing...";
+            } else {
+                state.jobId = null;
+                setConvertingState(false);
+            }
+        } else if (msg.type === 'stage') {
+            if (msg.content.startsWith('waiting:')) {
+                const stage = msg.content.slice('waiting:'.length);
+                dom.statusIndicator.textContent = `Waiting for a free ${stage} slot...`;
+            } else if (msg.content === 'prepass') {
+                dom.statusIndicator.textContent = "Converting EXRs...";
+            } else {
+                dom.statusIndicator.textContent = "Encoding...";
+            }
         } else if (msg.type === 'job_status') {
             if (msg.content === 'idle') {
                 setConvertingState(false);
@@ -108,6 +194,32 @@ document.addEventListener('DOMContentLoaded', async () => {
             dom.statusIndicator.textContent = "Ready";
             dom.statusIndicator.className = "log-success";
             dom.progressBar.style.width = '0%';
+            dom.etaLabel.textContent = '';
+        }
+    }
+
+    function showPreview(path) {
+        dom.previewPlayer.src = `/api/preview?path=${encodeURIComponent(path)}`;
+        dom.previewPlayer.classList.remove('hidden');
+    }
+
+    function formatSeconds(seconds) {
+        const total = Math.max(0, Math.round(seconds));
+        const h = Math.floor(total / 3600);
+        const m = Math.floor((total % 3600) / 60);
+        const s = String(total % 60).padStart(2, '0');
+        return h > 0 ? `${h}h ${String(m).padStart(2, '0')}m` : `${m}:${s}`;
+    }
+
+    async function refreshEstimate() {
+        if (state.isConverting || !dom.filenamePattern.value) return;
+        try {
+            const estimate = await API.estimate(buildJobConfig());
+            dom.etaLabel.textContent = estimate.seconds !== null && estimate.seconds !== undefined
+                ? `Estimated ${formatSeconds(estimate.seconds)} (${estimate.basis})`
+                : 'No estimate yet (run a calibration)';
+        } catch (e) {
+            dom.etaLabel.textContent = '';
         }
     }
 
@@ -128,6 +240,9 @@ document.addEventListener('DOMContentLoaded', async () => {
             dom.desiredDuration.value = settings.desired_duration || "15";
             dom.mp4Bitrate.value = settings.mp4_bitrate || "30";
             dom.proresQscale.value = settings.prores_qscale || "9";
+            dom.profile.value = settings.profile || "delivery";
+            dom.schedulingClass.value = settings.scheduling_class || "interactive";
+            dom.prewarm.checked = Boolean(settings.prewarm);
 
             if (settings.codec) {
                 dom.codec.value = settings.codec;
@@ -147,7 +262,10 @@ document.addEventListener('DOMContentLoaded', async () => {
             desired_duration: dom.desiredDuration.value,
             codec: dom.codec.value,
             mp4_bitrate: dom.mp4Bitrate.value,
-            prores_qscale: dom.proresQscale.value
+            prores_qscale: dom.proresQscale.value,
+            profile: dom.profile.value,
+            scheduling_class: dom.schedulingClass.value,
+            prewarm: dom.prewarm.checked
         };
         await API.saveSettings(settings);
     }
@@ -157,7 +275,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         dom.codecOptions.forEach(el => el.classList.add('hidden'));
 
         if (codec === 'h264' || codec === 'h265') {
-            document.querySelector('.show-mp4').classList.remove('hidden');
+            document.querySelectorAll('.show-mp4').forEach(el => el.classList.remove('hidden'));
             dom.outputFilename.value = dom.outputFilename.value.replace(/\.\w+$/, '.mp4');
         } else if (codec.startsWith('prores')) {
             document.querySelector('.show-prores').classList.remove('hidden');
@@ -252,6 +370,7 @@ document.addEventListener('DOMContentLoaded', async () => {
                 log("No image sequences detected.", 'error');
                 dom.filenamePattern.value = "";
                 dom.detectedRange.textContent = "None";
+                requestPrewarm();
                 return;
             }
 
@@ -267,12 +386,67 @@ document.addEventListener('DOMContentLoaded', async () => {
             dom.outputFilename.value = `${seqName}${ext}`;
 
             log(`Detected sequence: ${seq.pattern} ${seq.range_string}`, 'success');
+            if (seq.missing && seq.missing.length) {
+                log(`${seq.missing.length} missing frames will hold the previous frame.`, 'info');
+            }
+            refreshEstimate();
+            requestPrewarm();
 
         } catch (e) {
             log(`Scan failed: ${e.message}`, 'error');
         }
     }
 
+    // Start (or stop) the speculative EXR pre-pass for the current selection.
+    async function requestPrewarm() {
+        if (state.isConverting) return;
+        try {
+            await API.prewarm({
+                input_folder: dom.inputFolder.value,
+                filename_pattern: dom.filenamePattern.value,
+                start_frame: state.frameRange.start,
+                end_frame: state.frameRange.end,
+                profile: dom.profile.value
+            });
+        } catch (e) {
+            console.error("Prewarm request failed", e);
+        }
+    }
+
+    function buildJobConfig() {
+        const config = {
+            input_folder: dom.inputFolder.value,
+            filename_pattern: dom.filenamePattern.value,
+            output_folder: dom.outputFolder.value,
+            output_filename: dom.outputFilename.value,
+            frame_rate: dom.outputFps.value,
+            source_frame_rate: dom.sourceFps.value,
+            desired_duration: dom.desiredDuration.value,
+            codec: dom.codec.value,
+            mp4_bitrate: dom.mp4Bitrate.value,
+            prores_profile: dom.codec.value.startsWith('prores') ? dom.codec.value.replace('prores_', '') : "2",
+            prores_qscale: dom.proresQscale.value,
+            audio_option: dom.audioOption.value,
+            start_frame: state.frameRange.start,
+            end_frame: state.frameRange.end,
+            profile: dom.profile.value,
+            scheduling_class: dom.schedulingClass.value,
+            proxy_first: dom.proxyFirst.checked,
+            fragmented_mp4: dom.fragmentedMp4.checked,
+            smart_reencode: dom.smartReencode.checked
+        };
+
+        if (dom.codec.value.startsWith('prores')) {
+            // Map dropdown value to profile index logic if needed
+            // Simple mapping based on value names
+            if (config.prores_profile === '422') config.prores_profile = '2';
+            if (config.prores_profile === '422_lt') config.prores_profile = '1';
+            if (config.prores_profile === '444') config.prores_profile = '4';
+        }
+
+        return config;
+    }
+
     // --- Logging ---
     function log(msg, type = 'output') {
         const div = document.createElement('div');
@@ -300,7 +474,16 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     });
 
-    dom.codec.addEventListener('change', updateCodecOptions);
+    dom.codec.addEventListener('change', () => {
+        updateCodecOptions();
+        refreshEstimate();
+    });
+    [dom.outputFps, dom.sourceFps, dom.desiredDuration, dom.profile].forEach(el => el.addEventListener('change', refreshEstimate));
+    dom.profile.addEventListener('change', requestPrewarm);
+    dom.prewarm.addEventListener('change', async () => {
+        await saveCurrentSettings();
+        requestPrewarm();
+    });
 
     dom.runBtn.addEventListener('click', async () => {
         if (!dom.inputFolder.value || !dom.outputFolder.value) {
@@ -308,47 +491,37 @@ document.addEventListener('DOMContentLoaded', async () => {
             return;
         }
 
-        const config = {
-            input_folder: dom.inputFolder.value,
-            filename_pattern: dom.filenamePattern.value,
-            output_folder: dom.outputFolder.value,
-            output_filename: dom.outputFilename.value,
-            frame_rate: dom.outputFps.value,
-            source_frame_rate: dom.sourceFps.value,
-            desired_duration: dom.desiredDuration.value,
-            codec: dom.codec.value,
-            mp4_bitrate: dom.mp4Bitrate.value,
-            prores_profile: dom.codec.value.startsWith('prores') ? dom.codec.value.replace('prores_', '') : "2",
-            prores_qscale: dom.proresQscale.value,
-            audio_option: dom.audioOption.value,
-            start_frame: state.frameRange.start,
-            end_frame: state.frameRange.end
-        };
-
-        if (dom.codec.value.startsWith('prores')) {
-            // Map dropdown value to profile index logic if needed
-            // Simple mapping based on value names
-            if (config.prores_profile === '422') config.prores_profile = '2';
-            if (config.prores_profile === '422_lt') config.prores_profile = '1';
-            if (config.prores_profile === '444') config.prores_profile = '4';
-        }
+        const config = buildJobConfig();
 
         setConvertingState(true);
         dom.logContainer.innerHTML = ''; // Clear logs
         log("Starting job...", "info");
         await saveCurrentSettings();
 
+        state.jobId = PENDING_JOB;
+        state.pendingMessages = [];
         try {
-            await API.startConversion(config);
+            const res = await API.startConversion(config);
+            if (!res.job_id) throw new Error(res.detail || 'the server rejected the job');
+            state.jobId = res.job_id;
+            subscribe();
+            if (res.status === 'queued' && res.position) log(`Queued behind other jobs (position ${res.position}).`, 'info');
         } catch (e) {
+            state.jobId = null;
             log(`Failed to start job: ${e.message}`, 'error');
             setConvertingState(false);
         }
+        const buffered = state.pendingMessages;
+        state.pendingMessages = [];
+        buffered.forEach(handleWsMessage);
     });
 
     dom.stopBtn.addEventListener('click', async () => {
         log('Stop requested by user...', 'info');
-        await API.cancelConversion();
+        // Only this client's job; other users' jobs keep running.
+        if (state.jobId && state.jobId !== PENDING_JOB) {
+            await API.cancelConversion(state.jobId);
+        }
     });
 
     // Run init
@@ -68,12 +68,99 @@ def test_deps_endpoint() -> None:
     assert "ok" in status and "issues" in status and "details" in status
 
 
+def test_estimate_endpoint() -> None:
+    """Ensure duration estimates are returned for a job config."""
+    job = {
+        "input_folder": "/tmp",
+        "filename_pattern": "shot_%04d.png",
+        "output_folder": "/tmp",
+        "output_filename": "shot.mp4",
+        "frame_rate": "24",
+        "source_frame_rate": "24",
+        "desired_duration": "4",
+        "codec": "h264",
+        "mp4_bitrate": "30",
+        "start_frame": 1,
+        "end_frame": 96,
+    }
+    estimate = _http_post("/api/estimate", job)
+    assert "seconds" in estimate and "basis" in estimate
+
+
+def test_conform_import_endpoint() -> None:
+    """Ensure a CSV shot list is parsed into conform shots."""
+    content = "folder,pattern,in,out,name\n/tmp,sh010.%04d.exr,1001,1048,sh010\n"
+    shots = _http_post("/api/conform/import", {"format": "csv", "content": content})
+    assert shots and shots[0]["start_frame"] == 1001 and shots[0]["end_frame"] == 1048
+
+
+def test_preflight_endpoint() -> None:
+    """Ensure preflight of a sequence with no frames on disk passes trivially."""
+    payload = {
+        "input_folder": "/tmp",
+        "filename_pattern": "ffmpeg_web_no_such_sequence.%04d.exr",
+        "start_frame": 1,
+        "end_frame": 10,
+    }
+    report = _http_post("/api/preflight", payload)
+    assert report["ok"] and report["checked"] == 0
+
+
+def test_jobs_endpoint() -> None:
+    """Ensure the job list is returned and each job carries an id and state."""
+    jobs = _http_get("/api/jobs")
+    assert isinstance(jobs, list)
+    assert all("id" in job and "state" in job for job in jobs)
+
+
+def test_job_logs_endpoint() -> None:
+    """Ensure a job's log can be paged through over HTTP."""
+    jobs = _http_get("/api/jobs")
+    if not jobs:
+        return
+    page = _http_get(f"/api/jobs/{jobs[0]['id']}/logs?offset=0&limit=5")
+    assert page["offset"] == 0 and len(page["entries"]) <= 5
+    assert page["next"] == len(page["entries"])
+
+
+def test_batch_rejects_invalid_shot() -> None:
+    """Ensure a batch with a shot that has no frames is rejected and queues nothing."""
+    before = len(_http_get("/api/jobs"))
+    payload = {
+        "defaults": {
+            "input_folder": "/tmp",
+            "output_folder": "/tmp",
+            "frame_rate": "24",
+            "source_frame_rate": "24",
+            "codec": "h264",
+            "mp4_bitrate": "30",
+        },
+        "jobs": [
+            {"filename_pattern": "ffmpeg_web_no_such_sequence.%04d.exr", "output_filename": "batch.mp4"}
+        ],
+    }
+    try:
+        _http_post("/api/batch", payload)
+    except urllib.error.HTTPError as exc:
+        detail = json.loads(exc.read().decode("utf-8"))["detail"]
+        assert exc.code == 400 and detail["errors"][0]["index"] == 0
+    else:
+        raise AssertionError("A batch with an invalid shot was queued")
+    assert len(_http_get("/api/jobs")) == before
+
+
 def main() -> None:
     """Run all simple tests and print results."""
     tests = [
         ("settings roundtrip", test_settings_roundtrip),
         ("browse root", test_browse_root),
         ("deps endpoint", test_deps_endpoint),
+        ("estimate endpoint", test_estimate_endpoint),
+        ("conform import endpoint", test_conform_import_endpoint),
+        ("preflight endpoint", test_preflight_endpoint),
+        ("jobs endpoint", test_jobs_endpoint),
+        ("job logs endpoint", test_job_logs_endpoint),
+        ("batch rejects invalid shot", test_batch_rejects_invalid_shot),
     ]
     for name, fn in tests:
         try:
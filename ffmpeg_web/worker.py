@@ -0,0 +1,67 @@
+"""Farm worker: run the tasks of distributed jobs from a shared queue directory.
+
+    python -m ffmpeg_web.worker /mnt/farm/ffmpeg_queue
+
+Start any number of workers, on any host that mounts the queue and the
+job's input and output folders at the same paths. Jobs are submitted with
+``python -m ffmpeg_web.cli --farm /mnt/farm/ffmpeg_queue ...``, which waits
+for the workers and assembles the movie (see ``core.farm``).
+
+Logs are written to stdout as JSON lines like the CLI's, with the running
+task as ``job``. Ctrl+C (SIGINT) returns the running task to the queue.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+from typing import Any, List, Optional
+
+from .cli import EXIT_INTERRUPTED, EXIT_OK, JsonLogger
+from .core import farm
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m ffmpeg_web.worker",
+        description="Run tasks of distributed conversion jobs from a shared queue directory.",
+    )
+    parser.add_argument("queue", help="queue directory on shared storage")
+    parser.add_argument(
+        "--idle-exit", type=float, default=None, help="exit after this many seconds without work"
+    )
+    parser.add_argument("--quiet", action="store_true", help="omit FFmpeg/oiiotool log lines")
+    args = parser.parse_args(argv)
+
+    log = JsonLogger(sys.stdout, quiet=args.quiet)
+
+    def emit(msg_type: str, content: Any) -> None:
+        log.job = worker.current
+        log.emit(msg_type, content)
+
+    worker = farm.FarmWorker(args.queue, emit)
+    emit("output", f"Worker {worker.worker} watching {args.queue}.\n")
+
+    # Run in a thread so Ctrl+C/SIGINT can release the running task.
+    finished = threading.Event()
+
+    def work() -> None:
+        try:
+            worker.run(args.idle_exit)
+        finally:
+            finished.set()
+
+    threading.Thread(target=work, daemon=True).start()
+    try:
+        while not finished.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        worker.stop()
+        finished.wait()
+        return EXIT_INTERRUPTED
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
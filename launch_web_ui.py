@@ -12,6 +12,8 @@ application but targets the web stack defined in ``ffmpeg_web/``. It:
 Environment variables:
     FFMPEG_WEB_HOST: Optional override for the bind host (default: "0.0.0.0").
     FFMPEG_WEB_PORT: Optional override for the port (default: "8000").
+    FFMPEG_WEB_WORKERS: Optional number of uvicorn worker processes
+        (default: "1"). One of them runs the jobs; see ``ffmpeg_web.core.bus``.
 """
 
 import os
@@ -21,7 +23,7 @@ import webbrowser
 from typing import List
 
 
-def _build_rez_command(host: str, port: str) -> List[str]:
+def _build_rez_command(host: str, port: str, workers: str = "1") -> List[str]:
     """Construct the Rez command used to launch the web UI.
 
     Notes:
@@ -51,6 +53,8 @@ def _build_rez_command(host: str, port: str) -> List[str]:
         host,
         "--port",
         port,
+        "--workers",
+        workers,
     ]
 
 
@@ -58,8 +62,9 @@ def launch_web_ui() -> None:
     """Launch the FastAPI FFmpeg Web UI within a Rez environment."""
     host = os.environ.get("FFMPEG_WEB_HOST", "0.0.0.0")
     port = os.environ.get("FFMPEG_WEB_PORT", "8000")
+    workers = os.environ.get("FFMPEG_WEB_WORKERS", "1")
 
-    cmd = _build_rez_command(host, port)
+    cmd = _build_rez_command(host, port, workers)
     printable_cmd = " ".join(cmd)
     print(f"Running FFmpeg Web UI via Rez:\n  {printable_cmd}\n")
 